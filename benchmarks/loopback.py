@@ -0,0 +1,297 @@
+"""
+Banco de pruebas de la replicación en el propio equipo (SyncManager -> FileReceiver).
+
+Arranca uno o varios FileReceiver en 127.0.0.1, genera una carga de trabajo
+reproducible (misma semilla, mismos archivos) y la replica con SyncManager.
+Informa de MB/s, archivos/s, latencia p50/p99 por archivo, CPU y memoria máxima,
+y guarda el resultado en JSON para comparar ejecuciones entre commits.
+
+Uso (desde la raíz del repositorio):
+
+    python benchmarks/loopback.py --workload tiny
+    python benchmarks/loopback.py --workload large --size 2G --files 2
+    python benchmarks/loopback.py --workload mixed --receivers 4 --runs 3 --output resultados.json
+
+Todo se hace en una carpeta temporal propia (config.json, bitácoras, índices), de modo
+que el banco no toca la configuración del usuario.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+try:
+    import resource  # No existe en Windows: ahí no se mide CPU ni memoria
+except ImportError:
+    resource = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_ROOT, "src")
+
+BLOCK_SIZE = 1024 * 1024  # Bloque aleatorio con el que se rellenan los archivos grandes
+# Parámetros de --config que se pasan también a los receptores
+RECEIVER_OPTIONS = ("disk_writers", "pipeline_depth", "fsync", "group_commit_ms", "group_commit_files")
+
+# Cargas predefinidas: número de archivos y rango de tamaños (bytes) de cada clase
+WORKLOADS = {
+    "tiny": {"files": 10000, "classes": [(1.0, 512, 8 * 1024)], "receivers": 1},
+    "large": {"files": 2, "classes": [(1.0, 1024 ** 3, 1024 ** 3)], "receivers": 1},
+    "mixed": {
+        "files": 2000,
+        "classes": [(0.70, 1024, 16 * 1024), (0.25, 64 * 1024, 4 * 1024 ** 2), (0.05, 16 * 1024 ** 2, 64 * 1024 ** 2)],
+        "receivers": 1,
+    },
+    "fanout": {"files": 200, "classes": [(1.0, 256 * 1024, 4 * 1024 ** 2)], "receivers": 4},
+}
+
+
+def parse_size(text):
+    """Convierte '512', '64K', '4M' o '2G' en bytes."""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = str(text).strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def free_port():
+    """Pide al sistema un puerto TCP libre en 127.0.0.1."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, fraction):
+    """Percentil por el método del rango más cercano (None si no hay valores)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def git_commit():
+    """Commit actual del repositorio, para poder comparar resultados entre versiones."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def usage():
+    """Devuelve (segundos de CPU de usuario + sistema, memoria residente máxima en MB) del proceso."""
+    if resource is None:
+        return None, None
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss va en KB en Linux y en bytes en macOS
+    rss = ru.ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+    return ru.ru_utime + ru.ru_stime, rss
+
+
+def generate_workload(folder, spec, files, size, compressible, seed):
+    """
+    Crea los archivos de la carga en folder de forma reproducible.
+
+    :param spec: Carga predefinida de WORKLOADS.
+    :param files: Número de archivos (sustituye al de la carga predefinida).
+    :param size: Tamaño fijo de cada archivo (sustituye a los rangos de la carga predefinida).
+    :param compressible: Generar texto repetitivo en lugar de datos aleatorios.
+    :return: Lista de rutas creadas.
+    """
+    rng = random.Random(seed)
+    block = (b"linea de registro de ejemplo, muy repetida\n" * (BLOCK_SIZE // 43 + 1))[:BLOCK_SIZE] \
+        if compressible else rng.randbytes(BLOCK_SIZE)
+    weights = [weight for weight, _, _ in spec["classes"]]
+    paths = []
+    for index in range(files):
+        if size is None:
+            _, low, high = rng.choices(spec["classes"], weights)[0]
+            file_size = rng.randint(low, high)
+        else:
+            file_size = size
+        # Árbol de dos niveles para que haya carpetas, como en un uso real
+        directory = os.path.join(folder, f"d{index % 16:02d}", f"s{(index // 16) % 16:02d}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"f{index:06d}.bin")
+        with open(path, "wb") as f:
+            written = 0
+            while written < file_size:
+                # Cada bloque empieza por el número de archivo y de bloque para que no haya duplicados
+                chunk = index.to_bytes(4, "big") + (written // BLOCK_SIZE).to_bytes(4, "big") + block[8:]
+                chunk = chunk[:file_size - written]
+                f.write(chunk)
+                written += len(chunk)
+        paths.append(path)
+    return paths
+
+
+def run_once(workdir, paths, source, receivers, config, run_index):
+    """Replica los archivos a receivers receptores nuevos y devuelve las medidas de la pasada."""
+    from sync import SyncManager, FileReceiver
+    from sync.manifest import FileManifest
+    from sync.sync import BYTES_SENT
+
+    run_dir = os.path.join(workdir, f"run{run_index}")
+    clients, servers = [], []
+    for i in range(receivers):
+        folder = os.path.join(run_dir, f"rx{i}")
+        os.makedirs(folder)
+        port = free_port()
+        receiver = FileReceiver(folder, host="127.0.0.1", port=port,
+                                manifest=FileManifest(folder, os.path.join(run_dir, f"rx{i}.db")),
+                                **{key: config[key] for key in RECEIVER_OPTIONS if key in config})
+        threading.Thread(target=receiver.start, daemon=True).start()
+        if not receiver.ready.wait(10):
+            raise RuntimeError(f"El receptor {i} no arrancó.")
+        servers.append(receiver)
+        clients.append({"host": "127.0.0.1", "port": port})
+
+    with open("config.json", "w") as f:
+        json.dump(dict(config, sync_folder=source, clients=clients), f)
+    from config import ConfigurationManager
+    ConfigurationManager.invalidate()
+
+    manager = SyncManager(source, manifest=FileManifest(source, os.path.join(run_dir, "source.db")))
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    wire_before = sum(value for _, value in BYTES_SENT.samples())
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    cpu_before, _ = usage()
+    start = time.perf_counter()
+
+    def on_done(future, submitted):
+        nonlocal failures
+        elapsed = time.perf_counter() - submitted
+        results = future.result()
+        with lock:
+            latencies.append(elapsed)
+            if len(results) != receivers or not all(results.values()):
+                failures += 1
+
+    futures = []
+    for offset in range(0, len(paths), manager.batch_size):
+        submitted = time.perf_counter()
+        for future in manager.sync_files(paths[offset:offset + manager.batch_size]):
+            future.add_done_callback(lambda f, t=submitted: on_done(f, t))
+            futures.append(future)
+    for future in futures:
+        future.result()
+
+    elapsed = time.perf_counter() - start
+    cpu_after, peak_rss = usage()
+    wire_bytes = sum(value for _, value in BYTES_SENT.samples()) - wire_before
+
+    manager.shutdown()
+    for receiver in servers:
+        receiver.stop(timeout=10)
+        receiver.manifest.close()
+    manager.manifest.close()
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+    replicated = total_bytes * receivers
+    return {
+        "elapsed_s": elapsed,
+        "files": len(paths),
+        "bytes": total_bytes,
+        "wire_bytes": wire_bytes,
+        "failures": failures,
+        "mb_per_s": replicated / elapsed / 1024 ** 2 if elapsed else None,
+        "files_per_s": len(paths) * receivers / elapsed if elapsed else None,
+        "latency_p50_s": percentile(latencies, 0.50),
+        "latency_p99_s": percentile(latencies, 0.99),
+        "cpu_s": cpu_after - cpu_before if cpu_before is not None else None,
+        "cpu_percent": 100 * (cpu_after - cpu_before) / elapsed if cpu_before is not None and elapsed else None,
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de replicación en 127.0.0.1.")
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed", help="Carga predefinida.")
+    parser.add_argument("--files", type=int, help="Número de archivos (por defecto, el de la carga).")
+    parser.add_argument("--size", type=parse_size, help="Tamaño fijo de cada archivo (p. ej. 4K, 2G).")
+    parser.add_argument("--receivers", type=int, help="Número de receptores (por defecto, el de la carga).")
+    parser.add_argument("--runs", type=int, default=1, help="Repeticiones de la medida.")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla de la carga de trabajo.")
+    parser.add_argument("--compressible", action="store_true", help="Generar texto en lugar de datos aleatorios.")
+    parser.add_argument("--config", type=json.loads, default={},
+                        help="Parámetros de config.json a aplicar, en JSON (p. ej. '{\"compression\": \"off\"}').")
+    parser.add_argument("--workdir", help="Carpeta de trabajo (por defecto, una temporal que se borra al terminar).")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args(argv)
+
+    spec = WORKLOADS[args.workload]
+    files = args.files or spec["files"]
+    receivers = args.receivers or spec["receivers"]
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="sync-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    output = os.path.abspath(args.output) if args.output else None
+
+    # Las bitácoras y config.json se crean en el directorio actual al importar los módulos
+    os.chdir(workdir)
+    sys.path.insert(0, SRC_DIR)
+    with open("config.json", "w") as f:
+        json.dump(dict(args.config, sync_folder="", clients=[]), f)
+
+    source = os.path.join(workdir, "source")
+    print(f"Generando la carga '{args.workload}' ({files} archivos) en {source}...")
+    paths = generate_workload(source, spec, files, args.size, args.compressible, args.seed)
+
+    runs = []
+    try:
+        for run_index in range(args.runs):
+            result = run_once(workdir, paths, source, receivers, args.config, run_index)
+            runs.append(result)
+            print(
+                f"Pasada {run_index + 1}/{args.runs}: {result['mb_per_s']:.1f} MB/s, "
+                f"{result['files_per_s']:.1f} archivos/s, p50 {result['latency_p50_s'] * 1000:.1f} ms, "
+                f"p99 {result['latency_p99_s'] * 1000:.1f} ms, {result['failures']} fallos"
+            )
+    finally:
+        if not args.workdir:
+            os.chdir(REPO_ROOT)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workload": args.workload,
+        "params": {
+            "files": files, "size": args.size, "receivers": receivers, "seed": args.seed,
+            "compressible": args.compressible, "config": args.config,
+        },
+        "runs": runs,
+        "summary": {
+            key: statistics.median(run[key] for run in runs)
+            for key in ("mb_per_s", "files_per_s", "latency_p50_s", "latency_p99_s")
+        } if runs else {},
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Resultados guardados en {output}")
+    else:
+        print(json.dumps(report, indent=4))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Medida del arranque en frío del modo sin ventana (python src/main.py --headless).
+
+Lanza el programa varias veces en una carpeta temporal propia y mide el tiempo hasta
+que el receptor acepta conexiones y el tiempo que tarda en terminar tras SIGTERM.
+Comprueba además, con -X importtime, que no se carga tkinter y cuáles son las
+importaciones más lentas, para vigilar que el arranque no empeore entre commits.
+
+Uso (desde la raíz del repositorio):
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 20 --sync-active --output arranque.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from loopback import REPO_ROOT, free_port, git_commit, percentile
+
+MAIN = os.path.join(REPO_ROOT, "src", "main.py")
+READY_TIMEOUT = 30.0   # Segundos máximos de espera a que el receptor escuche
+POLL_INTERVAL = 0.002  # Cada cuánto se intenta conectar con el receptor
+
+
+def wait_for_port(port, process, timeout):
+    """Espera a que el puerto acepte conexiones; devuelve False si el proceso termina antes."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return True
+        except OSError:
+            time.sleep(POLL_INTERVAL)
+    return False
+
+
+def write_config(workdir, sync_active):
+    """Crea config.json y la carpeta de sincronización; devuelve el puerto del receptor."""
+    folder = os.path.join(workdir, "folder")
+    os.makedirs(folder, exist_ok=True)
+    port = free_port()
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump({"sync_folder": folder, "sync_active": sync_active, "clients": [], "receiver_port": port}, f)
+    return port
+
+
+def run_once(workdir, sync_active):
+    """Arranca y detiene el programa una vez; devuelve (segundos hasta escuchar, segundos hasta terminar)."""
+    port = write_config(workdir, sync_active)
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, MAIN, "--headless"], cwd=workdir,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(port, process, READY_TIMEOUT):
+            raise RuntimeError(f"El programa no empezó a escuchar (código de salida {process.poll()}).")
+        ready = time.perf_counter() - start
+        stop = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=READY_TIMEOUT)
+        return ready, time.perf_counter() - stop
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def import_profile(workdir, top):
+    """
+    Importa los módulos del modo sin ventana con -X importtime.
+
+    :return: Tupla (se cargó tkinter, [(módulo, microsegundos acumulados)] de las top importaciones más lentas).
+    """
+    code = "import main"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=workdir,
+                            env=dict(os.environ, PYTHONPATH=os.path.dirname(MAIN)),
+                            capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            modules.append((parts[2].strip(), int(parts[1])))
+    tkinter_loaded = any(name == "tkinter" or name.startswith("tkinter.") for name, _ in modules)
+    return tkinter_loaded, sorted(modules, key=lambda item: item[1], reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arranque en frío del modo sin ventana.")
+    parser.add_argument("--runs", type=int, default=10, help="Repeticiones de la medida.")
+    parser.add_argument("--sync-active", action="store_true", help="Arrancar con la sincronización activa.")
+    parser.add_argument("--top", type=int, default=10, help="Importaciones más lentas a mostrar.")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="sync-startup-")
+    try:
+        write_config(workdir, args.sync_active)
+        tkinter_loaded, slowest = import_profile(workdir, args.top)
+        runs = []
+        for run_index in range(args.runs):
+            ready, stop = run_once(workdir, args.sync_active)
+            runs.append({"ready_s": ready, "stop_s": stop})
+            print(f"Pasada {run_index + 1}/{args.runs}: listo en {ready * 1000:.0f} ms, "
+                  f"detenido en {stop * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    ready_times = [run["ready_s"] for run in runs]
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"runs": args.runs, "sync_active": args.sync_active},
+        "tkinter_loaded": tkinter_loaded,
+        "slowest_imports_us": slowest,
+        "runs": runs,
+        "summary": {
+            "ready_p50_s": statistics.median(ready_times),
+            "ready_p99_s": percentile(ready_times, 0.99),
+            "stop_p50_s": statistics.median(run["stop_s"] for run in runs),
+        } if runs else {},
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Resultados guardados en {os.path.abspath(args.output)}")
+    else:
+        print(json.dumps(report, indent=4))
+    if tkinter_loaded:
+        print("Aviso: el modo sin ventana está cargando tkinter.", file=sys.stderr)
+    return report
+
+
+if __name__ == "__main__":
+    main()
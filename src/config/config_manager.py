@@ -1,45 +1,130 @@
+import copy
 import json
 import os
+import shutil
+import tempfile
+import threading
+import time
 
 CONFIG_FILE = "config.json"
+CHECK_INTERVAL = 0.5  # Segundos mínimos entre comprobaciones de cambios en config.json
 
 class ConfigurationManager:
+    # Caché compartida por todo el proceso. Solo se vuelve a leer config.json cuando
+    # cambian su fecha de modificación o su tamaño, o cuando se llama a invalidate().
+    _cache = None          # Último diccionario leído (no se entrega directamente a quien llama)
+    _cache_stamp = None    # (mtime_ns, tamaño) de config.json cuando se leyó
+    _clients = ()          # Tupla inmutable de clientes: se lee sin bloqueos en la ruta caliente
+    _next_check = 0.0      # Instante (monotonic) de la próxima comprobación de cambios
+    _lock = threading.RLock()
+
     @staticmethod
     def load_config():
         """
         Carga la configuración desde el archivo config.json.
         Si el archivo no existe, crea uno con valores por defecto.
+
+        Devuelve una copia de la configuración en caché, que quien llama puede modificar
+        libremente; el archivo solo se vuelve a leer si cambió desde la última lectura.
         """
-        if not os.path.exists(CONFIG_FILE):
-            default_config = {
-                "sync_folder": "",
-                "clients": []
-            }
-            ConfigurationManager.save_config(default_config)
-            return default_config
-
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError as e:
-            print(f"Error al leer el archivo de configuración: {e}")
-            return {
-                "sync_folder": "",
-                "clients": []
-            }
+        ConfigurationManager._refresh(force=True)
+        return copy.deepcopy(ConfigurationManager._cache)
+
+    @staticmethod
+    def get_clients():
+        """
+        Devuelve la lista de clientes configurados, pensada para llamarse por cada archivo.
+
+        No abre ni bloquea nada mientras la configuración no cambie: como mucho comprueba
+        la fecha de config.json cada CHECK_INTERVAL segundos. La tupla devuelta y sus
+        diccionarios son compartidos y no deben modificarse.
+        """
+        if time.monotonic() >= ConfigurationManager._next_check:
+            ConfigurationManager._refresh()
+        return ConfigurationManager._clients
+
+    @staticmethod
+    def invalidate():
+        """Descarta la caché para que la próxima lectura vuelva a cargar config.json."""
+        with ConfigurationManager._lock:
+            ConfigurationManager._cache_stamp = None
+            ConfigurationManager._next_check = 0.0
+
+    @staticmethod
+    def _refresh(force=False):
+        """Vuelve a leer config.json si cambió (o si no hay nada en caché)."""
+        with ConfigurationManager._lock:
+            now = time.monotonic()
+            if not force and now < ConfigurationManager._next_check:
+                return
+            ConfigurationManager._next_check = now + CHECK_INTERVAL
+
+            try:
+                st = os.stat(CONFIG_FILE)
+            except FileNotFoundError:
+                default_config = {
+                    "sync_folder": "",
+                    "clients": []
+                }
+                ConfigurationManager.save_config(default_config)
+                if ConfigurationManager._cache is None:  # No se pudo guardar
+                    ConfigurationManager._set_cache(default_config, None)
+                return
+
+            stamp = (st.st_mtime_ns, st.st_size)
+            if ConfigurationManager._cache is not None and stamp == ConfigurationManager._cache_stamp:
+                return
+
+            try:
+                with open(CONFIG_FILE, "r") as f:
+                    config = json.load(f)
+            except json.JSONDecodeError as e:
+                print(f"Error al leer el archivo de configuración: {e}")
+                if ConfigurationManager._cache is not None:
+                    return  # Se conserva la última configuración válida
+                config = {
+                    "sync_folder": "",
+                    "clients": []
+                }
+            ConfigurationManager._set_cache(config, stamp)
+
+    @staticmethod
+    def _set_cache(config, stamp):
+        ConfigurationManager._cache = copy.deepcopy(config)
+        ConfigurationManager._clients = tuple(ConfigurationManager._cache.get("clients", []))
+        ConfigurationManager._cache_stamp = stamp
 
     @staticmethod
     def save_config(config):
         """
         Guarda la configuración en el archivo config.json.
 
+        La escritura es atómica: se escribe un archivo temporal en la misma carpeta y se
+        renombra sobre config.json, de modo que un lector nunca ve un JSON a medio escribir.
+
         :param config: Diccionario con la configuración a guardar.
         """
-        try:
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(config, f, indent=4)
-        except Exception as e:
-            print(f"Error al guardar la configuración: {e}")
+        with ConfigurationManager._lock:
+            temp_path = None
+            try:
+                directory = os.path.dirname(os.path.abspath(CONFIG_FILE))
+                fd, temp_path = tempfile.mkstemp(prefix=".config.", suffix=".tmp", dir=directory)
+                with os.fdopen(fd, "w") as f:
+                    json.dump(config, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(CONFIG_FILE):
+                    shutil.copymode(CONFIG_FILE, temp_path)  # mkstemp crea el archivo con permisos 0600
+                os.replace(temp_path, CONFIG_FILE)
+                temp_path = None
+
+                st = os.stat(CONFIG_FILE)
+                ConfigurationManager._set_cache(config, (st.st_mtime_ns, st.st_size))
+            except Exception as e:
+                print(f"Error al guardar la configuración: {e}")
+            finally:
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
 
     @staticmethod
     def add_client(host, port):
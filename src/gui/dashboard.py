@@ -0,0 +1,167 @@
+import time
+import tkinter as tk
+from tkinter import ttk
+from metrics import EVENTS
+from metrics.events import SEND, RECEIVE
+
+REFRESH_INTERVAL_MS = 250    # Cada cuánto se leen los eventos de las transferencias
+MAX_ROWS = 100               # Transferencias en curso que se muestran a la vez
+MAX_RECENT_ROWS = 200        # Líneas de la lista de eventos recientes
+THROUGHPUT_SMOOTHING = 0.3   # Peso de la última medida en la media móvil de la velocidad
+BAR_WIDTH = 20               # Caracteres de la barra de progreso de cada fila
+
+
+def format_bytes(amount):
+    """Convierte un número de bytes en un texto legible (KB, MB, GB)."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if amount < 1024 or unit == "GB":
+            return f"{amount:.0f} {unit}" if unit == "B" else f"{amount:.1f} {unit}"
+        amount /= 1024
+
+
+class TransferDashboard(ttk.Frame):
+    """
+    Panel con las transferencias en curso, su progreso, la velocidad y los eventos recientes.
+
+    Los hilos de red nunca tocan Tk: anotan sus eventos en metrics.EVENTS, y este panel los
+    lee desde el hilo de Tk cada REFRESH_INTERVAL_MS con after(). Como EVENTS acumula el
+    estado entre dos lecturas, cada refresco cuesta lo mismo haya habido diez eventos o
+    diez mil, y como mucho se muestran MAX_ROWS filas.
+    """
+
+    def __init__(self, parent, events=EVENTS, refresh_ms=REFRESH_INTERVAL_MS):
+        """
+        :param parent: Widget contenedor (por ejemplo, una pestaña del Notebook).
+        :param events: TransferEvents de los que leer.
+        :param refresh_ms: Milisegundos entre dos refrescos.
+        """
+        super().__init__(parent)
+        self.events = events
+        self.refresh_ms = refresh_ms
+        self._rows = {}       # id de transferencia -> (fila del Treeview, bytes hechos, bytes totales)
+        self._rates = {SEND: 0.0, RECEIVE: 0.0}
+        self._last_totals = None
+        self._last_time = None
+        self._after_id = None
+
+        self._build()
+        self.events.enable()
+        self.bind("<Destroy>", self._on_destroy)
+        self._schedule()
+
+    def _build(self):
+        """Crea los widgets del panel."""
+        summary = ttk.Frame(self)
+        summary.pack(fill="x", padx=10, pady=(10, 5))
+        self.send_rate_var = tk.StringVar(value="Envío: 0 B/s")
+        self.receive_rate_var = tk.StringVar(value="Recepción: 0 B/s")
+        self.active_var = tk.StringVar(value="En curso: 0")
+        for variable in (self.send_rate_var, self.receive_rate_var, self.active_var):
+            ttk.Label(summary, textvariable=variable).pack(side="left", padx=(0, 20))
+        self.total_progress = ttk.Progressbar(self, mode="determinate", maximum=100)
+        self.total_progress.pack(fill="x", padx=10, pady=5)
+
+        columns = ("direction", "peer", "file", "progress", "speed")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=10)
+        for column, title, width in (
+            ("direction", "Sentido", 80), ("peer", "Equipo", 140), ("file", "Archivo", 260),
+            ("progress", "Progreso", 230), ("speed", "Velocidad", 100),
+        ):
+            self.tree.heading(column, text=title)
+            self.tree.column(column, width=width, anchor="w")
+        self.tree.pack(fill="both", expand=True, padx=10, pady=5)
+
+        ttk.Label(self, text="Eventos recientes").pack(anchor="w", padx=10)
+        recent = ttk.Frame(self)
+        recent.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.recent = tk.Listbox(recent, height=8)
+        scrollbar = ttk.Scrollbar(recent, orient="vertical", command=self.recent.yview)
+        self.recent.configure(yscrollcommand=scrollbar.set)
+        self.recent.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+    def _schedule(self):
+        self._after_id = self.after(self.refresh_ms, self._refresh)
+
+    def _refresh(self):
+        """Lee lo que cambió desde el refresco anterior y actualiza los widgets."""
+        try:
+            snapshot = self.events.drain(max_new=MAX_ROWS - len(self._rows))
+            now = time.monotonic()
+            self._update_rows(snapshot, now)
+            self._update_summary(snapshot, now)
+            self._add_recent(snapshot["recent"], snapshot["dropped"])
+        finally:
+            self._schedule()
+
+    def _update_rows(self, snapshot, now):
+        for transfer in snapshot["updated"]:
+            values = self._row_values(transfer, now)
+            entry = self._rows.get(transfer["id"])
+            if entry is None:
+                row = self.tree.insert("", "end", values=values)
+            else:
+                row = entry[0]
+                self.tree.item(row, values=values)
+            self._rows[transfer["id"]] = (row, transfer["done"], transfer["size"])
+        for transfer_id in snapshot["finished"]:
+            entry = self._rows.pop(transfer_id, None)
+            if entry:
+                self.tree.delete(entry[0])
+
+    @staticmethod
+    def _row_values(transfer, now):
+        size, done = transfer["size"], transfer["done"]
+        fraction = min(1.0, done / size) if size else 1.0
+        filled = int(fraction * BAR_WIDTH)
+        bar = "█" * filled + "░" * (BAR_WIDTH - filled)
+        elapsed = now - transfer["started"]
+        speed = f"{format_bytes(done / elapsed)}/s" if elapsed > 0 else ""
+        return (
+            "Envío" if transfer["direction"] == SEND else "Recepción",
+            transfer["peer"],
+            transfer["path"],
+            f"{bar} {fraction * 100:.0f}% de {format_bytes(size)}",
+            speed,
+        )
+
+    def _update_summary(self, snapshot, now):
+        totals = snapshot["totals"]
+        if self._last_totals is not None and now > self._last_time:
+            for direction in (SEND, RECEIVE):
+                rate = (totals[direction] - self._last_totals[direction]) / (now - self._last_time)
+                self._rates[direction] += THROUGHPUT_SMOOTHING * (rate - self._rates[direction])
+        self._last_totals, self._last_time = totals, now
+
+        self.send_rate_var.set(f"Envío: {format_bytes(self._rates[SEND])}/s")
+        self.receive_rate_var.set(f"Recepción: {format_bytes(self._rates[RECEIVE])}/s")
+        hidden = snapshot["active"] - len(self._rows)
+        self.active_var.set(f"En curso: {snapshot['active']}" + (f" ({hidden} sin mostrar)" if hidden > 0 else ""))
+
+        total_size = sum(size for _, _, size in self._rows.values())
+        total_done = sum(min(done, size) for _, done, size in self._rows.values())
+        self.total_progress["value"] = 100 * total_done / total_size if total_size else 0
+
+    def _add_recent(self, recent, dropped):
+        if not recent and not dropped:
+            return
+        at_bottom = self.recent.yview()[1] >= 0.999
+        if dropped:
+            self.recent.insert("end", f"… {dropped} eventos omitidos")
+        for stamp, message, ok in recent[-MAX_RECENT_ROWS:]:
+            self.recent.insert("end", f"{time.strftime('%H:%M:%S', time.localtime(stamp))}  {message}")
+            if not ok:
+                self.recent.itemconfigure("end", foreground="red")
+        excess = self.recent.size() - MAX_RECENT_ROWS
+        if excess > 0:
+            self.recent.delete(0, excess - 1)
+        if at_bottom:
+            self.recent.see("end")
+
+    def _on_destroy(self, event):
+        if event.widget is not self:
+            return
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        self.events.disable()
@@ -1,11 +1,20 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
+from tkinter import filedialog
 from config import ConfigurationManager
+from .dashboard import TransferDashboard
 
 class SyncApp:
-    def __init__(self, root):
+    def __init__(self, root, start_sync=None, stop_sync=None):
+        """
+        :param root: Ventana principal de Tkinter.
+        :param start_sync: Función que inicia la sincronización (botón "Iniciar sincronización").
+        :param stop_sync: Función que la detiene (botón "Detener sincronización").
+        """
         self.root = root
+        self.start_sync = start_sync
+        self.stop_sync = stop_sync
         self.root.title("Sync Manager")
         self.config = ConfigurationManager.load_config()
 
@@ -15,8 +24,13 @@ class SyncApp:
 
         # Crear las pestañas
         self.create_sync_tab()
+        self.create_transfers_tab()
         self.create_config_tab()
 
+    def run(self):
+        """Muestra la ventana y atiende sus eventos hasta que se cierra."""
+        self.root.mainloop()
+
     def create_sync_tab(self):
         """Crear la pestaña para sincronización"""
         sync_tab = ttk.Frame(self.notebook)
@@ -32,6 +46,11 @@ class SyncApp:
         tk.Button(sync_tab, text="Seleccionar carpeta", command=self._select_folder).pack(pady=5)
         tk.Button(sync_tab, text="Guardar configuración", command=self._save_config).pack(pady=5)
 
+    def create_transfers_tab(self):
+        """Crear la pestaña con el panel de transferencias en curso"""
+        self.dashboard = TransferDashboard(self.notebook)
+        self.notebook.add(self.dashboard, text="Transferencias")
+
     def create_config_tab(self):
         """Crear la pestaña para configuración"""
         config_tab = ttk.Frame(self.notebook)
@@ -55,14 +74,18 @@ class SyncApp:
         messagebox.showinfo("Información", "Configuración guardada correctamente.")
 
     def _start_sync(self):
-        """Inicia la sincronización (simulado en este caso)."""
+        """Inicia la sincronización."""
+        if self.start_sync:
+            self.start_sync()
         messagebox.showinfo("Sincronización", "Sincronización iniciada exitosamente.")
 
     def _stop_sync(self):
-        """Detiene la sincronización (simulado en este caso)."""
+        """Detiene la sincronización."""
+        if self.stop_sync:
+            self.stop_sync()
         messagebox.showinfo("Sincronización", "Sincronización detenida exitosamente.")
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = SyncApp(root)
-    root.mainloop()
+    app.run()
@@ -1,24 +1,193 @@
+import atexit
+import getpass
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import socket
+import threading
 from datetime import datetime
 
+LOG_QUEUE_SIZE = 10000  # Registros que pueden esperar en memoria a ser escritos
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Encola los registros para el hilo escritor sin bloquear nunca a quien registra.
+    Si la cola está llena, el registro se descarta y se cuenta; en cuanto vuelve a haber
+    sitio se anota un aviso con el número de registros perdidos.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            if self.dropped:
+                self._report_dropped()
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def _report_dropped(self):
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        warning = logging.makeLogRecord({
+            "name": "log", "levelno": logging.WARNING, "levelname": "WARNING",
+            "msg": f"Se descartaron {dropped} mensajes de la bitácora por saturación."
+        })
+        try:
+            self.queue.put_nowait(warning)
+        except queue.Full:
+            # El aviso tampoco cabe: se devuelven los descartes al contador para el próximo aviso
+            with self._dropped_lock:
+                self.dropped += dropped
+            raise
+
+
+class _JsonFormatter(logging.Formatter):
+    """Formato estructurado: un objeto JSON por línea, para el recolector de bitácoras."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "user": Logger.get_user(),
+            "host": Logger.get_host(),
+            "pid": record.process,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
 class Logger:
     """
     Clase para manejar el registro de eventos y errores del sistema.
+
+    Todos los módulos registran a través de una única cola en memoria, acotada, que
+    vacía un hilo escritor en segundo plano. Así ni el monitor ni los hilos de red
+    esperan nunca a que se escriba en disco o en la consola.
     """
     LOG_FILE = "log.txt"  # Archivo donde se almacenarán los logs
+    # Bitácoras propias de cada módulo (nombre del logger -> archivo)
+    MODULE_LOG_FILES = {
+        "sync": "sync_log.txt",
+        "receiver": "client_log.txt",
+    }
+
+    _queue_handler = None
+    _listener = None
+    _handlers = []
+    _json_format = False
+    _user = None
+    _host = None
+    _lock = threading.Lock()
 
     @staticmethod
-    def configure_logger():
+    def configure_logger(json_format=None, queue_size=LOG_QUEUE_SIZE):
         """
-        Configura el sistema de logging para usar un archivo con un formato estándar.
+        Configura el sistema de logging: una cola acotada y un hilo que escribe en los archivos.
+        Se puede llamar varias veces; las siguientes llamadas solo cambian el formato.
+
+        :param json_format: True para escribir una línea JSON por registro (None mantiene el formato actual).
+        :param queue_size: Número máximo de registros pendientes de escribir.
         """
-        logging.basicConfig(
-            filename=Logger.LOG_FILE,
-            level=logging.INFO,  # Nivel mínimo de registro
-            format="%(asctime)s - %(levelname)s - %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S"
-        )
+        with Logger._lock:
+            if json_format is not None and json_format != Logger._json_format:
+                Logger._json_format = json_format
+                for handler, text_format in Logger._handlers:
+                    handler.setFormatter(Logger._formatter(text_format))
+            if Logger._listener is not None:
+                return
+
+            log_queue = queue.Queue(maxsize=queue_size)
+            Logger._handlers = Logger._build_handlers()
+            Logger._listener = logging.handlers.QueueListener(
+                log_queue, *(handler for handler, _ in Logger._handlers), respect_handler_level=True
+            )
+            Logger._queue_handler = _DroppingQueueHandler(log_queue)
+
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(Logger._queue_handler)
+            root.setLevel(logging.INFO)  # Nivel mínimo de registro
+
+            Logger._listener.start()
+            atexit.register(Logger.shutdown)
+
+    @staticmethod
+    def _build_handlers():
+        """Crea los destinos de la bitácora, cada uno con su formato de texto original."""
+        handlers = [(logging.FileHandler(Logger.LOG_FILE), "%(asctime)s - %(levelname)s - %(message)s")]
+        for name, file_name in Logger.MODULE_LOG_FILES.items():
+            module_handler = logging.FileHandler(file_name)
+            module_handler.addFilter(logging.Filter(name))
+            handlers.append((module_handler, "%(asctime)s - %(message)s"))
+
+        # Los módulos de red también muestran sus mensajes por consola
+        console = logging.StreamHandler()
+        console.addFilter(lambda record: record.name in Logger.MODULE_LOG_FILES)
+        handlers.append((console, "%(asctime)s - %(message)s"))
+
+        for handler, text_format in handlers:
+            handler.setFormatter(Logger._formatter(text_format))
+        return handlers
+
+    @staticmethod
+    def _formatter(text_format):
+        if Logger._json_format:
+            return _JsonFormatter()
+        return logging.Formatter(text_format, datefmt="%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def shutdown():
+        """Escribe los registros pendientes y detiene el hilo escritor."""
+        with Logger._lock:
+            listener, Logger._listener = Logger._listener, None
+        if listener is not None:
+            listener.stop()
+
+    @staticmethod
+    def get_logger(name):
+        """
+        Devuelve el logger de un módulo, asegurando que la bitácora está configurada.
+        :param name: Nombre del módulo ("sync", "receiver", ...).
+        """
+        Logger.configure_logger()
+        return logging.getLogger(name)
+
+    @staticmethod
+    def dropped_records():
+        """Número de registros descartados por saturación que aún no se han notificado."""
+        return Logger._queue_handler.dropped if Logger._queue_handler else 0
+
+    @staticmethod
+    def get_user():
+        """Usuario del sistema operativo (se consulta una sola vez)."""
+        if Logger._user is None:
+            try:
+                Logger._user = os.getlogin()
+            except OSError:
+                # Sin terminal asociada (servicio, contenedor...): usar las variables de entorno
+                try:
+                    Logger._user = getpass.getuser()
+                except Exception:
+                    Logger._user = "desconocido"
+        return Logger._user
+
+    @staticmethod
+    def get_host():
+        """Nombre del equipo (se consulta una sola vez)."""
+        if Logger._host is None:
+            Logger._host = socket.gethostname()
+        return Logger._host
 
     @staticmethod
     def log_info(message):
@@ -45,8 +214,7 @@ class Logger:
         try:
             file_name = os.path.basename(file_path)
             extension = os.path.splitext(file_name)[1]  # Obtener la extensión del archivo
-            user = os.getlogin()  # Obtener el usuario del sistema operativo
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            user = Logger.get_user()  # Usuario del sistema operativo (en caché)
 
             message = f"Se ha agregado el nuevo archivo {file_name} (usuario: {user}, extensión: {extension})"
             logging.info(message)
@@ -1,108 +1,133 @@
+import time
+
+_STARTED_AT = time.perf_counter()  # Antes de cualquier otra importación, para medir el arranque completo
+
+import argparse
+import os
+import signal
+import sys
+import threading
 from config import ConfigurationManager
 from log import Logger
-from sync import SyncManager, FileReceiver
-from monitor import FolderMonitor
-from gui import SyncApp
-import threading
-from tkinter import filedialog, Tk
+from service import SyncService
+
+SIGNAL_POLL_INTERVAL = 1.0  # Cada cuánto revisa el modo sin ventana si llegó una señal
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sincronización de carpetas entre equipos.")
+    parser.add_argument("--headless", action="store_true",
+                        help="Ejecutar sin interfaz gráfica (servicio del sistema); no importa tkinter.")
+    parser.add_argument("--folder", help="Carpeta de sincronización (se guarda en config.json).")
+    return parser.parse_args(argv)
 
-def main():
+
+def main(argv=None):
     """
     Punto de entrada principal del programa.
-    Orquesta la inicialización de módulos y la GUI.
+    Orquesta la inicialización de módulos y, si no se pide el modo sin ventana, la GUI.
+
+    :return: Código de salida del proceso.
     """
-    # Configurar el logger
-    Logger.configure_logger()
-    Logger.log_info("El sistema está iniciando...")
+    args = parse_args(argv)
 
     # Cargar configuración inicial
     config = ConfigurationManager.load_config()
-    sync_folder = config.get("sync_folder", "")
-    sync_active = config.get("sync_active", False)
 
-    # Inicializar y ejecutar el cliente para recibir archivos
+    # Configurar el logger (texto o JSON por líneas, según la configuración)
+    Logger.configure_logger(json_format=config.get("log_format") == "json")
+    Logger.log_info("El sistema está iniciando...")
+
+    headless = args.headless or not _display_available()
+    if not args.headless and headless:
+        Logger.log_info("No hay pantalla disponible; se ejecuta sin interfaz gráfica.")
+
+    if args.folder:
+        config["sync_folder"] = os.path.abspath(args.folder)
+        ConfigurationManager.save_config(config)
+        Logger.log_info(f"Carpeta de sincronización configurada: {config['sync_folder']}")
+
+    if headless:
+        return run_headless(config)
+    return run_gui(config)
+
+
+def run_headless(config):
+    """
+    Ejecuta el servicio sin interfaz gráfica hasta recibir SIGINT o SIGTERM.
+    SIGHUP vuelve a leer config.json sin reiniciar.
+    """
+    if not config.get("sync_folder"):
+        Logger.log_error("No se ha configurado una carpeta de sincronización. Terminando el programa.")
+        print("Error: configure sync_folder en config.json o indique --folder.", file=sys.stderr)
+        return 2
+
+    # Los manejadores solo anotan la señal; el trabajo se hace en el bucle principal
+    stop_requested = threading.Event()
+    reload_requested = threading.Event()
+
+    def on_stop(signum, frame):
+        Logger.log_info(f"Señal {signal.Signals(signum).name} recibida; deteniendo el servicio.")
+        stop_requested.set()
+
+    signal.signal(signal.SIGINT, on_stop)
+    signal.signal(signal.SIGTERM, on_stop)
+    if hasattr(signal, "SIGHUP"):  # No existe en Windows
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload_requested.set())
+
+    service = SyncService(config, started_at=_STARTED_AT)
+    service.start()
     try:
-        print(f"Cliente iniciando en la carpeta de sincronización: {sync_folder}")
-        client = FileReceiver(sync_folder, port=5000)
-        client.start()
-    except Exception as e:
-        print(f"Error al iniciar el cliente: {e}")
-    # Inicializar la ventana Tkinter (root)
+        while not stop_requested.wait(SIGNAL_POLL_INTERVAL):
+            if reload_requested.is_set():
+                reload_requested.clear()
+                service.reload()
+    finally:
+        service.shutdown()
+    return 0
+
+
+def run_gui(config):
+    """Ejecuta el servicio con la interfaz gráfica; al cerrar la ventana se detiene todo."""
+    # Importaciones diferidas: tkinter y la GUI solo se cargan en este modo
+    from tkinter import Tk, filedialog
+    from gui import SyncApp
+
     root = Tk()
-    root.withdraw()  # Ocultar la ventana principal de Tkinter
 
     # Si no se ha configurado una carpeta, abrir la interfaz de selección
-    if not sync_folder:
+    if not config.get("sync_folder"):
         Logger.log_info("No se ha configurado una carpeta de sincronización. Solicitando al usuario.")
         print("No se ha configurado una carpeta de sincronización. Por favor, seleccione una.")
-
-        # Crear una ventana de selección de carpeta
+        root.withdraw()  # Ocultar la ventana principal mientras se elige la carpeta
         sync_folder = filedialog.askdirectory(title="Seleccione la carpeta de sincronización")
-
-        if sync_folder:  # Si se seleccionó una carpeta
-            config["sync_folder"] = sync_folder
-            ConfigurationManager.save_config(config)
-            Logger.log_info(f"Carpeta de sincronización configurada: {sync_folder}")
-        else:  # Si no se seleccionó una carpeta
+        if not sync_folder:
             Logger.log_error("El usuario no seleccionó una carpeta. Terminando el programa.")
             print("Error: Debe configurar una carpeta de sincronización para continuar.")
-            return
-
-    # Inicializar SyncManager con root
-    sync_manager = SyncManager(sync_folder)
-
-    # Iniciar monitor en un hilo separado
-    def monitor_thread():
-        try:
-            Logger.log_info(f"Iniciando el monitor en la carpeta: {sync_folder}")
-            FolderMonitor(sync_manager.sync_new_file).start(sync_folder)
-        except Exception as e:
-            Logger.log_error(f"Error en el monitor: {e}")
-
-    monitor_thread_running = False
-    monitor_thread_instance = None
-
-    # Iniciar GUI
-    def start_sync():
-        """
-        Inicia la sincronización activando el monitor.
-        """
-        nonlocal monitor_thread_running, monitor_thread_instance
-        if not monitor_thread_running:
-            config["sync_active"] = True
-            ConfigurationManager.save_config(config)
-            sync_manager.update_config()
-
-            # Iniciar el monitor en un hilo separado
-            monitor_thread_instance = threading.Thread(target=monitor_thread, daemon=True)
-            monitor_thread_instance.start()
-            monitor_thread_running = True
-
-            Logger.log_info("Sincronización iniciada.")
-
-    def stop_sync():
-        """
-        Detiene la sincronización y el monitor.
-        """
-        nonlocal monitor_thread_running, monitor_thread_instance
-        if monitor_thread_running:
-            config["sync_active"] = False
-            ConfigurationManager.save_config(config)
-            sync_manager.update_config()
-
-            # Detener el hilo del monitor
-            if monitor_thread_instance:
-                monitor_thread_instance.join(timeout=1)
-            monitor_thread_running = False
-
-            Logger.log_info("Sincronización detenida.")
-
-    # Iniciar la aplicación gráfica
-    app = SyncApp()
-    app.start_sync = start_sync
-    app.stop_sync = stop_sync
-    app.run()
+            root.destroy()
+            return 2
+        config["sync_folder"] = sync_folder
+        ConfigurationManager.save_config(config)
+        Logger.log_info(f"Carpeta de sincronización configurada: {sync_folder}")
+        root.deiconify()
+
+    service = SyncService(config, started_at=_STARTED_AT)
+    service.start()
+    try:
+        app = SyncApp(root, start_sync=service.start_sync, stop_sync=service.stop_sync)
+        app.run()
+    finally:
+        # Detener ordenadamente la recepción y la replicación al cerrar la aplicación
+        service.shutdown()
+    return 0
+
+
+def _display_available():
+    """Indica si se puede abrir una ventana (en Linux y similares hace falta DISPLAY o WAYLAND_DISPLAY)."""
+    if os.name == "nt" or sys.platform == "darwin":
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
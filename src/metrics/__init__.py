@@ -0,0 +1,10 @@
+from .metrics import MetricsRegistry, REGISTRY
+from .events import EVENTS, TransferEvents
+
+
+def __getattr__(name):
+    # El servidor HTTP se importa al usarlo: http.server arrastra ssl y alarga el arranque
+    if name == "MetricsServer":
+        from .server import MetricsServer
+        return MetricsServer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,156 @@
+"""
+Eventos de transferencia para la interfaz gráfica.
+
+Los hilos de red anotan aquí el inicio, el avance y el final de cada transferencia,
+y la GUI lo recoge periódicamente desde el hilo de Tk con drain(). Nada se encola
+por cada evento: el avance de una transferencia se acumula en su entrada (entre dos
+lecturas solo importa el último estado) y los mensajes recientes van a un búfer
+acotado, así que miles de eventos por segundo no hacen crecer la memoria ni obligan a
+la GUI a procesarlos uno a uno. Los productores nunca esperan a la GUI.
+
+Mientras nadie llama a enable() (modo sin ventana), todas las operaciones son nulas.
+"""
+
+import collections
+import itertools
+import threading
+import time
+
+DEFAULT_MAX_RECENT = 500  # Mensajes recientes que se conservan entre dos lecturas
+
+SEND = "send"
+RECEIVE = "receive"
+
+
+class TransferEvents:
+    """Estado compartido de las transferencias en curso, con lectura incremental para la GUI."""
+
+    def __init__(self, max_recent=DEFAULT_MAX_RECENT):
+        """
+        :param max_recent: Mensajes recientes que se conservan; si la GUI tarda más en leer, los
+                           más antiguos se descartan y se cuentan.
+        """
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._active = {}      # id -> {"id", "direction", "peer", "path", "size", "done", "started", "shown"}
+        self._changed = set()  # ids con cambios desde la última lectura
+        self._finished = []    # ids ya mostrados que terminaron desde la última lectura
+        self._recent = collections.deque(maxlen=max_recent)
+        self._recent_seq = 0   # Número del último mensaje anotado
+        self._read_seq = 0     # Número del último mensaje entregado a la GUI
+        self._totals = {SEND: 0, RECEIVE: 0}
+
+    def enable(self):
+        """Empieza a registrar eventos (lo llama la GUI al crear el panel)."""
+        self.enabled = True
+
+    def disable(self):
+        """Deja de registrar eventos y olvida el estado acumulado."""
+        self.enabled = False
+        with self._lock:
+            self._active.clear()
+            self._changed.clear()
+            self._finished.clear()
+            self._recent.clear()
+            self._read_seq = self._recent_seq
+
+    def begin(self, direction, peer, path, size, done=0):
+        """
+        Anota el inicio de una transferencia.
+
+        :param direction: SEND o RECEIVE.
+        :param peer: Cliente ("host:puerto") o dirección del emisor.
+        :param path: Ruta del archivo (la que viaja en las tramas).
+        :param size: Bytes totales del archivo.
+        :param done: Bytes que ya estaban transferidos (al reanudar).
+        :return: Identificador para progress() y end(), o None si los eventos están desactivados.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            transfer_id = next(self._ids)
+            self._active[transfer_id] = {
+                "id": transfer_id, "direction": direction, "peer": peer, "path": path,
+                "size": size, "done": done, "started": time.monotonic(), "shown": False,
+            }
+            self._changed.add(transfer_id)
+        return transfer_id
+
+    def progress(self, transfer_id, amount):
+        """Suma amount bytes transferidos (se puede llamar a la vez desde varios hilos)."""
+        if transfer_id is None:
+            return
+        with self._lock:
+            transfer = self._active.get(transfer_id)
+            if transfer is None:
+                return
+            transfer["done"] += amount
+            self._totals[transfer["direction"]] += amount
+            self._changed.add(transfer_id)
+
+    def end(self, transfer_id, ok, error=None):
+        """Anota el final de una transferencia y deja un mensaje en la lista de recientes."""
+        if transfer_id is None:
+            return
+        with self._lock:
+            transfer = self._active.pop(transfer_id, None)
+            if transfer is None:
+                return
+            self._changed.discard(transfer_id)
+            if transfer["shown"]:
+                self._finished.append(transfer_id)
+            verb = "Enviado" if transfer["direction"] == SEND else "Recibido"
+            arrow = "a" if transfer["direction"] == SEND else "de"
+            text = f"{verb} '{transfer['path']}' {arrow} {transfer['peer']}"
+            self._add_recent(f"{text}: {error}" if error else text, ok)
+
+    def note(self, message, ok=True):
+        """Deja un mensaje en la lista de recientes (paquetes, deltas, archivos ya actualizados...)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._add_recent(message, ok)
+
+    def drain(self, max_new=None):
+        """
+        Devuelve lo que cambió desde la lectura anterior. Pensado para el temporizador de la GUI.
+
+        :param max_new: Transferencias nuevas que la GUI puede mostrar todavía (None: todas). Las
+                        que no caben se entregan en una lectura posterior, si siguen en curso.
+        :return: Diccionario con "updated" (copias de las transferencias mostradas que cambiaron
+                 o que se muestran por primera vez), "finished" (ids mostrados que terminaron),
+                 "recent" (lista de (instante, mensaje, ok)), "dropped" (mensajes descartados),
+                 "active" (transferencias en curso) y "totals" (bytes por dirección).
+        """
+        with self._lock:
+            updated, pending = [], set()
+            for transfer_id in self._changed:
+                transfer = self._active[transfer_id]
+                if not transfer["shown"]:
+                    if max_new is not None and max_new <= 0:
+                        pending.add(transfer_id)
+                        continue
+                    transfer["shown"] = True
+                    if max_new is not None:
+                        max_new -= 1
+                updated.append(dict(transfer))
+            self._changed = pending
+            finished, self._finished = self._finished, []
+
+            new = self._recent_seq - self._read_seq
+            recent = list(self._recent)[-new:] if new else []
+            dropped = new - len(recent)
+            self._read_seq = self._recent_seq
+            return {
+                "updated": updated, "finished": finished, "recent": recent, "dropped": dropped,
+                "active": len(self._active), "totals": dict(self._totals),
+            }
+
+    def _add_recent(self, message, ok):
+        self._recent.append((time.time(), message, ok))
+        self._recent_seq += 1
+
+
+# Eventos compartidos por todo el proceso
+EVENTS = TransferEvents()
@@ -0,0 +1,187 @@
+import bisect
+import math
+import threading
+
+# Límites (en segundos) de los histogramas de latencia por defecto
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class _Metric:
+    """Base de las métricas: guarda un valor por combinación de etiquetas."""
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"La métrica {self.name} espera las etiquetas {self.labelnames}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Devuelve [(etiquetas, valor)] con una copia consistente de los valores."""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Counter(_Metric):
+    """Contador que solo crece (bytes enviados, archivos, errores...)."""
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja (profundidad de una cola, conexiones activas...)."""
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function, **labels):
+        """Calcula el valor al leerlo, llamando a function() (sin coste en la ruta caliente)."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+            functions = list(self._functions.items())
+        values = dict(items)
+        for key, function in functions:
+            try:
+                values[key] = function()
+            except Exception:
+                continue
+        return [(dict(zip(self.labelnames, key)), value) for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    """Distribución de observaciones (latencias) en intervalos acumulados, como en Prometheus."""
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        """Devuelve [(etiquetas, {"buckets": {límite: acumulado}, "sum", "count"})]."""
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        result = []
+        for key, (counts, total, count) in items:
+            cumulative, running = {}, 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                running += bucket_count
+                cumulative[bound] = running
+            result.append((dict(zip(self.labelnames, key)), {"buckets": cumulative, "sum": total, "count": count}))
+        return result
+
+
+class MetricsRegistry:
+    """
+    Registro de todas las métricas del proceso.
+
+    Actualizar una métrica cuesta un acceso a diccionario bajo un bloqueo propio de esa
+    métrica, así que la instrumentación puede quedarse activa en producción.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"La métrica {name} ya existe con otro tipo.")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def snapshot(self):
+        """
+        Devuelve el estado actual de todas las métricas.
+
+        :return: Diccionario {nombre: {"type", "help", "samples": [(etiquetas, valor)]}}.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {"type": metric.type_name, "help": metric.documentation, "samples": metric.samples()}
+            for metric in metrics
+        }
+
+    def render_prometheus(self):
+        """Devuelve todas las métricas en el formato de texto de Prometheus."""
+        lines = []
+        for name, metric in sorted(self.snapshot().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for labels, value in metric["samples"]:
+                if metric["type"] == "histogram":
+                    for bound, count in value["buckets"].items():
+                        le = "+Inf" if bound == math.inf else repr(float(bound))
+                        lines.append(f"{name}_bucket{_labels(dict(labels, le=le))} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {value['sum']}")
+                    lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+# Registro global usado por SyncManager, FileReceiver y el monitor
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,68 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .metrics import REGISTRY
+
+DEFAULT_HOST = "127.0.0.1"  # Solo accesible desde el propio equipo
+DEFAULT_PORT = 9100
+
+
+class MetricsServer:
+    """
+    Servidor HTTP local que publica las métricas del proceso.
+
+    GET /metrics devuelve el formato de texto de Prometheus y GET /snapshot el mismo
+    contenido en JSON. Atiende cada petición en su propio hilo, fuera de la ruta de
+    replicación.
+    """
+
+    def __init__(self, registry=REGISTRY, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        :param registry: Registro de métricas a publicar.
+        :param host: Dirección en la que escuchar.
+        :param port: Puerto en el que escuchar (0 para que el sistema elija uno libre).
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Empieza a escuchar en un hilo en segundo plano."""
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body = registry.render_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/snapshot":
+                    body = json.dumps(registry.snapshot(), default=str).encode("utf-8")
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Las consultas periódicas no se anotan en la bitácora
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Deja de escuchar y libera el puerto."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
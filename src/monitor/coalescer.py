@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+
+DEFAULT_QUIET_WINDOW = 1.0   # Segundos sin eventos antes de considerar que un archivo terminó de escribirse
+DEFAULT_BATCH_SIZE = 100     # Archivos máximos por lote entregado
+
+
+class EventCoalescer:
+    """
+    Agrupa los eventos de creación/modificación/movimiento por ruta y entrega los
+    archivos en lotes cuando terminan de escribirse.
+
+    Una copia grande genera un evento de creación y muchos de modificación; aquí se
+    fusionan en una sola entrada por ruta. Un archivo solo se entrega cuando pasó
+    quiet_window sin eventos y su tamaño y fecha de modificación no cambiaron entre
+    dos comprobaciones consecutivas.
+    """
+
+    def __init__(self, callback, quiet_window=DEFAULT_QUIET_WINDOW, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        :param callback: Función que recibe una lista de rutas listas para replicar y otra, paralela,
+                         con el instante (time.monotonic) del primer evento de cada ruta.
+        :param quiet_window: Segundos de calma exigidos desde el último evento de una ruta.
+        :param batch_size: Número máximo de rutas por llamada a callback.
+        """
+        self.callback = callback
+        self.quiet_window = quiet_window
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = max(0.05, quiet_window / 4)
+        # ruta -> [instante del último evento, (tamaño, mtime_ns) de la última comprobación, instante del primer evento]
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Inicia el hilo que comprueba y entrega los archivos pendientes."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="event-coalescer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo de entrega. Los archivos aún pendientes se descartan."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def add(self, path):
+        """Registra un evento sobre una ruta, reiniciando su ventana de calma."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.get(path)
+            if entry:
+                entry[0] = now
+            else:
+                self._pending[path] = [now, None, now]
+
+    def discard(self, path):
+        """Olvida una ruta pendiente (por ejemplo, porque se eliminó) y todo lo que cuelgue de ella."""
+        prefix = path.rstrip("/\\") + os.sep
+        with self._lock:
+            for pending in [p for p in self._pending if p == path or p.startswith(prefix)]:
+                del self._pending[pending]
+
+    def move(self, src_path, dest_path):
+        """
+        Traslada a la nueva ruta lo que hubiera pendiente en la ruta original o, si es una
+        carpeta, dentro de ella.
+
+        :return: True si había algo pendiente.
+        """
+        prefix = src_path.rstrip("/\\") + os.sep
+        with self._lock:
+            now = time.monotonic()
+            moved = [p for p in self._pending if p == src_path or p.startswith(prefix)]
+            for path in moved:
+                entry = self._pending.pop(path)
+                entry[0] = now
+                self._pending[dest_path + path[len(src_path):]] = entry
+            return bool(moved)
+
+    def pending_count(self):
+        """Número de rutas a la espera de terminar de escribirse."""
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            ready, detected_at = self._collect_ready()
+            for start in range(0, len(ready), self.batch_size):
+                try:
+                    self.callback(ready[start:start + self.batch_size], detected_at[start:start + self.batch_size])
+                except Exception as e:
+                    print(f"Error al entregar un lote de archivos: {e}")
+
+    def _collect_ready(self):
+        """Devuelve (y retira) las rutas cuya escritura terminó, junto con el instante de su primer evento."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [path for path, entry in self._pending.items()
+                          if now - entry[0] >= self.quiet_window]
+
+        ready = []
+        detected_at = []
+        for path in candidates:
+            try:
+                st = os.stat(path)
+                stamp = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                stamp = None  # Ya no existe: se descarta
+
+            with self._lock:
+                entry = self._pending.get(path)
+                if entry is None or now - entry[0] < self.quiet_window:
+                    continue  # Llegó otro evento mientras tanto
+                if stamp is None:
+                    del self._pending[path]
+                elif entry[1] == stamp:
+                    del self._pending[path]
+                    ready.append(path)
+                    detected_at.append(entry[2])
+                else:
+                    entry[1] = stamp  # Sigue cambiando o es la primera comprobación: volver a mirar
+        return ready, detected_at
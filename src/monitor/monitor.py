@@ -1,30 +1,116 @@
+import os
 import time
-from watchdog.observers import Observer 
+from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from metrics import REGISTRY
+from .coalescer import EventCoalescer, DEFAULT_QUIET_WINDOW, DEFAULT_BATCH_SIZE
+
+PENDING_EVENTS = REGISTRY.gauge("monitor_pending_files", "Archivos con eventos a la espera de terminar de escribirse.")
 
 class FolderMonitor:
-    def __init__(self, folder_path):
+    def __init__(self, folder_path, on_files_ready=None, on_deleted_callback=None,
+                 quiet_window=DEFAULT_QUIET_WINDOW, batch_size=DEFAULT_BATCH_SIZE, ignore=None,
+                 on_moved_callback=None, on_dir_created_callback=None):
+        """
+        :param folder_path: Carpeta a monitorear (de forma recursiva).
+        :param on_files_ready: Función que recibe lotes (listas) de archivos nuevos o modificados
+                               que ya terminaron de escribirse, y la lista con el instante
+                               (time.monotonic) del primer evento de cada uno.
+        :param on_deleted_callback: Función que recibe la ruta de cada archivo o carpeta eliminado.
+        :param quiet_window: Segundos sin eventos antes de entregar un archivo.
+        :param batch_size: Número máximo de archivos por lote.
+        :param ignore: Función que recibe una ruta y devuelve True si sus eventos deben ignorarse
+                       (por ejemplo, archivos temporales).
+        :param on_moved_callback: Función que recibe (ruta anterior, ruta nueva) de cada archivo o
+                                  carpeta renombrado o movido dentro de la carpeta. Sin ella, el
+                                  destino se trata como archivo nuevo y el origen como eliminado.
+        :param on_dir_created_callback: Función que recibe la ruta de cada carpeta creada.
+        """
         self.folder_path = folder_path
+        self.on_files_ready = on_files_ready
+        self.on_deleted_callback = on_deleted_callback
+        self.on_moved_callback = on_moved_callback
+        self.on_dir_created_callback = on_dir_created_callback
+        self.ignore = ignore or (lambda path: False)
+        self.coalescer = EventCoalescer(self._dispatch, quiet_window, batch_size)
         self.observer = Observer()
 
     def start(self):
         if not self.folder_path:
             raise ValueError("No se ha configurado una carpeta para monitorear.")
-        
+
         event_handler = FileSystemEventHandler()
         event_handler.on_created = self._on_created
+        event_handler.on_deleted = self._on_deleted
+        event_handler.on_modified = self._on_modified
+        event_handler.on_moved = self._on_moved
         self.observer.schedule(event_handler, self.folder_path, recursive=True)
+        PENDING_EVENTS.set_function(self.coalescer.pending_count)
+        self.coalescer.start()
         self.observer.start()
 
     def stop(self):
         self.observer.stop()
         self.observer.join()
+        self.coalescer.stop()
+
+    def _dispatch(self, file_paths, detected_at):
+        if self.on_files_ready:
+            self.on_files_ready(file_paths, detected_at)
 
     def _on_created(self, event):
-        print(f"Archivo creado: {event.src_path}")
+        if self.ignore(event.src_path):
+            return
+        if not event.is_directory:
+            self.coalescer.add(event.src_path)
+            return
+        if self.on_dir_created_callback:
+            self.on_dir_created_callback(event.src_path)
+        if not event.is_synthetic:
+            # Una carpeta traída de fuera llega con un solo evento: su contenido se recorre aquí
+            # (los eventos sintéticos ya son el contenido de otra carpeta recorrida por watchdog)
+            for directory, subdirs, files in os.walk(event.src_path):
+                if self.on_dir_created_callback:
+                    for name in subdirs:
+                        self.on_dir_created_callback(os.path.join(directory, name))
+                for name in files:
+                    path = os.path.join(directory, name)
+                    if not self.ignore(path):
+                        self.coalescer.add(path)
 
     def _on_deleted(self, event):
+        if self.ignore(event.src_path):
+            return
         print(f"Archivo eliminado: {event.src_path}")
+        self.coalescer.discard(event.src_path)
+        if self.on_deleted_callback:
+            self.on_deleted_callback(event.src_path)
 
     def _on_modified(self, event):
-        print(f"Archivo modificado: {event.src_path}")
+        if not event.is_directory and not self.ignore(event.src_path):
+            self.coalescer.add(event.src_path)
+
+    def _on_moved(self, event):
+        src_path, dest_path = event.src_path, event.dest_path
+        if self.ignore(src_path):
+            # Un temporal que pasa a su nombre definitivo equivale a un archivo nuevo
+            if not event.is_directory and not self.ignore(dest_path):
+                self.coalescer.add(dest_path)
+            return
+        if self.ignore(dest_path):
+            # Pasa a tener nombre de temporal: para los demás equipos es como si se eliminara
+            self.coalescer.discard(src_path)
+            if self.on_deleted_callback:
+                self.on_deleted_callback(src_path)
+            return
+
+        # Lo pendiente de escribirse sigue pendiente con su nuevo nombre
+        self.coalescer.move(src_path, dest_path)
+        if event.is_synthetic:
+            return  # Contenido de una carpeta movida: ya lo cubre el movimiento de la carpeta
+        if self.on_moved_callback:
+            self.on_moved_callback(src_path, dest_path)
+        elif not event.is_directory:
+            self.coalescer.add(dest_path)
+            if self.on_deleted_callback:
+                self.on_deleted_callback(src_path)
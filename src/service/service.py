@@ -0,0 +1,177 @@
+import threading
+import time
+from config import ConfigurationManager
+from log import Logger
+from metrics import REGISTRY
+from sync import SyncManager, FileReceiver
+from sync.manifest import FileManifest, MANIFEST_FILE
+from sync.protocol import DEFAULT_BUFFER_SIZE
+from sync.receiver import DEFAULT_MAX_CONNECTIONS, DEFAULT_READ_TIMEOUT
+from sync.durability import DEFAULT_FSYNC, DEFAULT_GROUP_COMMIT_MS, DEFAULT_GROUP_COMMIT_FILES
+from sync.pipeline import DEFAULT_DISK_WRITERS, DEFAULT_PIPELINE_DEPTH
+from sync.resume import DEFAULT_RESUME_MIN_SIZE, DEFAULT_CHECKPOINT_INTERVAL
+
+DEFAULT_RECEIVER_PORT = 5000
+RECEIVER_READY_TIMEOUT = 5.0  # Segundos que se espera a que el receptor empiece a escuchar
+STOP_TIMEOUT = 5.0            # Segundos que se espera a que el receptor termine al detener el servicio
+
+STARTUP_SECONDS = REGISTRY.gauge(
+    "process_startup_seconds", "Segundos desde el arranque del proceso hasta que el servicio quedó listo."
+)
+
+class SyncService:
+    """
+    Reúne el receptor (FileReceiver), el emisor (SyncManager), el monitor de la carpeta y
+    el servidor de métricas. No depende de la interfaz gráfica: lo usan igual el modo
+    sin ventana (servicio del sistema) y la GUI.
+    """
+
+    def __init__(self, config, started_at=None):
+        """
+        :param config: Configuración cargada con ConfigurationManager.load_config() (con sync_folder).
+        :param started_at: Instante (time.perf_counter) en que arrancó el proceso, para medir el arranque.
+        """
+        self.config = config
+        self.sync_folder = config.get("sync_folder", "")
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.manifest = None
+        self.receiver = None
+        self.sync_manager = None
+        self.metrics_server = None
+        self.folder_monitor = None
+        self._lock = threading.Lock()  # Serializa start_sync / stop_sync (GUI, señales)
+
+    def log_event(self, message):
+        """Registra eventos en la bitácora."""
+        Logger.log_info(message)
+
+    def log_error(self, error):
+        """Registra errores en la bitácora."""
+        Logger.log_error(f"Error: {error}")
+
+    def start(self):
+        """
+        Arranca la recepción, la replicación y, si estaba activa al cerrar, la sincronización.
+
+        :return: Segundos transcurridos desde el arranque del proceso hasta quedar listo.
+        """
+        # Índice de contenido compartido por el emisor y el receptor
+        self.manifest = FileManifest(self.sync_folder, self.config.get("manifest_path", MANIFEST_FILE))
+        self._start_receiver()
+        self._start_metrics()
+        self.sync_manager = SyncManager(self.sync_folder, manifest=self.manifest)
+
+        # Reanudar la sincronización si estaba activa al cerrar el programa
+        if self.config.get("sync_active", False):
+            self.start_sync()
+
+        if self.receiver and not self.receiver.ready.wait(RECEIVER_READY_TIMEOUT):
+            self.log_error("El receptor no empezó a escuchar a tiempo.")
+        elapsed = time.perf_counter() - self.started_at
+        STARTUP_SECONDS.set(elapsed)
+        self.log_event(f"Servicio listo en {elapsed * 1000:.0f} ms.")
+        return elapsed
+
+    def _start_receiver(self):
+        """Inicia el cliente que recibe archivos en un hilo propio (FileReceiver.start bloquea)."""
+        config = self.config
+        try:
+            self.receiver = FileReceiver(
+                self.sync_folder,
+                manifest=self.manifest,
+                port=config.get("receiver_port", DEFAULT_RECEIVER_PORT),
+                max_connections=config.get("receiver_max_connections", DEFAULT_MAX_CONNECTIONS),
+                read_timeout=config.get("receiver_read_timeout", DEFAULT_READ_TIMEOUT),
+                buffer_size=config.get("buffer_size", DEFAULT_BUFFER_SIZE),
+                preallocate=config.get("preallocate", True),
+                socket_buffer_size=config.get("socket_buffer_size"),
+                resume_min_size=config.get("resume_min_size", DEFAULT_RESUME_MIN_SIZE),
+                checkpoint_interval=config.get("checkpoint_interval", DEFAULT_CHECKPOINT_INTERVAL),
+                allow_relay=config.get("receiver_allow_relay", True),
+                disk_writers=config.get("disk_writers", DEFAULT_DISK_WRITERS),
+                pipeline_depth=config.get("pipeline_depth", DEFAULT_PIPELINE_DEPTH),
+                fsync=config.get("fsync", DEFAULT_FSYNC),
+                group_commit_ms=config.get("group_commit_ms", DEFAULT_GROUP_COMMIT_MS),
+                group_commit_files=config.get("group_commit_files", DEFAULT_GROUP_COMMIT_FILES)
+            )
+            threading.Thread(target=self.receiver.start, name="receiver", daemon=True).start()
+        except Exception as e:
+            self.log_error(f"No se pudo iniciar el cliente de recepción: {e}")
+            self.receiver = None
+
+    def _start_metrics(self):
+        """Publica las métricas por HTTP si se configuró un puerto (metrics_port)."""
+        if not self.config.get("metrics_port"):
+            return
+        # El servidor HTTP se importa solo si se usa (http.server arrastra ssl y alarga el arranque)
+        from metrics.server import MetricsServer, DEFAULT_HOST
+        try:
+            self.metrics_server = MetricsServer(
+                host=self.config.get("metrics_host", DEFAULT_HOST), port=int(self.config["metrics_port"])
+            )
+            self.metrics_server.start()
+            server = self.metrics_server
+            self.log_event(f"Métricas disponibles en http://{server.host}:{server.port}/metrics")
+        except Exception as e:
+            self.log_error(f"No se pudo iniciar el servidor de métricas: {e}")
+            self.metrics_server = None
+
+    def start_sync(self):
+        """Inicia la sincronización: monitor de la carpeta y reconciliación de lo cambiado mientras estaba detenida."""
+        with self._lock:
+            if self.folder_monitor:
+                return
+            self._set_active(True)
+            try:
+                self.log_event(f"Iniciando el monitor en la carpeta: {self.sync_folder}")
+                monitor = self.sync_manager.create_monitor(self.config)
+                monitor.start()
+                self.folder_monitor = monitor
+            except Exception as e:
+                self.log_error(f"Error en el monitor: {e}")
+                return
+
+            # Replicar lo que cambió mientras la sincronización estaba detenida
+            threading.Thread(target=self.sync_manager.reconcile, name="reconcile", daemon=True).start()
+            self.log_event("Sincronización iniciada.")
+
+    def stop_sync(self, persist=True):
+        """
+        Detiene la sincronización y el monitor.
+
+        :param persist: Guardar en config.json que la sincronización quedó detenida
+                        (False al cerrar el programa, para reanudarla en el próximo arranque).
+        """
+        with self._lock:
+            if not self.folder_monitor:
+                return
+            if persist:
+                self._set_active(False)
+            monitor, self.folder_monitor = self.folder_monitor, None
+            monitor.stop()
+            self.log_event("Sincronización detenida.")
+
+    def reload(self):
+        """Vuelve a leer config.json y aplica los parámetros de replicación que pueden cambiar en caliente."""
+        ConfigurationManager.invalidate()
+        self.config = ConfigurationManager.load_config()
+        if self.sync_manager:
+            self.sync_manager.update_config()
+        self.log_event("Configuración recargada.")
+
+    def shutdown(self):
+        """Detiene ordenadamente la sincronización, la recepción, la replicación y las métricas."""
+        self.stop_sync(persist=False)
+        if self.receiver:
+            self.receiver.stop(timeout=STOP_TIMEOUT)
+        if self.sync_manager:
+            # Lo que quede sin enviar sigue en el diario de envíos y se reintenta al arrancar
+            self.sync_manager.shutdown(wait=False)
+        if self.metrics_server:
+            self.metrics_server.stop()
+        self.log_event("Servicio detenido.")
+
+    def _set_active(self, active):
+        self.config["sync_active"] = active
+        ConfigurationManager.save_config(self.config)
+        self.sync_manager.update_config()
@@ -0,0 +1,195 @@
+"""
+Compresión adaptativa de las transferencias.
+
+El emisor decide por archivo si merece la pena comprimir, según la extensión y una
+prueba rápida de compresibilidad sobre una muestra. El contenido comprimido viaja en
+trozos con prefijo de longitud (!I) de como mucho MAX_CHUNK_SIZE bytes, terminados por un
+trozo de longitud 0, de modo que ni el emisor ni el receptor necesitan tener el archivo
+entero en memoria.
+"""
+
+import os
+import struct
+import zlib
+
+IDENTITY = "identity"
+CHUNK_HEADER = struct.Struct("!I")
+MAX_CHUNK_SIZE = 4 * 1024 * 1024  # Longitud máxima de un trozo comprimido (el receptor rechaza los mayores)
+CHUNK_READ_SIZE = 64 * 1024       # Bytes que el descompresor de zstd pide cada vez a la fuente
+
+SAMPLE_SIZE = 64 * 1024        # Bytes que se comprimen para estimar la compresibilidad
+MIN_SAVING_RATIO = 0.9         # Solo se comprime si la muestra queda por debajo de este ratio
+DEFAULT_MIN_SIZE = 4 * 1024    # Por debajo de este tamaño no compensa comprimir
+
+# Formatos que ya van comprimidos: comprimirlos de nuevo solo gasta CPU
+COMPRESSED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".mp3", ".mp4", ".m4a", ".mkv", ".avi", ".mov",
+    ".webm", ".ogg", ".flac", ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".zst", ".jar",
+    ".docx", ".xlsx", ".pptx", ".odt", ".pdf",
+}
+# Formatos de texto que casi siempre comprimen bien: no hace falta la prueba
+TEXT_EXTENSIONS = {
+    ".txt", ".csv", ".tsv", ".log", ".json", ".xml", ".html", ".htm", ".md", ".sql", ".yaml", ".yml",
+    ".ini", ".cfg", ".py", ".js", ".css",
+}
+
+
+def file_extension(file_path):
+    """Devuelve la extensión de un archivo (con el punto)."""
+    return os.path.splitext(os.path.basename(file_path))[1]
+
+
+def _zstd():
+    """Importa zstandard solo si está instalado (dependencia opcional)."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def available_encodings():
+    """Devuelve los códecs disponibles en este equipo, del preferido al menos preferido."""
+    encodings = []
+    if _zstd():
+        encodings.append("zstd")
+    encodings.append("zlib")
+    try:
+        import lzma  # noqa: F401  (puede faltar en algunas compilaciones de Python)
+        encodings.append("lzma")
+    except ImportError:
+        pass
+    return encodings
+
+
+def choose_encoding(file_path, size, peer_encodings, mode="auto", min_size=DEFAULT_MIN_SIZE):
+    """
+    Decide el códec con el que enviar un archivo.
+
+    :param file_path: Ruta del archivo.
+    :param size: Tamaño del archivo en bytes.
+    :param peer_encodings: Códecs que acepta el receptor.
+    :param mode: "off" para no comprimir nunca, "auto" para usar el mejor códec común,
+                 o el nombre de un códec concreto.
+    :param min_size: Tamaño mínimo para considerar la compresión.
+    :return: Nombre del códec o IDENTITY.
+    """
+    if mode == "off" or size < min_size:
+        return IDENTITY
+    if mode == "auto":
+        encoding = next((e for e in available_encodings() if e in peer_encodings), None)
+    else:
+        encoding = mode if mode in peer_encodings and mode in available_encodings() else None
+    if encoding is None:
+        return IDENTITY
+
+    extension = file_extension(file_path).lower()
+    if extension in COMPRESSED_EXTENSIONS:
+        return IDENTITY
+    if extension in TEXT_EXTENSIONS:
+        return encoding
+
+    # Prueba rápida: comprimir una muestra con el nivel más barato
+    try:
+        with open(file_path, "rb") as f:
+            sample = f.read(SAMPLE_SIZE)
+    except OSError:
+        return IDENTITY
+    if sample and len(zlib.compress(sample, 1)) < len(sample) * MIN_SAVING_RATIO:
+        return encoding
+    return IDENTITY
+
+
+def compressor(encoding, level=None):
+    """Devuelve un compresor en flujo con los métodos compress(data) y flush()."""
+    if encoding == "zlib":
+        return zlib.compressobj(6 if level is None else level)
+    if encoding == "lzma":
+        import lzma
+        return lzma.LZMACompressor(preset=1 if level is None else level)
+    if encoding == "zstd":
+        return _zstd().ZstdCompressor(level=3 if level is None else level).compressobj()
+    raise ValueError(f"Códec de compresión no soportado: {encoding}")
+
+
+class StreamDecoder:
+    """
+    Descompresor en flujo que entrega la salida en trozos de como mucho max_output bytes,
+    para que un archivo muy compresible no se expanda de golpe en memoria.
+    """
+
+    def __init__(self, encoding, max_output):
+        self.encoding = encoding
+        self.max_output = max_output
+        if encoding == "zlib":
+            self._decoder = zlib.decompressobj()
+        elif encoding == "lzma":
+            import lzma
+            self._decoder = lzma.LZMADecompressor()
+        elif encoding == "zstd" and _zstd():
+            self._decoder = _zstd().ZstdDecompressor()
+        else:
+            raise ValueError(f"Códec de compresión no soportado: {encoding}")
+
+    def decode(self, read_chunk):
+        """
+        Descomprime un flujo de trozos y devuelve un iterador con los trozos de salida.
+
+        :param read_chunk: Función que devuelve el siguiente trozo comprimido, o b"" al final.
+        """
+        if self.encoding == "zstd":
+            # El descompresor de zstandard no limita la salida de cada llamada; su lector sí,
+            # pero es él quien pide la entrada, así que se le da una fuente que la va leyendo
+            source = _ChunkSource(read_chunk)
+            with self._decoder.stream_reader(source, read_size=CHUNK_READ_SIZE, closefd=False) as reader:
+                while out := reader.read(self.max_output):
+                    yield out
+            while source.read(CHUNK_READ_SIZE):
+                pass  # Consumir hasta el trozo final para que la conexión siga alineada
+            return
+        while chunk := read_chunk():
+            yield from self._feed(chunk)
+        if self.encoding == "zlib":
+            tail = self._decoder.flush()
+            if tail:
+                yield tail
+
+    def _feed(self, data):
+        """Descomprime data (zlib o lzma) y devuelve un iterador con los trozos de salida."""
+        if self.encoding == "zlib":
+            while data:
+                out = self._decoder.decompress(data, self.max_output)
+                if out:
+                    yield out
+                data = self._decoder.unconsumed_tail
+        else:
+            out = self._decoder.decompress(data, self.max_output)
+            if out:
+                yield out
+            while not self._decoder.needs_input and not self._decoder.eof:
+                out = self._decoder.decompress(b"", self.max_output)
+                if not out:
+                    break
+                yield out
+
+
+class _ChunkSource:
+    """Presenta una sucesión de trozos (read_chunk) como un archivo con read(n) para zstandard."""
+
+    def __init__(self, read_chunk):
+        self._read_chunk = read_chunk
+        self._pending = memoryview(b"")
+        self._done = False
+
+    def read(self, size=-1):
+        while not self._pending and not self._done:
+            chunk = self._read_chunk()
+            if chunk:
+                self._pending = memoryview(chunk)
+            else:
+                self._done = True
+        if size < 0:
+            size = len(self._pending)
+        out = bytes(self._pending[:size])
+        self._pending = self._pending[size:]
+        return out
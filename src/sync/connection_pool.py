@@ -0,0 +1,106 @@
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_MAX_IDLE_PER_PEER = 4     # Conexiones ociosas que se conservan por cliente
+DEFAULT_IDLE_TIMEOUT = 60.0       # Segundos que una conexión ociosa puede esperar a ser reutilizada
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones TCP persistentes, agrupadas por cliente (host, puerto).
+
+    Las ráfagas de archivos reutilizan las conexiones ya abiertas en lugar de pagar
+    un saludo TCP (y el arranque lento de la ventana) por cada archivo.
+    """
+
+    def __init__(self, max_idle_per_peer=DEFAULT_MAX_IDLE_PER_PEER, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 socket_buffer_size=None):
+        """
+        :param max_idle_per_peer: Conexiones ociosas que se conservan por cliente.
+        :param idle_timeout: Segundos tras los que una conexión ociosa se descarta.
+        :param socket_buffer_size: Tamaño de SO_SNDBUF en bytes (None para dejar el ajuste automático del sistema).
+        """
+        self.max_idle_per_peer = max_idle_per_peer
+        self.idle_timeout = idle_timeout
+        self.socket_buffer_size = socket_buffer_size
+        self._idle = {}  # (host, port) -> lista de (socket, instante en que quedó libre)
+        self._lock = threading.Lock()
+
+    def acquire(self, host, port, connect_timeout=None, send_timeout=None):
+        """
+        Devuelve una conexión con el cliente, reutilizando una ociosa si sigue viva.
+
+        :param connect_timeout: Segundos para conectar si hay que abrir una conexión nueva.
+        :param send_timeout: Tiempo de espera que se fija en el socket devuelto.
+        """
+        key = (host, port)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    break
+                sock, released_at = idle.pop()
+            if time.monotonic() - released_at < self.idle_timeout and self._is_alive(sock):
+                sock.settimeout(send_timeout)
+                return sock
+            self.discard(sock)
+
+        sock = socket.create_connection(key, timeout=connect_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.socket_buffer_size:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.socket_buffer_size)
+        sock.settimeout(send_timeout)
+        return sock
+
+    def release(self, host, port, sock):
+        """Devuelve una conexión sana al pool para que otro envío la reutilice."""
+        with self._lock:
+            idle = self._idle.setdefault((host, port), [])
+            if len(idle) < self.max_idle_per_peer:
+                idle.append((sock, time.monotonic()))
+                return
+        self.discard(sock)
+
+    def discard(self, sock):
+        """Cierra una conexión que no debe volver al pool."""
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    @contextmanager
+    def connection(self, host, port, connect_timeout=None, send_timeout=None):
+        """
+        Gestor de contexto que presta una conexión del pool.
+        Si el bloque lanza una excepción, la conexión se descarta porque el flujo puede haber quedado a medias.
+        """
+        sock = self.acquire(host, port, connect_timeout, send_timeout)
+        try:
+            yield sock
+        except BaseException:
+            self.discard(sock)
+            raise
+        self.release(host, port, sock)
+
+    def close_all(self):
+        """Cierra todas las conexiones ociosas."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for sock, _ in connections:
+                self.discard(sock)
+
+    @staticmethod
+    def _is_alive(sock):
+        """
+        Comprueba que el otro extremo no cerró la conexión mientras estaba ociosa.
+        Una conexión sana no debe tener nada pendiente de leer entre tramas.
+        """
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
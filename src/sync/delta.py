@@ -0,0 +1,207 @@
+"""
+Transferencia diferencial al estilo rsync.
+
+El receptor divide su copia del archivo en bloques y envía, por cada bloque, una
+firma débil (suma rodante tipo Adler) y una firma fuerte (BLAKE2b de 16 bytes).
+El emisor recorre su versión con la suma rodante, byte a byte, y genera una lista
+de operaciones: referencias a bloques que el receptor ya tiene y bytes literales
+para lo que cambió. Así los bytes enviados dependen del tamaño del cambio y no del
+tamaño del archivo.
+
+Formato de las operaciones:
+
+    b"C" + !QI  -> copiar `count` bloques del archivo base a partir del bloque `start`
+    b"D" + !I   -> seguido de `length` bytes literales
+"""
+
+import hashlib
+import math
+import mmap
+import struct
+import time
+from itertools import accumulate
+
+MIN_BLOCK_SIZE = 4 * 1024
+MAX_BLOCK_SIZE = 1024 * 1024
+MAX_LITERAL_SIZE = 1024 * 1024  # Los literales largos se trocean para acotar la memoria del receptor
+DEADLINE_CHECK_BYTES = 64 * 1024  # Cada cuántos bytes recorridos se comprueba el plazo del delta
+
+SIGNATURE = struct.Struct("!I16s")
+COPY_OP = struct.Struct("!QI")
+DATA_OP = struct.Struct("!I")
+OP_COPY = b"C"
+OP_DATA = b"D"
+
+
+def choose_block_size(file_size):
+    """Elige un tamaño de bloque proporcional a la raíz del tamaño del archivo (como rsync)."""
+    size = int(math.sqrt(file_size)) // 1024 * 1024
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, size))
+
+
+def weak_checksum(block):
+    """Suma débil de un bloque: a = suma de bytes, b = suma de las sumas parciales (ambas mod 2^16)."""
+    a = sum(block)
+    b = sum(accumulate(block))
+    return a & 0xFFFF, b & 0xFFFF
+
+
+def strong_checksum(block):
+    """Firma fuerte de un bloque."""
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+
+def compute_signatures(file_path, block_size):
+    """
+    Calcula las firmas de todos los bloques completos de un archivo.
+
+    :return: bytes con una firma SIGNATURE por bloque, en orden.
+    """
+    signatures = bytearray()
+    with open(file_path, "rb") as f:
+        while len(block := f.read(block_size)) == block_size:
+            a, b = weak_checksum(block)
+            signatures += SIGNATURE.pack(a | (b << 16), strong_checksum(block))
+    return bytes(signatures)
+
+
+def _signature_table(signatures):
+    """Agrupa las firmas por suma débil: {débil: [(índice, fuerte), ...]}."""
+    table = {}
+    for index, (weak, strong) in enumerate(SIGNATURE.iter_unpack(signatures)):
+        table.setdefault(weak, []).append((index, strong))
+    return table
+
+
+def compute_delta(file_path, signatures, block_size, out, max_literal=None, deadline=None):
+    """
+    Escribe en out las operaciones que reconstruyen file_path a partir del archivo
+    cuyas firmas se recibieron.
+
+    :param file_path: Versión nueva del archivo (local).
+    :param signatures: Firmas del archivo base, tal como las devuelve compute_signatures.
+    :param block_size: Tamaño de bloque usado para las firmas.
+    :param out: Archivo binario abierto para escritura.
+    :param max_literal: Si los bytes literales superan este límite se abandona el delta.
+    :param deadline: Instante (time.monotonic) a partir del cual se abandona el delta; el
+                     recorrido byte a byte es lento y el receptor no espera indefinidamente.
+    :return: Número de bytes literales incluidos en el delta, o None si se superó max_literal
+             o el plazo.
+    """
+    table = _signature_table(signatures)
+    literal_bytes = 0
+    pending_copy = None  # [bloque inicial, número de bloques] de la racha de copias en curso
+
+    def flush_copy():
+        nonlocal pending_copy
+        if pending_copy:
+            out.write(OP_COPY + COPY_OP.pack(*pending_copy))
+            pending_copy = None
+
+    def emit_literal(data):
+        nonlocal literal_bytes
+        if not data:
+            return
+        flush_copy()
+        for start in range(0, len(data), MAX_LITERAL_SIZE):
+            piece = data[start:start + MAX_LITERAL_SIZE]
+            out.write(OP_DATA + DATA_OP.pack(len(piece)))
+            out.write(piece)
+        literal_bytes += len(data)
+
+    def emit_copy(index):
+        nonlocal pending_copy
+        if pending_copy and pending_copy[0] + pending_copy[1] == index:
+            pending_copy[1] += 1
+        else:
+            flush_copy()
+            pending_copy = [index, 1]
+
+    with open(file_path, "rb") as f:
+        length = f.seek(0, 2)
+        if length == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if not table or length < block_size:
+                if max_literal is not None and length > max_literal:
+                    return None
+                emit_literal(data[:])
+                return literal_bytes
+
+            position = 0
+            literal_start = 0
+            next_check = DEADLINE_CHECK_BYTES
+            a, b = weak_checksum(data[0:block_size])
+            while position + block_size <= length:
+                if deadline is not None and position >= next_check:
+                    if time.monotonic() > deadline:
+                        return None
+                    next_check = position + DEADLINE_CHECK_BYTES
+                candidates = table.get(a | (b << 16))
+                if candidates:
+                    strong = strong_checksum(data[position:position + block_size])
+                    match = next((index for index, digest in candidates if digest == strong), None)
+                    if match is not None:
+                        emit_literal(data[literal_start:position])
+                        emit_copy(match)
+                        position += block_size
+                        literal_start = position
+                        if position + block_size <= length:
+                            a, b = weak_checksum(data[position:position + block_size])
+                        continue
+
+                if max_literal is not None and literal_bytes + position - literal_start > max_literal:
+                    return None
+
+                # Desplazar la ventana un byte actualizando la suma rodante
+                if position + block_size < length:
+                    old = data[position]
+                    a = (a - old + data[position + block_size]) & 0xFFFF
+                    b = (b - block_size * old + a) & 0xFFFF
+                position += 1
+
+            emit_literal(data[literal_start:length])
+    flush_copy()
+    if max_literal is not None and literal_bytes > max_literal:
+        return None
+    return literal_bytes
+
+
+def apply_delta(base_file, read, delta_size, out, block_size):
+    """
+    Reconstruye un archivo aplicando un delta sobre la copia base.
+
+    :param base_file: Archivo base abierto en modo binario de lectura.
+    :param read: Función read(n) que devuelve exactamente n bytes del delta.
+    :param delta_size: Longitud total del delta en bytes.
+    :param out: Archivo de destino abierto para escritura binaria.
+    :param block_size: Tamaño de bloque usado para las firmas.
+    :return: Objeto hashlib.sha256 con el contenido reconstruido.
+    """
+    digest = hashlib.sha256()
+    remaining = delta_size
+    while remaining:
+        op = read(1)
+        if op == OP_COPY:
+            start, count = COPY_OP.unpack(read(COPY_OP.size))
+            remaining -= 1 + COPY_OP.size
+            base_file.seek(start * block_size)
+            for _ in range(count):
+                block = base_file.read(block_size)
+                if len(block) != block_size:
+                    raise ValueError(f"El delta referencia un bloque inexistente ({start}).")
+                out.write(block)
+                digest.update(block)
+        elif op == OP_DATA:
+            (length,) = DATA_OP.unpack(read(DATA_OP.size))
+            if length > MAX_LITERAL_SIZE:
+                raise ValueError(f"Literal demasiado grande en el delta: {length} bytes.")
+            data = read(length)
+            out.write(data)
+            digest.update(data)
+            remaining -= 1 + DATA_OP.size + length
+        else:
+            raise ValueError(f"Operación de delta desconocida: {op!r}.")
+        if remaining < 0:
+            raise ValueError("El delta es más largo de lo anunciado.")
+    return digest
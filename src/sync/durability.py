@@ -0,0 +1,151 @@
+"""
+Política de volcado a disco (fsync) de los archivos recibidos.
+
+Cada archivo recibido se escribe en un temporal junto al definitivo y se publica
+renombrándolo. Sin fsync, la confirmación al emisor puede llegar antes de que los datos
+estén en disco, y una caída del sistema puede dejar el archivo vacío o a medias. La
+política ("fsync" en config.json) elige entre velocidad y seguridad ante caídas:
+
+    "none"   No se fuerza el volcado (lo hace el sistema operativo cuando quiera).
+    "file"   Antes de publicar cada archivo se vuelca su contenido y, después, su carpeta.
+    "group"  Volcado en grupo: los archivos que terminan a la vez se vuelcan y publican
+             juntos, cada group_commit_ms milisegundos o cada group_commit_files archivos,
+             con un solo volcado por carpeta. La confirmación espera a su grupo, y las
+             escrituras seguidas en disco se agrupan en menos confirmaciones del diario
+             del sistema de archivos.
+
+Con "file" y "group" el emisor solo recibe la confirmación cuando el archivo ya está en
+disco con su nombre definitivo.
+"""
+
+import os
+import threading
+import time
+
+FSYNC_NONE = "none"
+FSYNC_FILE = "file"
+FSYNC_GROUP = "group"
+FSYNC_POLICIES = (FSYNC_NONE, FSYNC_FILE, FSYNC_GROUP)
+
+DEFAULT_FSYNC = FSYNC_NONE
+DEFAULT_GROUP_COMMIT_MS = 20       # Espera máxima de un archivo a que se vuelque su grupo
+DEFAULT_GROUP_COMMIT_FILES = 64    # Archivos a partir de los cuales se vuelca el grupo sin esperar
+
+
+def fsync_path(path, directory=False):
+    """Vuelca a disco un archivo (o, con directory=True, las entradas de una carpeta)."""
+    if directory and os.name == "nt":
+        return  # En Windows no se pueden abrir carpetas para volcarlas
+    # En Windows, fsync necesita el archivo abierto para escritura
+    flags = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) if directory else os.O_RDWR
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Durability:
+    """
+    Publica los archivos recibidos según la política de volcado. Con "group", un hilo
+    propio vuelca y publica los grupos, y cada llamada espera a que termine el suyo.
+    """
+
+    def __init__(self, policy=DEFAULT_FSYNC, group_commit_ms=DEFAULT_GROUP_COMMIT_MS,
+                 group_commit_files=DEFAULT_GROUP_COMMIT_FILES):
+        """
+        :param policy: "none", "file" o "group".
+        :param group_commit_ms: Milisegundos máximos que un archivo espera a su grupo.
+        :param group_commit_files: Archivos por grupo a partir de los cuales no se espera más.
+        :raises ValueError: Si la política no es válida.
+        """
+        if policy not in FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync no válida: {policy!r} (se admite {', '.join(FSYNC_POLICIES)}).")
+        self.policy = policy
+        self.group_commit_interval = max(0.0, group_commit_ms / 1000)
+        self.group_commit_files = max(1, int(group_commit_files))
+        self._pending = []  # Grupo en formación: [temporal, publicar, threading.Event, error]
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def commit(self, temp_path, publish):
+        """
+        Vuelca el temporal según la política y lo publica.
+
+        :param temp_path: Archivo temporal ya escrito y cerrado.
+        :param publish: Función que lo sustituye por el definitivo (p. ej., os.replace).
+        :raises OSError: Si falla el volcado o la publicación.
+        """
+        error = self.commit_many([(temp_path, publish)])[0]
+        if error is not None:
+            raise error
+
+    def commit_many(self, items):
+        """
+        Vuelca y publica varios archivos a la vez (por ejemplo, los de un paquete).
+
+        :param items: Lista de (temporal, función que lo publica).
+        :return: Lista con la excepción de cada archivo, o None si se publicó.
+        """
+        if self.policy == FSYNC_NONE:
+            return [self._run(publish) for _, publish in items]
+        if self.policy == FSYNC_FILE:
+            return self._flush([[temp_path, publish, None, None] for temp_path, publish in items])
+
+        entries = [[temp_path, publish, threading.Event(), None] for temp_path, publish in items]
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._group_loop, name="receiver-fsync", daemon=True)
+                self._thread.start()
+            self._pending.extend(entries)
+            self._cond.notify_all()
+        for entry in entries:
+            entry[2].wait()
+        return [entry[3] for entry in entries]
+
+    def _group_loop(self):
+        """Forma los grupos: espera el intervalo desde el primer archivo o a que haya bastantes."""
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.group_commit_interval
+                while len(self._pending) < self.group_commit_files:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                group, self._pending = self._pending, []
+            self._flush(group)
+            for entry in group:
+                entry[2].set()
+
+    def _flush(self, group):
+        """Vuelca el contenido de un grupo, lo publica y vuelca una vez cada carpeta afectada."""
+        for entry in group:
+            try:
+                fsync_path(entry[0])
+            except OSError as e:
+                entry[3] = e
+        directories = set()
+        for entry in group:
+            if entry[3] is None:
+                entry[3] = self._run(entry[1])
+                if entry[3] is None:
+                    directories.add(os.path.dirname(entry[0]))
+        for directory in directories:
+            try:
+                fsync_path(directory, directory=True)
+            except OSError as e:
+                for entry in group:
+                    if entry[3] is None and os.path.dirname(entry[0]) == directory:
+                        entry[3] = e
+        return [entry[3] for entry in group]
+
+    @staticmethod
+    def _run(publish):
+        try:
+            publish()
+            return None
+        except Exception as e:
+            return e
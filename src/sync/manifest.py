@@ -0,0 +1,246 @@
+import os
+import sqlite3
+import threading
+from .protocol import file_sha256, to_wire_path, from_wire_path
+
+MANIFEST_FILE = "sync_manifest.db"
+
+
+class FileManifest:
+    """
+    Índice persistente del contenido de la carpeta de sincronización.
+
+    Por cada archivo guarda su ruta relativa, tamaño, fecha de modificación (ns),
+    inodo y hash SHA-256. Mientras el tamaño, la fecha y el inodo no cambien, el
+    hash se toma del índice en lugar de volver a leer el archivo. Se guarda en
+    SQLite para que las búsquedas sigan siendo rápidas con cientos de miles de entradas.
+    """
+
+    def __init__(self, sync_folder, db_path=MANIFEST_FILE):
+        """
+        :param sync_folder: Carpeta de sincronización que describe el índice.
+        :param db_path: Archivo SQLite donde se guarda el índice.
+        """
+        self.sync_folder = sync_folder
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._listeners = []  # Funciones avisadas de cada cambio (ver subscribe)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256)")
+
+    def subscribe(self, listener):
+        """
+        Avisa de cada cambio del índice, para mantener al día lo que se deriva de él (merkle.py).
+
+        :param listener: Función (rutas relativas, subtree) llamada tras cada cambio, fuera del
+                         cerrojo del índice; subtree indica que las rutas pueden ser carpetas
+                         cuyo contenido entero cambió (borrados y renombrados).
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, paths, subtree=False):
+        for listener in self._listeners:
+            listener(paths, subtree)
+
+    def close(self):
+        """Cierra la base de datos del índice."""
+        with self._lock:
+            self._db.close()
+
+    def relative_path(self, file_path):
+        """Devuelve la clave del índice (ruta relativa con '/') de un archivo local."""
+        return to_wire_path(self.sync_folder, file_path)
+
+    def local_path(self, relative_path):
+        """Devuelve la ruta local de una clave del índice."""
+        return from_wire_path(self.sync_folder, relative_path)
+
+    def lookup(self, relative_path):
+        """
+        Devuelve la entrada guardada para una ruta relativa.
+
+        :return: Tupla (size, mtime_ns, inode, sha256) o None si no está en el índice.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT size, mtime_ns, inode, sha256 FROM files WHERE path = ?", (relative_path,)
+            ).fetchone()
+
+    def get_hash(self, file_path):
+        """
+        Devuelve el SHA-256 de un archivo, calculándolo solo si cambió desde la última vez.
+
+        :param file_path: Ruta local del archivo.
+        :raises OSError: Si el archivo no existe o no se puede leer.
+        """
+        st = os.stat(file_path)
+        relative = self.relative_path(file_path)
+        entry = self.lookup(relative)
+        if entry and entry[:3] == (st.st_size, st.st_mtime_ns, st.st_ino):
+            return entry[3]
+
+        digest = file_sha256(file_path)
+        self._store(relative, st, digest)
+        return digest
+
+    def record(self, file_path, digest):
+        """
+        Registra un archivo cuyo hash ya se conoce (por ejemplo, recién recibido y verificado).
+
+        :param file_path: Ruta local del archivo.
+        :param digest: SHA-256 del contenido.
+        """
+        self._store(self.relative_path(file_path), os.stat(file_path), digest)
+
+    def remove(self, file_path):
+        """Elimina del índice un archivo y, si era una carpeta, todo su contenido."""
+        relative = self.relative_path(file_path)
+        # Las rutas de una carpeta quedan entre "carpeta/" y "carpeta0" ('0' sigue a '/' en ASCII)
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM files WHERE path = ? OR (path >= ? AND path < ?)",
+                (relative, relative + "/", relative + "0")
+            )
+        self._notify([relative], subtree=True)
+
+    def rename(self, src_path, dest_path):
+        """
+        Traslada en el índice un archivo o una carpeta renombrados, sin volver a calcular
+        hashes (renombrar conserva el tamaño, la fecha y el inodo). Lo que hubiera en el
+        destino se sustituye.
+
+        :param src_path: Ruta local anterior.
+        :param dest_path: Ruta local nueva.
+        """
+        src, dest = self.relative_path(src_path), self.relative_path(dest_path)
+        if src == dest:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute(
+                    "DELETE FROM files WHERE path = ? OR (path >= ? AND path < ?)", (dest, dest + "/", dest + "0")
+                )
+                self._db.execute(
+                    "UPDATE files SET path = ? || substr(path, ?) WHERE path = ? OR (path >= ? AND path < ?)",
+                    (dest, len(src) + 1, src, src + "/", src + "0")
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self._notify([src, dest], subtree=True)
+
+    def snapshot(self):
+        """
+        Devuelve el estado conocido de todo el índice, para comparaciones en bloque.
+
+        :return: Diccionario {ruta relativa: (size, mtime_ns, inode, sha256)}.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT path, size, mtime_ns, inode, sha256 FROM files").fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def record_many(self, entries):
+        """
+        Registra muchos archivos en una sola transacción.
+
+        :param entries: Iterable de (ruta relativa, os.stat_result, sha256).
+        """
+        rows = [(relative, st.st_size, st.st_mtime_ns, st.st_ino, digest) for relative, st, digest in entries]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, sha256) VALUES (?, ?, ?, ?, ?)", rows
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self._notify([row[0] for row in rows])
+
+    def remove_many(self, relative_paths):
+        """Elimina del índice muchas rutas relativas en una sola transacción."""
+        relative_paths = list(relative_paths)
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in relative_paths])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self._notify(relative_paths)
+
+    def iter_hashes(self, relative_dir=""):
+        """
+        Recorre (ruta relativa, sha256) del índice (o solo de una carpeta) en orden de ruta.
+        Usa una conexión de solo lectura propia para no bloquear las escrituras durante el recorrido.
+        """
+        if relative_dir:
+            query, args = "SELECT path, sha256 FROM files WHERE path >= ? AND path < ? ORDER BY path", \
+                (relative_dir + "/", relative_dir + "0")
+        else:
+            query, args = "SELECT path, sha256 FROM files ORDER BY path", ()
+        db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            yield from db.execute(query, args)
+        finally:
+            db.close()
+
+    def files_in(self, relative_dir):
+        """Devuelve (nombre, sha256) de los archivos que están directamente en una carpeta ("" es la raíz)."""
+        if not relative_dir:
+            query, args = "SELECT path, sha256 FROM files WHERE instr(path, '/') = 0", ()
+        else:
+            start = len(relative_dir) + 2  # Primer carácter tras "carpeta/"
+            query = ("SELECT substr(path, ?), sha256 FROM files"
+                     " WHERE path >= ? AND path < ? AND instr(substr(path, ?), '/') = 0")
+            args = (start, relative_dir + "/", relative_dir + "0", start)
+        with self._lock:
+            return self._db.execute(query, args).fetchall()
+
+    def paths_under(self, relative_dir):
+        """Devuelve las rutas relativas de todos los archivos indexados dentro de una carpeta."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path FROM files WHERE path >= ? AND path < ?", (relative_dir + "/", relative_dir + "0")
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def find_by_hash(self, digest):
+        """Devuelve las rutas relativas de los archivos indexados con ese contenido."""
+        with self._lock:
+            rows = self._db.execute("SELECT path FROM files WHERE sha256 = ?", (digest,)).fetchall()
+        return [row[0] for row in rows]
+
+    def has_content(self, file_path, digest):
+        """Indica si el archivo local existe y su contenido tiene el hash indicado."""
+        try:
+            return self.get_hash(file_path) == digest
+        except OSError:
+            return False
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def _store(self, relative_path, st, digest):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, sha256) VALUES (?, ?, ?, ?, ?)",
+                (relative_path, st.st_size, st.st_mtime_ns, st.st_ino, digest)
+            )
+        self._notify([relative_path])
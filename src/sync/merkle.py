@@ -0,0 +1,261 @@
+"""
+Antientropía: árbol de hashes (Merkle) por carpetas para detectar en qué difieren dos nodos.
+
+Los nodos pueden desincronizarse sin que nadie lo note (eventos perdidos, caídas a mitad
+de una transferencia, un receptor apagado mientras se le enviaba). Para comprobarlo no
+hace falta recorrer ni reenviar nada: cada nodo resume su índice de contenido en un árbol
+donde el hash de una carpeta es el de la lista de sus entradas (nombre y hash de cada
+archivo y subcarpeta), así que dos carpetas con el mismo hash tienen el mismo contenido.
+
+El emisor compara las raíces y solo baja por las carpetas cuyo hash difiere:
+
+    MSG_TREE {"dirs": [[carpeta, cubeta], ...], "entries": bool}
+        -> MSG_ACK {"ok", "dirs": [{"hash", "entries": {nombre: hash corto}} o {"hash", "buckets": [...]}, ...]}
+
+Las subcarpetas aparecen en "entries" con '/' al final y los hashes se recortan a
+SHORT_HASH caracteres hexadecimales. Una carpeta con muchas entradas se reparte en
+BUCKETS cubetas según el nombre: con cubeta BUCKET_HASHES se piden solo los hashes de
+las cubetas y luego, con su número, las entradas de las cubetas que difieren (con
+cubeta None se piden todas las entradas). Así, comprobar que dos árboles de un millón
+de archivos coinciden cuesta una consulta de unos cientos de bytes, y encontrar un
+archivo distinto, unos pocos KB.
+"""
+
+import hashlib
+import threading
+import zlib
+
+DEFAULT_ANTI_ENTROPY_INTERVAL = 600.0  # Segundos entre comparaciones con cada cliente (0 las desactiva)
+DIRS_PER_MESSAGE = 256                 # Carpetas (o cubetas) por consulta MSG_TREE
+SHORT_HASH = 16                        # Caracteres hexadecimales de cada hash enviado (64 bits)
+BUCKETS = 64                           # Cubetas en que se reparte una carpeta grande
+MAX_ENTRIES = 64                       # Entradas a partir de las cuales se comparan cubetas
+BUCKET_HASHES = "*"                    # Cubeta especial: pedir los hashes de todas las cubetas
+FULL_REBUILD_CHANGES = 10000           # Cambios pendientes a partir de los cuales se recalcula todo el árbol
+EMPTY_HASH = hashlib.sha256().hexdigest()  # Hash de una carpeta sin entradas
+
+
+def bucket_of(name):
+    """Cubeta de una entrada de carpeta (igual en todos los nodos)."""
+    return zlib.crc32(name.encode("utf-8")) % BUCKETS
+
+
+def bucket_hashes(entries):
+    """Hashes cortos de las cubetas de una carpeta ("" para las vacías)."""
+    buckets = [[] for _ in range(BUCKETS)]
+    for name in sorted(entries):
+        buckets[bucket_of(name)].append(f"{name}\0{entries[name]}\n")
+    return [hashlib.sha256("".join(items).encode("utf-8")).hexdigest()[:SHORT_HASH] if items else ""
+            for items in buckets]
+
+
+class MerkleTree:
+    """
+    Árbol de hashes por carpetas de un FileManifest. Se calcula de una pasada sobre el índice
+    (ordenado por ruta) la primera vez que se consulta; después, el índice avisa de cada
+    cambio (FileManifest.subscribe) y solo se recalculan las carpetas afectadas y sus
+    antecesoras. En memoria solo se guardan los hashes de las carpetas, y los archivos de
+    cada carpeta se consultan al índice cuando hace falta.
+    """
+
+    def __init__(self, manifest):
+        """
+        :param manifest: Índice de contenido (FileManifest) que resume el árbol.
+        """
+        self.manifest = manifest
+        self._lock = threading.Lock()
+        self._built = False
+        self._hashes = {"": EMPTY_HASH}  # Carpeta relativa -> hash
+        self._subdirs = {}  # Carpeta relativa -> {nombre de subcarpeta: hash}
+        self._pending_lock = threading.Lock()
+        self._pending = {}  # Ruta relativa cambiada -> puede ser una carpeta entera (ver FileManifest.subscribe)
+        manifest.subscribe(self._changed)
+
+    def root(self):
+        """Devuelve el hash de la raíz de la carpeta de sincronización."""
+        return self._current()[0][""]
+
+    def entries(self, directory):
+        """
+        Devuelve las entradas de una carpeta con sus hashes cortos ({} si no existe).
+        Las subcarpetas llevan '/' al final del nombre.
+        """
+        hashes, subdirs = self._current()
+        if directory not in hashes:
+            return {}
+        items = {f"{name}/": value[:SHORT_HASH] for name, value in subdirs.get(directory, {}).items()}
+        items.update((name, value[:SHORT_HASH]) for name, value in self.manifest.files_in(directory))
+        return items
+
+    def describe(self, requests, entries=True):
+        """
+        Describe carpetas del árbol para responder a una consulta MSG_TREE.
+
+        :param requests: Lista de (carpeta relativa, cubeta); "" es la raíz y la cubeta es None
+                         (todas las entradas), BUCKET_HASHES o el número de una cubeta.
+        :param entries: Incluir también las entradas (o las cubetas) de cada carpeta.
+        :return: Lista de {"hash", "entries" o "buckets"}, en el orden de requests;
+                 "hash" es None si la carpeta no existe.
+        """
+        hashes = self._current()[0]
+        result = []
+        for directory, bucket in requests:
+            node = {"hash": hashes.get(directory)}
+            if entries and node["hash"] is not None:
+                items = self.entries(directory)
+                if bucket == BUCKET_HASHES:
+                    node["buckets"] = bucket_hashes(items)
+                else:
+                    if bucket is not None:
+                        items = {name: value for name, value in items.items() if bucket_of(name) == bucket}
+                    node["entries"] = items
+            result.append(node)
+        return result
+
+    def _changed(self, paths, subtree):
+        """Anota las rutas que cambiaron en el índice (se aplican en la siguiente consulta)."""
+        with self._pending_lock:
+            for path in paths:
+                self._pending[path] = subtree or self._pending.get(path, False)
+
+    def _current(self):
+        """Devuelve (hashes de carpetas, subcarpetas), aplicando antes los cambios pendientes del índice."""
+        with self._lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            # Con muchos cambios a la vez (una reconciliación completa) sale más barato recalcularlo todo
+            if not self._built or "" in pending or len(pending) > max(FULL_REBUILD_CHANGES, len(self._hashes)):
+                self._hashes, self._subdirs = self._build()
+                self._built = True
+            elif pending:
+                self._apply(pending)
+            return self._hashes, self._subdirs
+
+    def _apply(self, pending):
+        """Recalcula las carpetas afectadas por los cambios y, de abajo arriba, sus antecesoras."""
+        dirty = set()
+        for path, subtree in pending.items():
+            if subtree:
+                # La ruta puede ser una carpeta borrada o renombrada: se olvida y se recalcula entera
+                prefix = path + "/"
+                for directory in [d for d in self._hashes if d == path or d.startswith(prefix)]:
+                    del self._hashes[directory]
+                    self._subdirs.pop(directory, None)
+                hashes, subdirs = self._build(path)
+                parent, _, name = path.rpartition("/")
+                if hashes[path] != EMPTY_HASH:
+                    self._hashes.update(hashes)
+                    self._subdirs.update(subdirs)
+                    self._subdirs.setdefault(parent, {})[name] = hashes[path]
+                else:
+                    self._forget_subdir(parent, name)
+            directory = path
+            while directory:
+                directory = directory.rpartition("/")[0]
+                dirty.add(directory)
+
+        # Las carpetas más profundas primero: su hash entra en el de su carpeta padre
+        for directory in sorted(dirty, key=lambda d: d.count("/") + bool(d), reverse=True):
+            files = self.manifest.files_in(directory)
+            subdirs = self._subdirs.get(directory, {})
+            parent, _, name = directory.rpartition("/")
+            if directory and not files and not subdirs:
+                # Carpeta sin archivos: no forma parte del árbol
+                self._hashes.pop(directory, None)
+                self._subdirs.pop(directory, None)
+                self._forget_subdir(parent, name)
+                continue
+            # Mismo orden que en _build: el del índice por ruta, con las subcarpetas como "nombre/"
+            items = sorted(files + [(f"{entry}/", value) for entry, value in subdirs.items()])
+            digest = hashlib.sha256()
+            for entry, value in items:
+                digest.update(f"{entry}\0{value}\n".encode("utf-8"))
+            value = self._hashes[directory] = digest.hexdigest()
+            if directory:
+                self._subdirs.setdefault(parent, {})[name] = value
+
+    def _forget_subdir(self, parent, name):
+        children = self._subdirs.get(parent)
+        if children is not None:
+            children.pop(name, None)
+            if not children:
+                del self._subdirs[parent]
+
+    def _build(self, top=""):
+        """
+        Calcula los hashes de todas las carpetas (o solo de top y las que contiene) en una
+        pasada sobre el índice ordenado por ruta. El contenido de cada carpeta es contiguo en
+        ese orden, así que basta una pila con las carpetas abiertas: una carpeta se cierra (y su
+        hash pasa a su carpeta padre) al llegar a la primera ruta que ya no está dentro de ella.
+        """
+        hashes, subdirs = {}, {}
+        stack = [(top, hashlib.sha256())]  # Carpetas abiertas: (ruta relativa, hash en curso)
+
+        def close():
+            directory, digest = stack.pop()
+            value = hashes[directory] = digest.hexdigest()
+            if stack:
+                parent, _, name = directory.rpartition("/")
+                stack[-1][1].update(f"{name}/\0{value}\n".encode("utf-8"))
+                subdirs.setdefault(parent, {})[name] = value
+
+        for path, sha256 in self.manifest.iter_hashes(top):
+            directory, _, name = path.rpartition("/")
+            while len(stack) > 1 and directory != stack[-1][0] and not directory.startswith(stack[-1][0] + "/"):
+                close()
+            current = stack[-1][0]
+            if directory != current:
+                for part in directory[len(current) + 1 if current else 0:].split("/"):
+                    current = f"{current}/{part}" if current else part
+                    stack.append((current, hashlib.sha256()))
+            stack[-1][1].update(f"{name}\0{sha256}\n".encode("utf-8"))
+        while stack:
+            close()
+        return hashes, subdirs
+
+
+def compare_trees(local, query):
+    """
+    Compara el árbol local con el de otro nodo bajando solo por las carpetas que difieren.
+
+    :param local: MerkleTree del nodo local.
+    :param query: Función (lista de [carpeta, cubeta], entries) que devuelve MerkleTree.describe del otro nodo.
+    :return: Tupla (rutas relativas de los archivos locales que el otro nodo no tiene o tiene
+             distintos, número de entradas que solo tiene el otro nodo, consultas hechas).
+    """
+    remote_root = query([["", None]], False)[0].get("hash")
+    if remote_root == local.root():
+        return [], 0, 1
+
+    def request(directory):
+        # Las carpetas grandes se comparan primero por cubetas
+        return [directory, BUCKET_HASHES if len(local.entries(directory)) > MAX_ENTRIES else None]
+
+    missing, extra, queries = [], 0, 1
+    pending = [request("")]
+    while pending:
+        batch, pending = pending[:DIRS_PER_MESSAGE], pending[DIRS_PER_MESSAGE:]
+        remote = query(batch, True)
+        queries += 1
+        for (directory, bucket), node in zip(batch, remote):
+            ours = local.entries(directory)
+            if bucket == BUCKET_HASHES:
+                theirs = node.get("buckets") or [""] * BUCKETS
+                pending.extend([directory, index] for index, (mine, other) in
+                               enumerate(zip(bucket_hashes(ours), theirs)) if mine != other)
+                continue
+            if bucket is not None:
+                ours = {name: value for name, value in ours.items() if bucket_of(name) == bucket}
+            theirs = node.get("entries") or {}
+            extra += sum(1 for name in theirs if name not in ours)
+            for name, value in ours.items():
+                if theirs.get(name) == value:
+                    continue
+                path = f"{directory}/{name}" if directory else name
+                if not name.endswith("/"):
+                    missing.append(path)
+                elif name in theirs:
+                    pending.append(request(path[:-1]))  # La subcarpeta existe en los dos nodos: bajar por ella
+                else:
+                    missing.extend(local.manifest.paths_under(path[:-1]))
+    return missing, extra, queries
@@ -0,0 +1,200 @@
+"""
+Operaciones de metadatos: renombrar/mover, eliminar y crear carpetas sin reenviar contenido.
+
+Reorganizar un árbol no cambia el contenido de los archivos, así que basta con decirle
+al receptor qué hacer con lo que ya tiene. Las operaciones viajan en lotes:
+
+    MSG_METADATA {"ops": [operación, ...]} -> MSG_ACK {"ok", "failed": {"índice": "error"}}
+
+donde cada operación es uno de estos diccionarios (rutas relativas con '/'):
+
+    {"op": "rename", "path", "dest", "sha256" opcional}  Renombra o mueve un archivo o una carpeta
+    {"op": "delete", "path", "sha256" opcional}          Elimina un archivo o una carpeta
+    {"op": "mkdir", "path"}                              Crea una carpeta (y las intermedias)
+
+El receptor las aplica en orden. Son idempotentes, porque el monitor del receptor ve
+sus propios cambios y los devuelve al emisor: renombrar algo que ya está en el destino,
+eliminar algo que no existe o crear una carpeta que ya existe no son errores. El hash
+protege los archivos que el receptor cambió por su cuenta: un archivo solo se renombra
+o se elimina si su contenido es el que el emisor conocía, y al eliminar una carpeta se
+conservan los archivos que el índice no conoce o que cambiaron desde que se indexaron.
+Las operaciones que fallan se informan una a una y el emisor envía el contenido en su lugar.
+"""
+
+import bisect
+import os
+import shutil
+from .protocol import ProtocolError, from_wire_path
+
+RENAME = "rename"
+DELETE = "delete"
+MKDIR = "mkdir"
+
+OPS_PER_MESSAGE = 1000  # Operaciones por trama (cada una ocupa unas decenas de bytes)
+
+
+def rename_op(path, dest, digest=None):
+    """Operación de renombrado de path a dest; digest es el hash del archivo, si se conoce."""
+    op = {"op": RENAME, "path": path, "dest": dest}
+    if digest:
+        op["sha256"] = digest
+    return op
+
+
+def delete_op(path, digest=None):
+    """Operación de borrado; sin digest, el receptor solo elimina carpetas."""
+    op = {"op": DELETE, "path": path}
+    if digest:
+        op["sha256"] = digest
+    return op
+
+
+def mkdir_op(path):
+    """Operación de creación de una carpeta."""
+    return {"op": MKDIR, "path": path}
+
+
+def collapse_renames(renames, known_paths, exists):
+    """
+    Agrupa los renombrados de archivos detectados por inodo en renombrados de carpetas.
+
+    Si todos los archivos que se conocían dentro de una carpeta que ya no existe aparecen
+    con la misma ruta relativa dentro de otra carpeta, basta una operación para la carpeta.
+
+    :param renames: Lista de (ruta anterior, ruta nueva, sha256) de archivos.
+    :param known_paths: Lista ordenada de las rutas relativas conocidas antes de la pasada.
+    :param exists: Función que indica si una ruta relativa existe en disco.
+    :return: Lista de operaciones de renombrado.
+    """
+    groups = {}
+    ops = []
+    for old, new, digest in renames:
+        old_parts, new_parts = old.split("/"), new.split("/")
+        common = 0
+        while common < min(len(old_parts), len(new_parts)) and old_parts[-1 - common] == new_parts[-1 - common]:
+            common += 1
+        if 0 < common < min(len(old_parts), len(new_parts)):
+            key = ("/".join(old_parts[:-common]), "/".join(new_parts[:-common]))
+            groups.setdefault(key, []).append((old, new, digest))
+        else:
+            ops.append(rename_op(old, new, digest))
+
+    for (old_dir, new_dir), items in groups.items():
+        start = bisect.bisect_left(known_paths, old_dir + "/")
+        end = bisect.bisect_left(known_paths, old_dir + "0")  # '0' sigue a '/' en ASCII
+        if end - start == len(items) and not exists(old_dir) and exists(new_dir):
+            ops.append(rename_op(old_dir, new_dir))
+        else:
+            ops.extend(rename_op(old, new, digest) for old, new, digest in items)
+    return ops
+
+
+def collapse_deletes(removed, hashes, exists):
+    """
+    Convierte los archivos eliminados en operaciones de borrado, una sola por cada
+    carpeta que ya no existe en lugar de una por archivo.
+
+    :param removed: Rutas relativas de los archivos eliminados.
+    :param hashes: Diccionario {ruta relativa: sha256} con el contenido que se conocía.
+    :param exists: Función que indica si una ruta relativa existe en disco.
+    :return: Lista de operaciones de borrado.
+    """
+    ops, folders = [], set()
+    for path in sorted(removed):
+        parts = path.split("/")
+        for depth in range(1, len(parts)):
+            folder = "/".join(parts[:depth])
+            if folder in folders:
+                break
+            if not exists(folder):
+                folders.add(folder)
+                ops.append(delete_op(folder))
+                break
+        else:
+            ops.append(delete_op(path, hashes.get(path)))
+    return ops
+
+
+def apply_operation(sync_folder, manifest, op):
+    """
+    Aplica una operación en la carpeta de sincronización y actualiza el índice.
+
+    :param sync_folder: Carpeta de sincronización del receptor.
+    :param manifest: Índice de contenido (FileManifest).
+    :param op: Diccionario de la operación.
+    :return: Descripción breve de lo que se hizo, para la bitácora.
+    :raises ProtocolError: Si la operación no es válida o el contenido no es el esperado.
+    :raises OSError: Si falla el sistema de archivos.
+    """
+    if not isinstance(op, dict):
+        raise ProtocolError("operación no válida")
+    kind = op.get("op")
+    path = from_wire_path(sync_folder, op.get("path", ""))
+    digest = op.get("sha256")
+
+    if kind == MKDIR:
+        os.makedirs(path, exist_ok=True)
+        return f"carpeta '{op['path']}' creada"
+
+    if kind == DELETE:
+        if not os.path.lexists(path):
+            return f"'{op['path']}' ya no existía"
+        if os.path.isdir(path) and not os.path.islink(path):
+            kept = _delete_tree(path, manifest)
+            detail = f" ({kept} archivo(s) desconocido(s) conservado(s))" if kept else ""
+            return f"carpeta '{op['path']}' eliminada{detail}"
+        if not digest or not manifest.has_content(path, digest):
+            raise ProtocolError(f"el contenido de '{op['path']}' no es el esperado; no se elimina")
+        # El índice se actualiza antes que el disco: el monitor local verá el borrado y no debe devolverlo
+        manifest.remove(path)
+        os.remove(path)
+        return f"'{op['path']}' eliminado"
+
+    if kind == RENAME:
+        dest = from_wire_path(sync_folder, op.get("dest", ""))
+        if not os.path.lexists(path):
+            if os.path.lexists(dest):
+                return f"'{op['path']}' ya estaba en '{op['dest']}'"
+            raise ProtocolError(f"no existe '{op['path']}'")
+        if digest and os.path.isfile(path) and not manifest.has_content(path, digest):
+            raise ProtocolError(f"el contenido de '{op['path']}' no es el esperado; no se renombra")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        manifest.rename(path, dest)
+        try:
+            os.replace(path, dest)
+        except OSError:
+            manifest.rename(dest, path)
+            raise
+        return f"'{op['path']}' renombrado a '{op['dest']}'"
+
+    raise ProtocolError(f"operación desconocida: {kind!r}")
+
+
+def _delete_tree(folder, manifest):
+    """
+    Elimina una carpeta sin perder lo que el receptor cambió por su cuenta: solo se borran
+    los archivos cuyo estado en disco coincide con el del índice, y las carpetas que quedan vacías.
+
+    :return: Número de archivos conservados.
+    """
+    kept = 0
+    for directory, subdirs, files in os.walk(folder, topdown=False):
+        for name in files:
+            path = os.path.join(directory, name)
+            try:
+                st = os.lstat(path)
+                entry = manifest.lookup(manifest.relative_path(path))
+                if entry is None or entry[:3] != (st.st_size, st.st_mtime_ns, st.st_ino):
+                    kept += 1
+                    continue
+                manifest.remove(path)
+                os.remove(path)
+            except OSError:
+                kept += 1
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass  # No está vacía: contiene archivos conservados
+    if not kept:
+        shutil.rmtree(folder, ignore_errors=True)
+    return kept
@@ -0,0 +1,255 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+OUTBOUND_FILE = "sync_outbound.db"
+DEFAULT_RETRY_BASE_DELAY = 2.0     # Segundos de espera tras el primer fallo
+DEFAULT_RETRY_MAX_DELAY = 600.0    # Espera máxima entre reintentos
+
+
+class OutboundQueue:
+    """
+    Diario persistente de envíos pendientes, uno por cliente.
+
+    Cada archivo se anota para cada cliente antes de enviarlo y solo se borra cuando
+    ese cliente lo confirma. Mientras un envío está en curso su entrada queda reservada
+    (leased) para que no se reintente a la vez. Si el envío falla, la entrada se
+    reprograma con espera exponencial; si el programa se cierra, lo pendiente sigue en
+    disco y se reintenta al arrancar. Se guarda en SQLite, como el índice de contenido.
+
+    Las operaciones de metadatos (renombrar, eliminar, crear carpetas) se anotan aparte,
+    en una cola ordenada por cliente, porque a diferencia de los archivos importa el orden.
+    """
+
+    def __init__(self, db_path=OUTBOUND_FILE, base_delay=DEFAULT_RETRY_BASE_DELAY, max_delay=DEFAULT_RETRY_MAX_DELAY):
+        """
+        :param db_path: Archivo SQLite donde se guarda el diario.
+        :param base_delay: Segundos de espera tras el primer fallo (se duplica en cada reintento).
+        :param max_delay: Espera máxima entre dos reintentos.
+        """
+        self.db_path = db_path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pending (
+                peer TEXT NOT NULL,
+                path TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                leased INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                PRIMARY KEY (peer, path)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_pending_next ON pending(leased, next_attempt)")
+        # Operaciones de metadatos (ver metadata.py): se aplican en orden, así que van en una cola por cliente
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS operations (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                peer TEXT NOT NULL,
+                op TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                last_error TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_operations_peer ON operations(peer, seq)")
+        # Los envíos que estaban en curso cuando se cerró el programa vuelven a estar pendientes
+        self._db.execute("UPDATE pending SET leased = 0 WHERE leased = 1")
+
+    def close(self):
+        """Cierra la base de datos del diario."""
+        with self._lock:
+            self._db.close()
+
+    def enqueue_many(self, entries):
+        """
+        Anota, ya reservados, los envíos que se van a hacer ahora, en una sola transacción.
+        Si ya había una entrada para el mismo cliente y archivo, se reinicia: hay contenido
+        nuevo que enviar cuanto antes.
+
+        :param entries: Iterable de (cliente "host:puerto", ruta local).
+        """
+        now = time.time()
+        self._executemany(
+            "INSERT OR REPLACE INTO pending (peer, path, attempts, next_attempt, leased) VALUES (?, ?, 0, ?, 1)",
+            [(peer, path, now) for peer, path in entries]
+        )
+
+    def complete_many(self, entries):
+        """Borra los envíos confirmados: iterable de (cliente, ruta local)."""
+        self._executemany("DELETE FROM pending WHERE peer = ? AND path = ?", list(entries))
+
+    def fail_many(self, entries, error=None):
+        """
+        Reprograma envíos fallidos con espera exponencial (con algo de azar para que los
+        reintentos a un cliente que vuelve no lleguen todos a la vez).
+
+        :param entries: Iterable de (cliente, ruta local).
+        :param error: Descripción del fallo, para diagnóstico.
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for peer, path in entries:
+                    row = self._db.execute(
+                        "SELECT attempts FROM pending WHERE peer = ? AND path = ?", (peer, path)
+                    ).fetchone()
+                    attempts = (row[0] if row else 0) + 1
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO pending (peer, path, attempts, next_attempt, leased, last_error) "
+                        "VALUES (?, ?, ?, ?, 0, ?)",
+                        (peer, path, attempts, now + self._delay(attempts), error)
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def schedule_many(self, entries):
+        """
+        Anota envíos para que el hilo de reintentos los haga en cuanto pueda (por ejemplo,
+        el contenido de un archivo cuyo renombrado no pudo aplicar un cliente).
+
+        :param entries: Iterable de (cliente, ruta local).
+        """
+        now = time.time()
+        self._executemany(
+            "INSERT OR REPLACE INTO pending (peer, path, attempts, next_attempt, leased) VALUES (?, ?, 0, ?, 0)",
+            [(peer, path, now) for peer, path in entries]
+        )
+
+    def claim_due(self, peers, limit):
+        """
+        Reserva y devuelve los envíos a los clientes indicados cuyo momento de reintento
+        ya llegó, los más antiguos primero.
+
+        :param peers: Clientes ("host:puerto") a considerar (los que siguen configurados).
+        :param limit: Número máximo de envíos a devolver.
+        :return: Lista de (cliente, ruta local, intentos).
+        """
+        peers = list(peers)
+        if not peers:
+            return []
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                rows = self._db.execute(
+                    f"SELECT peer, path, attempts FROM pending WHERE leased = 0 AND next_attempt <= ? "
+                    f"AND peer IN ({','.join('?' * len(peers))}) ORDER BY next_attempt LIMIT ?",
+                    (time.time(), *peers, limit)
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE pending SET leased = 1 WHERE peer = ? AND path = ?", [row[:2] for row in rows]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return rows
+
+    def remove_path(self, path):
+        """Olvida los envíos pendientes de un archivo o de todo lo que haya dentro de una carpeta."""
+        prefix = path.rstrip("/\\") + os.sep
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM pending WHERE path = ? OR (path >= ? AND path < ?)",
+                (path, prefix, prefix[:-1] + chr(ord(os.sep) + 1))
+            )
+
+    def move_path(self, src_path, dest_path):
+        """Traslada a la nueva ruta los envíos pendientes de un archivo o carpeta renombrados."""
+        src, dest = src_path.rstrip("/\\"), dest_path.rstrip("/\\")
+        prefix = src + os.sep
+        with self._lock:
+            self._db.execute(
+                "UPDATE OR REPLACE pending SET path = ? || substr(path, ?) WHERE path = ? OR (path >= ? AND path < ?)",
+                (dest, len(src) + 1, src, prefix, prefix[:-1] + chr(ord(os.sep) + 1))
+            )
+
+    def enqueue_operations(self, entries):
+        """
+        Anota operaciones de metadatos al final de la cola de cada cliente.
+
+        :param entries: Iterable de (cliente, operación), en el orden en que deben aplicarse.
+        """
+        now = time.time()
+        self._executemany(
+            "INSERT INTO operations (peer, op, next_attempt) VALUES (?, ?, ?)",
+            [(peer, json.dumps(op, separators=(",", ":")), now) for peer, op in entries]
+        )
+
+    def pending_operations(self, peer, limit):
+        """
+        Devuelve las primeras operaciones pendientes de un cliente, en orden.
+
+        :return: Lista de (número de secuencia, operación).
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, op FROM operations WHERE peer = ? ORDER BY seq LIMIT ?", (peer, limit)
+            ).fetchall()
+        return [(seq, json.loads(op)) for seq, op in rows]
+
+    def complete_operations(self, seqs):
+        """Borra las operaciones que el cliente ya procesó."""
+        self._executemany("DELETE FROM operations WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def fail_operations(self, peer, error=None):
+        """Reprograma con espera exponencial todas las operaciones pendientes de un cliente."""
+        with self._lock:
+            row = self._db.execute("SELECT MAX(attempts) FROM operations WHERE peer = ?", (peer,)).fetchone()
+            attempts = (row[0] or 0) + 1
+            self._db.execute(
+                "UPDATE operations SET attempts = ?, next_attempt = ?, last_error = ? WHERE peer = ?",
+                (attempts, time.time() + self._delay(attempts), error, peer)
+            )
+
+    def peers_with_due_operations(self, peers):
+        """Devuelve los clientes indicados que tienen operaciones cuyo momento de reintento ya llegó."""
+        peers = list(peers)
+        if not peers:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT DISTINCT peer FROM operations WHERE next_attempt <= ? "
+                f"AND peer IN ({','.join('?' * len(peers))})",
+                (time.time(), *peers)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def pending_by_peer(self):
+        """Devuelve {cliente: número de envíos pendientes}."""
+        with self._lock:
+            return dict(self._db.execute("SELECT peer, COUNT(*) FROM pending GROUP BY peer").fetchall())
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def _delay(self, attempts):
+        """Espera antes del siguiente intento, con algo de azar para no reintentar todos a la vez."""
+        return min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.75, 1.0)
+
+    def _executemany(self, sql, rows):
+        if not rows:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(sql, rows)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
@@ -0,0 +1,74 @@
+"""
+Empaquetado de archivos pequeños.
+
+Con miles de archivos pequeños el coste fijo por archivo (trama, ida y vuelta de la
+confirmación, línea en la bitácora) domina sobre los datos. Los archivos por debajo de
+un tamaño se agrupan en paquetes que viajan en una sola trama MSG_PACK: los metadatos
+llevan la cabecera de cada entrada ({"path", "size", "sha256"}) y el contenido va a
+continuación, con los archivos uno detrás de otro en el mismo orden.
+"""
+
+import hashlib
+import os
+
+DEFAULT_PACK_MAX_FILE_SIZE = 64 * 1024       # Archivos de hasta este tamaño se empaquetan
+DEFAULT_PACK_MAX_FILES = 512                 # Archivos máximos por paquete
+DEFAULT_PACK_MAX_BYTES = 8 * 1024 * 1024     # Contenido máximo por paquete
+MAX_PACK_SIZE = 64 * 1024 * 1024             # Límite que acepta el receptor (el paquete se guarda en memoria)
+
+
+def plan_packs(file_paths, detected_at, max_file_size, max_files, max_bytes):
+    """
+    Separa los archivos pequeños en paquetes y deja el resto para enviarse de uno en uno.
+
+    :param file_paths: Rutas completas de los archivos.
+    :param detected_at: Lista paralela con el instante del primer evento de cada archivo (o None).
+    :return: Tupla (paquetes, sueltos). Cada paquete es una lista de (ruta, instante);
+             sueltos es la lista de (ruta, instante) que no se empaquetan.
+    """
+    packs, singles = [], []
+    current, current_bytes = [], 0
+    for path, detected in zip(file_paths, detected_at):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            singles.append((path, detected))  # El envío individual registrará el error
+            continue
+        if size > max_file_size:
+            singles.append((path, detected))
+            continue
+        if current and (len(current) >= max_files or current_bytes + size > max_bytes):
+            packs.append(current)
+            current, current_bytes = [], 0
+        current.append((path, detected))
+        current_bytes += size
+    if current:
+        packs.append(current)
+    return packs, singles
+
+
+def load_pack(file_paths, wire_path):
+    """
+    Lee los archivos de un paquete y calcula sus hashes.
+
+    :param file_paths: Rutas locales de los archivos.
+    :param wire_path: Función que convierte una ruta local en la ruta que viaja en la trama.
+    :return: Tupla (entradas, contenido, estados, errores): las cabeceras de las entradas,
+             el contenido concatenado, [(ruta local, os.stat_result, sha256)] para el índice
+             y {ruta local: error} de los archivos que no se pudieron leer.
+    """
+    entries, contents, stats, errors = [], [], [], {}
+    for path in file_paths:
+        try:
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())  # Antes de leer: si cambia después, el índice lo detectará
+                data = f.read()
+        except OSError as e:
+            errors[path] = e
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        entries.append({"path": wire_path(path), "size": len(data), "sha256": digest})
+        contents.append(data)
+        if st.st_size == len(data):
+            stats.append((path, st, digest))
+    return entries, b"".join(contents), stats, errors
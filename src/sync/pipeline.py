@@ -0,0 +1,174 @@
+"""
+Recepción en tubería: la red y el disco avanzan por separado.
+
+Si el mismo hilo alterna entre leer del socket y escribir en el archivo, cada parón del
+disco deja de vaciar el socket y frena al emisor a través de la ventana TCP. Con la
+tubería, el hilo de la conexión solo lee de la red y entrega los búferes llenos a un pool
+compartido de hilos de escritura, que escriben, calculan el hash y guardan los puntos de
+control (ver resume.py).
+
+Cada archivo tiene un anillo de pipeline_depth búferes: la red puede ir hasta ese número
+de búferes por delante del disco y solo se frena cuando el disco se queda atrás más que
+eso, así que la memoria usada por conexión está acotada. Las escrituras de un archivo se
+hacen en orden, nunca dos a la vez; las de archivos distintos, en paralelo.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_DISK_WRITERS = 4     # Hilos de escritura compartidos por todas las conexiones (0: sin tubería)
+DEFAULT_PIPELINE_DEPTH = 4   # Búferes por archivo en vuelo entre la red y el disco
+
+
+class InlineWriter:
+    """
+    Misma interfaz que WritePipeline, pero escribe desde el hilo de la conexión
+    (disk_writers = 0: la recepción sin tubería de siempre).
+    """
+
+    def __init__(self, file, digest, buffers, partial=None, offset=0):
+        self._file = file
+        self._digest = digest
+        self._buffer = buffers[0]
+        self._partial = partial
+        self._written = offset
+
+    def next_buffer(self):
+        return self._buffer
+
+    def write(self, data):
+        self._file.write(data)
+        self._digest.update(data)
+        self._written += len(data)
+        if self._partial:
+            self._partial.advance(self._file, self._digest, self._written)
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class DiskWriters:
+    """Pool de hilos que escriben en disco lo que reciben todas las conexiones."""
+
+    def __init__(self, workers=DEFAULT_DISK_WRITERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="receiver-disk")
+
+    def pipeline(self, file, digest, buffers, partial=None, offset=0):
+        """
+        Crea la tubería de escritura de un archivo.
+
+        :param file: Archivo abierto y posicionado donde se escribe.
+        :param digest: Hash en curso del contenido, que se actualiza con cada escritura.
+        :param buffers: Anillo de búferes (memoryview) de la conexión; su número es la profundidad.
+        :param partial: PartialTransfer en el que guardar puntos de control (o None).
+        :param offset: Bytes que ya tenía el archivo antes de esta recepción.
+        """
+        return WritePipeline(self._executor, file, digest, buffers, partial, offset)
+
+
+class WritePipeline:
+    """
+    Cola acotada de escrituras de un archivo. La conexión pide un búfer con next_buffer(),
+    lo llena y lo entrega con write(); un hilo del pool vacía la cola en orden.
+    """
+
+    def __init__(self, executor, file, digest, buffers, partial=None, offset=0):
+        self._executor = executor
+        self._file = file
+        self._digest = digest
+        self._buffers = buffers
+        self._partial = partial
+        self._written = offset
+        self._next = 0
+        self._chunks = deque()
+        self._in_flight = 0      # Trozos encolados o escribiéndose
+        self._scheduled = False  # Hay un hilo del pool vaciando la cola
+        self._error = None
+        self._cond = threading.Condition()
+
+    def next_buffer(self):
+        """
+        Devuelve el siguiente búfer del anillo, esperando a que el disco libere uno.
+
+        :raises OSError: Si falló una escritura anterior.
+        """
+        self._wait_slot()
+        buffer = self._buffers[self._next % len(self._buffers)]
+        self._next += 1
+        return buffer
+
+    def write(self, data):
+        """
+        Encola data para escribirla (un búfer de next_buffer() o un bytes propio).
+
+        :raises OSError: Si falló una escritura anterior.
+        """
+        with self._cond:
+            self._wait_slot_locked()
+            self._chunks.append(data)
+            self._in_flight += 1
+            if not self._scheduled:
+                self._scheduled = True
+                self._executor.submit(self._drain)
+
+    def close(self):
+        """
+        Espera a que se escriba todo lo encolado.
+
+        :raises OSError: Si falló alguna escritura.
+        """
+        with self._cond:
+            while self._in_flight and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise self._error
+
+    def abort(self):
+        """Descarta lo que quede por escribir y espera a que el pool deje de usar el archivo."""
+        with self._cond:
+            self._in_flight -= len(self._chunks)
+            self._chunks.clear()
+            while self._scheduled:
+                self._cond.wait()
+
+    def _wait_slot(self):
+        with self._cond:
+            self._wait_slot_locked()
+
+    def _wait_slot_locked(self):
+        # Con menos de len(buffers) trozos en vuelo, el búfer que toca reutilizar ya está escrito
+        while self._in_flight >= len(self._buffers) and self._error is None:
+            self._cond.wait()
+        if self._error is not None:
+            raise self._error
+
+    def _drain(self):
+        """Escribe en orden los trozos encolados (en un hilo del pool)."""
+        while True:
+            with self._cond:
+                if not self._chunks:
+                    self._scheduled = False
+                    self._cond.notify_all()
+                    return
+                data = self._chunks.popleft()
+            try:
+                self._file.write(data)
+                self._digest.update(data)
+                self._written += len(data)
+                if self._partial:
+                    self._partial.advance(self._file, self._digest, self._written)
+            except Exception as e:
+                with self._cond:
+                    self._error = e if isinstance(e, OSError) else OSError(str(e))
+                    self._in_flight = 0
+                    self._chunks.clear()
+                    self._scheduled = False
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
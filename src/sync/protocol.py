@@ -0,0 +1,157 @@
+"""
+Protocolo de transferencia entre SyncManager y FileReceiver.
+
+Cada mensaje es una trama con una cabecera binaria fija:
+
+    MAGIC (4 bytes) | versión (1 byte) | tipo (1 byte) | longitud de los metadatos (4 bytes)
+
+seguida de los metadatos en JSON (UTF-8). Las tramas de tipo MSG_FILE van seguidas
+de exactamente meta["size"] bytes de contenido (o de los que faltan a partir de
+meta["offset"], si se reanuda una transferencia). Una misma conexión transporta
+tantas tramas como se quiera, una detrás de otra.
+"""
+
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+
+MAGIC = b"GASY"
+VERSION = 1
+HEADER = struct.Struct("!4sBBI")
+MAX_META_SIZE = 16 * 1024 * 1024  # Límite de seguridad para los metadatos JSON
+
+# Tipos de trama
+MSG_FILE = 1  # Archivo: {"path", "size", "sha256", "offset" opcional} + contenido desde offset
+MSG_ACK = 2   # Respuesta del receptor: {"ok": bool, "error": str opcional, ...}
+MSG_QUERY = 3  # Consulta previa al envío: {"path", "size", "sha256"} -> MSG_ACK {"ok", "have": bool, "offset"}
+MSG_SIGNATURE_REQUEST = 4  # Pide las firmas de bloques de la copia del receptor: {"path", "max_size"}
+MSG_SIGNATURES = 5         # Respuesta: {"ok", "exists", "block_size", "size"} + firmas (ver delta.py)
+MSG_DELTA = 6              # Delta: {"path", "size", "file_size", "sha256", "block_size"} + operaciones
+MSG_PACK = 7               # Paquete de archivos pequeños: {"entries": [{"path", "size", "sha256"}], "size"} + contenidos
+MSG_STRIPE_BEGIN = 8       # Inicio de una transferencia por franjas (ver striping.py)
+MSG_RANGE = 9              # Rango de una transferencia por franjas: {"transfer", "index", "offset", "size"} + contenido
+MSG_STRIPE_END = 10        # Fin (o cancelación) de una transferencia por franjas
+MSG_METADATA = 11          # Operaciones sin contenido: {"ops": [{"op", "path", ...}]} -> MSG_ACK {"ok", "failed"} (ver metadata.py)
+MSG_TREE = 12              # Consulta del árbol de hashes: {"dirs", "entries"} -> MSG_ACK {"ok", "dirs"} (ver merkle.py)
+
+# Nombres de los archivos temporales del receptor, que nunca se replican: los de temp_path_for
+# (.nombre.<hilo>.tmp o .delta), los de PartialTransfer (.nombre.part y .nombre.ckpt) y los de
+# StripedFile (.nombre.<32 hex>.stripe). Un archivo del usuario como .notas.tmp sí se replica.
+TEMP_FILE_PATTERN = re.compile(r"\..+\.(?:\d+\.(?:tmp|delta)|[0-9a-f]{32}\.stripe|part|ckpt)", re.DOTALL)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_BUFFER_SIZE = 1024 * 1024  # Tamaño de los bloques de lectura/escritura en las transferencias
+
+
+class ProtocolError(Exception):
+    """Error de formato o de versión en una trama recibida."""
+
+
+def send_message(sock, msg_type, meta):
+    """
+    Envía una trama (cabecera + metadatos JSON) por el socket.
+
+    :param sock: Socket conectado.
+    :param msg_type: Tipo de trama (MSG_*).
+    :param meta: Diccionario con los metadatos.
+    """
+    body = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    sock.sendall(HEADER.pack(MAGIC, VERSION, msg_type, len(body)) + body)
+
+
+def recv_exact(sock, size):
+    """
+    Lee exactamente size bytes del socket.
+
+    :raises ConnectionError: Si el otro extremo cierra la conexión antes de tiempo.
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError(f"Conexión cerrada tras recibir {received} de {size} bytes.")
+        received += n
+    return bytes(buffer)
+
+
+def recv_message(sock):
+    """
+    Lee la siguiente trama del socket.
+
+    :return: Tupla (tipo, metadatos), o None si el otro extremo cerró la conexión entre tramas.
+    :raises ProtocolError: Si la trama no es válida o usa una versión no soportada.
+    """
+    first = sock.recv(HEADER.size)
+    if not first:
+        return None
+    header = first if len(first) == HEADER.size else first + recv_exact(sock, HEADER.size - len(first))
+
+    magic, version, msg_type, meta_size = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ProtocolError("Trama inválida (identificador desconocido).")
+    if version != VERSION:
+        raise ProtocolError(f"Versión de protocolo no soportada: {version} (se esperaba {VERSION}).")
+    if meta_size > MAX_META_SIZE:
+        raise ProtocolError(f"Metadatos demasiado grandes: {meta_size} bytes.")
+
+    try:
+        meta = json.loads(recv_exact(sock, meta_size).decode("utf-8")) if meta_size else {}
+    except ValueError as e:
+        raise ProtocolError(f"Metadatos JSON inválidos: {e}")
+    return msg_type, meta
+
+
+def file_sha256(file_path, chunk_size=HASH_CHUNK_SIZE):
+    """Calcula el hash SHA-256 (hexadecimal) del contenido de un archivo."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while (chunk := f.read(chunk_size)):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def to_wire_path(sync_folder, file_path):
+    """
+    Convierte una ruta local en la ruta relativa (con '/') que viaja en las tramas.
+    Los archivos fuera de la carpeta de sincronización se envían solo con su nombre.
+    """
+    if sync_folder:
+        try:
+            relative = os.path.relpath(os.path.abspath(file_path), os.path.abspath(sync_folder))
+        except ValueError:  # En Windows, unidades distintas
+            relative = os.pardir
+        if not relative.startswith(os.pardir):
+            return relative.replace(os.sep, "/")
+    return os.path.basename(file_path)
+
+
+def from_wire_path(sync_folder, wire_path):
+    """
+    Convierte la ruta recibida en una ruta local dentro de la carpeta de sincronización.
+
+    :raises ProtocolError: Si la ruta está vacía, es absoluta o intenta salir de la carpeta.
+    """
+    # to_wire_path nunca produce rutas absolutas: una que empiece por '/' no viene de un emisor legítimo
+    if not isinstance(wire_path, str) or wire_path.startswith("/"):
+        raise ProtocolError(f"Ruta de archivo no permitida: '{wire_path}'.")
+    parts = [part for part in wire_path.split("/") if part not in ("", ".")]
+    if not parts or any(part == ".." or "\\" in part or ":" in part for part in parts):
+        raise ProtocolError(f"Ruta de archivo no permitida: '{wire_path}'.")
+    return os.path.join(sync_folder, *parts)
+
+
+def temp_path_for(file_path, suffix=".tmp"):
+    """Devuelve una ruta temporal oculta, junto al archivo final, única para el hilo actual."""
+    directory, name = os.path.split(file_path)
+    return os.path.join(directory, f".{name}.{threading.get_ident()}{suffix}")
+
+
+def is_temp_file(file_path):
+    """Indica si una ruta corresponde a un archivo temporal del receptor."""
+    name = os.path.basename(file_path)
+    return TEMP_FILE_PATTERN.fullmatch(name) is not None
@@ -0,0 +1,44 @@
+import threading
+import time
+
+LIMITED_CHUNK_SIZE = 64 * 1024  # Bytes por envío cuando hay límite de velocidad (suaviza el tráfico)
+
+
+class TokenBucket:
+    """
+    Limitador de velocidad por cubo de fichas, compartido por todos los envíos a un cliente.
+
+    Cada byte consume una ficha; las fichas se reponen a rate por segundo hasta un
+    máximo de burst. Quien consume más de lo disponible queda en deuda y espera lo
+    justo para pagarla, así varios hilos que envían al mismo cliente reparten el
+    límite entre ellos sin superarlo en conjunto.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: Bytes por segundo.
+        :param burst: Bytes que se pueden enviar de golpe tras un periodo sin tráfico (por defecto, un segundo).
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate, burst=None):
+        """Cambia el límite (por ejemplo, tras recargar la configuración)."""
+        with self._lock:
+            self.rate = float(rate)
+            self.burst = float(burst or rate)
+            self._tokens = min(self._tokens, self.burst)
+
+    def consume(self, amount):
+        """Reserva amount bytes y espera, si hace falta, hasta que se puedan enviar."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
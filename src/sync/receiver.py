@@ -1,80 +1,863 @@
 import socket
 import os
-import logging
-
-# Configuración de la bitácora para el cliente
-LOG_FILE = "client_log.txt"
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
+import functools
+import hashlib
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from log import Logger
+from metrics import REGISTRY, EVENTS
+from metrics.events import RECEIVE
+from .compression import CHUNK_HEADER, IDENTITY, MAX_CHUNK_SIZE, StreamDecoder, available_encodings
+from .delta import choose_block_size, compute_signatures, apply_delta
+from .durability import Durability, DEFAULT_FSYNC, DEFAULT_GROUP_COMMIT_MS, DEFAULT_GROUP_COMMIT_FILES
+from .manifest import FileManifest
+from .merkle import MerkleTree, DIRS_PER_MESSAGE
+from .metadata import apply_operation
+from .packing import MAX_PACK_SIZE
+from .pipeline import DiskWriters, InlineWriter, DEFAULT_DISK_WRITERS, DEFAULT_PIPELINE_DEPTH
+from .relay import RelayForwarder, RelayStream
+from .resume import PartialTransfer, DEFAULT_RESUME_MIN_SIZE, DEFAULT_CHECKPOINT_INTERVAL
+from .striping import StripedFile, MIN_STRIPE_RANGE_SIZE
+from .protocol import (
+    MSG_FILE, MSG_ACK, MSG_QUERY, MSG_SIGNATURE_REQUEST, MSG_SIGNATURES, MSG_DELTA, MSG_PACK,
+    MSG_STRIPE_BEGIN, MSG_RANGE, MSG_STRIPE_END, MSG_METADATA, MSG_TREE, DEFAULT_BUFFER_SIZE, ProtocolError, send_message, recv_message, recv_exact, from_wire_path, temp_path_for
 )
 
+# Bitácora del cliente (client_log.txt), escrita en segundo plano por log.Logger
+logger = Logger.get_logger("receiver")
+
+# Valores por defecto del servidor de recepción
+DEFAULT_MAX_CONNECTIONS = 64   # Conexiones atendidas a la vez
+DEFAULT_READ_TIMEOUT = 60.0    # Segundos sin recibir datos antes de cerrar una conexión
+DEFAULT_BACKLOG = 128          # Conexiones pendientes que el sistema operativo encola
+ACCEPT_POLL_INTERVAL = 0.5     # Cada cuánto se comprueba si se pidió detener el servidor
+
+# Métricas de recepción (se publican con metrics.MetricsServer)
+BYTES_RECEIVED = REGISTRY.counter("receiver_bytes_received_total", "Bytes de contenido recibidos por la red.")
+FILES_RECEIVED = REGISTRY.counter(
+    "receiver_files_total", "Archivos recibidos por resultado (ok, skipped, delta, local_copy, error).", ("result",)
+)
+RECEIVE_SECONDS = REGISTRY.histogram("receiver_transfer_seconds", "Duración de la recepción de un archivo o de un paquete.")
+METADATA_OPS = REGISTRY.counter(
+    "receiver_metadata_ops_total", "Operaciones de metadatos por tipo y resultado (ok, error).", ("op", "result")
+)
+ACTIVE_CONNECTIONS = REGISTRY.gauge("receiver_active_connections", "Conexiones atendidas en este momento.")
+
 class FileReceiver:
-    def __init__(self, sync_folder, host='0.0.0.0', port=5000):
+    def __init__(self, sync_folder, host='0.0.0.0', port=5000, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 read_timeout=DEFAULT_READ_TIMEOUT, backlog=DEFAULT_BACKLOG, buffer_size=DEFAULT_BUFFER_SIZE,
+                 preallocate=True, socket_buffer_size=None, manifest=None,
+                 resume_min_size=DEFAULT_RESUME_MIN_SIZE, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+                 allow_relay=True, disk_writers=DEFAULT_DISK_WRITERS, pipeline_depth=DEFAULT_PIPELINE_DEPTH,
+                 fsync=DEFAULT_FSYNC, group_commit_ms=DEFAULT_GROUP_COMMIT_MS,
+                 group_commit_files=DEFAULT_GROUP_COMMIT_FILES):
         """
         Inicializa el cliente para recibir archivos.
         
         :param sync_folder: Carpeta de sincronización donde se guardarán los archivos recibidos.
         :param host: Dirección IP del cliente (por defecto 0.0.0.0 para aceptar todas las conexiones).
         :param port: Puerto donde escucha el cliente.
+        :param max_connections: Número máximo de conexiones atendidas simultáneamente.
+        :param read_timeout: Segundos sin recibir datos tras los que se cierra una conexión.
+        :param backlog: Tamaño de la cola de conexiones pendientes del socket de escucha.
+        :param buffer_size: Tamaño del búfer de recepción reutilizado por cada hilo.
+        :param preallocate: Reservar de antemano el espacio en disco del archivo (posix_fallocate).
+        :param socket_buffer_size: Tamaño de SO_RCVBUF en bytes (None para el ajuste automático del sistema).
+        :param manifest: Índice de contenido (FileManifest) compartido; se crea uno si no se indica.
+        :param resume_min_size: Tamaño a partir del cual las recepciones guardan puntos de control
+                                y se pueden reanudar tras un corte.
+        :param checkpoint_interval: Bytes recibidos entre dos puntos de control.
+        :param allow_relay: Aceptar reenviar los archivos recibidos a otros clientes (ver relay.py).
+        :param disk_writers: Hilos que escriben en disco lo recibido (0: cada conexión escribe lo suyo; ver pipeline.py).
+        :param pipeline_depth: Búferes por archivo que la red puede ir por delante del disco.
+        :param fsync: Política de volcado a disco: "none", "file" o "group" (ver durability.py).
+        :param group_commit_ms: Con "group", milisegundos máximos de espera de cada grupo.
+        :param group_commit_files: Con "group", archivos a partir de los cuales el grupo no espera más.
         """
         self.host = host
         self.port = port
         self.sync_folder = sync_folder
+        self.max_connections = max_connections
+        self.read_timeout = read_timeout
+        self.backlog = backlog
+        self.buffer_size = buffer_size
+        self.preallocate = preallocate and hasattr(os, "posix_fallocate")
+        self.socket_buffer_size = socket_buffer_size
+        self.resume_min_size = resume_min_size
+        self.checkpoint_interval = checkpoint_interval
+        self.allow_relay = allow_relay
+        self.pipeline_depth = max(1, int(pipeline_depth))
+        self._writers = DiskWriters(disk_writers) if disk_writers > 0 else None
+        self.durability = Durability(fsync, group_commit_ms, group_commit_files)
+        self._buffers = threading.local()  # Un búfer de recepción por hilo, reutilizado entre archivos
+
+        self.ready = threading.Event()  # Se activa cuando el servidor ya está escuchando
+        self._stop_event = threading.Event()
+        self._stopped = threading.Event()
+        self._stopped.set()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        self._receiving = set()  # Rutas con una recepción reanudable en curso
+        self._receiving_lock = threading.Lock()
+        self._stripes = {}  # Transferencias por franjas en curso: identificador -> StripedFile
+        self._stripes_lock = threading.Lock()
 
         # Crear la carpeta de sincronización, si no existe
         if not os.path.exists(self.sync_folder):
             os.makedirs(self.sync_folder)
+        self.manifest = manifest if manifest is not None else FileManifest(sync_folder)
+        self.merkle = MerkleTree(self.manifest)  # Para que el emisor compare su contenido con el nuestro
 
     def log_event(self, message):
         """Registra eventos en la bitácora."""
-        logging.info(message)
+        logger.info(message)
 
     def log_error(self, error):
         """Registra errores en la bitácora."""
-        logging.error(f"Error: {error}")
+        logger.error(f"Error: {error}")
 
     def start(self):
-        """Inicia el cliente para recibir archivos."""
+        """
+        Inicia el cliente para recibir archivos. Bloquea hasta que se llame a stop().
+
+        Cada conexión se atiende en un pool de hilos. Cuando están ocupadas las
+        max_connections plazas, el servidor deja de aceptar y las conexiones nuevas
+        esperan en la cola del sistema operativo (contrapresión hacia los emisores).
+        """
+        self._stop_event.clear()
+        self._stopped.clear()
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
+                server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if self.socket_buffer_size:
+                    # Las conexiones aceptadas heredan el tamaño del búfer del socket de escucha
+                    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.socket_buffer_size)
                 server_socket.bind((self.host, self.port))
-                server_socket.listen(5)
+                server_socket.listen(self.backlog)
+                server_socket.settimeout(ACCEPT_POLL_INTERVAL)
                 self.log_event(f"Cliente escuchando en {self.host}:{self.port} para recibir archivos.")
+                self.ready.set()
+
+                with ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="receiver") as pool:
+                    while not self._stop_event.is_set():
+                        # Esperar a que haya una plaza libre antes de aceptar otra conexión
+                        if not self._slots.acquire(timeout=ACCEPT_POLL_INTERVAL):
+                            continue
+                        try:
+                            conn, addr = server_socket.accept()
+                        except socket.timeout:
+                            self._slots.release()
+                            continue
+                        except OSError:
+                            self._slots.release()
+                            raise
 
-                while True:
-                    conn, addr = server_socket.accept()
-                    self.log_event(f"Conexión establecida con {addr}.")
-                    self._receive_file(conn)
+                        self.log_event(f"Conexión establecida con {addr}.")
+                        conn.settimeout(self.read_timeout)
+                        with self._connections_lock:
+                            self._connections.add(conn)
+                        ACTIVE_CONNECTIONS.inc()
+                        pool.submit(self._serve_connection, conn, addr)
+
+                    # Cerrar las conexiones activas para que los hilos del pool terminen
+                    self._close_connections()
         except Exception as e:
             self.log_error(f"Error en el cliente: {e}")
+        finally:
+            self._drop_stripes(everything=True)
+            self.ready.clear()
+            self._stopped.set()
+            self.log_event("Cliente de recepción detenido.")
+
+    def stop(self, timeout=None):
+        """
+        Detiene el servidor: deja de aceptar conexiones, cierra las activas y espera a que terminen.
+
+        :param timeout: Segundos máximos de espera (None para esperar indefinidamente).
+        :return: True si el servidor terminó dentro del tiempo indicado.
+        """
+        self._stop_event.set()
+        self._close_connections()
+        return self._stopped.wait(timeout)
+
+    def _close_connections(self):
+        """Interrumpe todas las conexiones activas."""
+        with self._connections_lock:
+            connections = list(self._connections)
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
 
-    def _receive_file(self, conn):
-        """Recibe un archivo del servidor y lo guarda en la carpeta de sincronización."""
+    def _serve_connection(self, conn, addr):
+        """Atiende una conexión en un hilo del pool y libera su plaza al terminar."""
         try:
-            # Recibir el nombre del archivo
-            file_name = conn.recv(1024).decode()
-            if not file_name:
-                self.log_error("No se recibió el nombre del archivo.")
-                return
-            
-            file_path = os.path.join(self.sync_folder, file_name)
-
-            # Abrir un archivo para escritura binaria
-            with open(file_path, 'wb') as file:
-                self.log_event(f"Recibiendo archivo: {file_name}")
-                while True:
-                    data = conn.recv(1024)
-                    if not data:
-                        break
-                    file.write(data)
-            
-            self.log_event(f"Archivo '{file_name}' recibido y guardado en {self.sync_folder}.")
+            self._handle_connection(conn, addr)
+        finally:
+            with self._connections_lock:
+                self._connections.discard(conn)
+            ACTIVE_CONNECTIONS.dec()
+            self._slots.release()
+
+    def _handle_connection(self, conn, addr):
+        """Atiende todas las tramas que llegan por una conexión hasta que el emisor la cierra."""
+        handlers = {
+            MSG_FILE: self._receive_file,
+            MSG_QUERY: self._handle_query,
+            MSG_SIGNATURE_REQUEST: self._send_signatures,
+            MSG_DELTA: self._receive_delta,
+            MSG_PACK: self._receive_pack,
+            MSG_STRIPE_BEGIN: self._begin_stripes,
+            MSG_RANGE: self._receive_range,
+            MSG_STRIPE_END: self._end_stripes,
+            MSG_METADATA: self._apply_metadata,
+            MSG_TREE: self._describe_tree,
+        }
+        try:
+            while not self._stop_event.is_set():
+                message = recv_message(conn)
+                if message is None:
+                    break
+                msg_type, meta = message
+                handler = handlers.get(msg_type)
+                if handler is None:
+                    raise ProtocolError(f"Tipo de trama desconocido: {msg_type}.")
+                handler(conn, meta)
+        except ProtocolError as e:
+            self.log_error(f"Trama inválida de {addr}: {e}")
+            self._send_ack(conn, False, str(e))
+        except socket.timeout:
+            self.log_event(f"Conexión con {addr} inactiva durante {self.read_timeout} s.")
         except Exception as e:
-            self.log_error(f"Error al recibir archivo: {e}")
+            self.log_error(f"Error en la conexión con {addr}: {e}")
         finally:
             conn.close()
+            self.log_event(f"Conexión con {addr} cerrada.")
+
+    def _send_ack(self, conn, ok, error=None):
+        """Envía la confirmación (o el error) de una trama al emisor."""
+        meta = {"ok": ok}
+        if error:
+            meta["error"] = error
+        if isinstance(conn, RelayStream):
+            # La confirmación espera a los nodos siguientes e incluye el resultado de todo el subárbol
+            meta["relayed"] = conn.finish()
+        try:
+            send_message(conn, MSG_ACK, meta)
+        except OSError:
+            pass
+
+    def _receive_file(self, conn, meta):
+        """
+        Recibe un archivo del servidor y lo guarda en la carpeta de sincronización.
+
+        El contenido se escribe en un archivo temporal que solo sustituye al definitivo
+        cuando el checksum completo coincide, así un corte nunca deja un archivo truncado.
+        Los archivos grandes se escriben en un archivo parcial con puntos de control
+        (ver resume.py) y el emisor puede continuar desde meta["offset"].
+        Si la trama trae meta["relay"], el contenido se reenvía a la vez a los nodos
+        siguientes del árbol de replicación (ver relay.py).
+        """
+        if meta.get("relay") and not isinstance(conn, RelayStream):
+            self._receive_and_forward(conn, meta)
+            return
+        file_name = meta.get("path", "")
+        size = int(meta.get("size", 0))
+        start = time.perf_counter()
+        try:
+            file_path = from_wire_path(self.sync_folder, file_name)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        except (ProtocolError, OSError) as e:
+            # Consumir el contenido para que la conexión siga alineada con la siguiente trama
+            self._skip_payload(conn, meta)
+            FILES_RECEIVED.inc(result="error")
+            self.log_error(f"Archivo '{file_name}' rechazado: {e}")
+            self._send_ack(conn, False, str(e))
+            return
+
+        expected = meta.get("sha256")
+        if expected and self.manifest.has_content(file_path, expected):
+            # Mismo contenido: no se reescribe, así el monitor local no lo vuelve a replicar
+            self._skip_payload(conn, meta)
+            FILES_RECEIVED.inc(result="skipped")
+            self.log_event(f"Archivo '{file_name}' ya estaba actualizado; no se reescribe.")
+            self._send_ack(conn, True)
+            return
+
+        encoding = meta.get("encoding", IDENTITY)
+        offset = int(meta.get("offset", 0))
+        partial = None
+        if expected and size >= self.resume_min_size and self._claim(file_path):
+            partial = PartialTransfer(file_path, expected, size, self.checkpoint_interval)
+        try:
+            try:
+                if partial:
+                    file, digest = partial.open(offset)
+                    temp_path = partial.part_path
+                elif offset:
+                    raise ProtocolError("la recepción no se puede reanudar")
+                else:
+                    temp_path = temp_path_for(file_path)
+                    file, digest = open(temp_path, "wb"), hashlib.sha256()
+            except (ProtocolError, OSError) as e:
+                self._skip_payload(conn, meta)
+                FILES_RECEIVED.inc(result="error")
+                self.log_error(f"Archivo '{file_name}' rechazado: {e}")
+                self._send_ack(conn, False, str(e))
+                return
+
+            transfer = EVENTS.begin(RECEIVE, self._peer_name(conn), file_name, size, offset)
+            try:
+                with file:
+                    if offset:
+                        self.log_event(f"Reanudando la recepción de '{file_name}' desde el byte {offset}.")
+                    else:
+                        self.log_event(f"Recibiendo archivo: {file_name}")
+                        self._preallocate(file, size)
+                    if encoding == IDENTITY:
+                        self._receive_raw(conn, file, size - offset, file_name, digest, partial, offset, transfer)
+                    else:
+                        self._receive_compressed(
+                            conn, file, size - offset, file_name, encoding, digest, partial, offset, transfer
+                        )
+            except ProtocolError as e:
+                # Contenido no válido: no se conserva nada para reanudar
+                self._discard_temp(partial, temp_path)
+                EVENTS.end(transfer, False, str(e))
+                raise
+            except BaseException as e:
+                # Corte de la conexión: el archivo parcial y su punto de control se conservan
+                if not partial:
+                    self._remove_quietly(temp_path)
+                EVENTS.end(transfer, False, str(e) or type(e).__name__)
+                raise
+
+            if expected and digest.hexdigest() != expected:
+                self._discard_temp(partial, temp_path)
+                EVENTS.end(transfer, False, "checksum no coincide")
+                FILES_RECEIVED.inc(result="error")
+                self.log_error(f"El checksum de '{file_name}' no coincide; archivo descartado.")
+                self._send_ack(conn, False, "checksum no coincide")
+                return
+
+            publish = partial.commit if partial else functools.partial(os.replace, temp_path, file_path)
+            try:
+                self.durability.commit(temp_path, publish)
+            except OSError as e:
+                self._discard_temp(partial, temp_path)
+                EVENTS.end(transfer, False, str(e))
+                FILES_RECEIVED.inc(result="error")
+                self.log_error(f"No se pudo guardar '{file_name}': {e}")
+                self._send_ack(conn, False, str(e))
+                return
+        finally:
+            if partial:
+                self._release(file_path)
+
+        self.manifest.record(file_path, digest.hexdigest())
+        EVENTS.end(transfer, True)
+        FILES_RECEIVED.inc(result="ok")
+        RECEIVE_SECONDS.observe(time.perf_counter() - start)
+        self.log_event(f"Archivo '{file_name}' recibido y guardado en {self.sync_folder}.")
+        self._send_ack(conn, True)
+
+    def _receive_and_forward(self, conn, meta):
+        """Recibe un archivo reenviando cada trozo, según llega, a los nodos siguientes del árbol."""
+        nodes = meta.get("relay") or []
+        forwarders = []
+        if self.allow_relay and not meta.get("offset"):
+            forwarders = [
+                RelayForwarder(node, meta, self.read_timeout).start() for node in nodes
+                if isinstance(node, dict) and node.get("host") and node.get("port")
+            ]
+        else:
+            self.log_event(f"No se reenvía '{meta.get('path', '')}' a {len(nodes)} cliente(s): relevo desactivado.")
+        stream = RelayStream(conn, forwarders)
+        try:
+            self._receive_file(stream, meta)
+        finally:
+            # Si la recepción se cortó antes de confirmar, los nodos siguientes descartan el archivo
+            stream.finish(complete=False)
+            for forwarder in forwarders:
+                if forwarder.error:
+                    self.log_error(f"No se pudo reenviar '{meta.get('path', '')}' a {forwarder.peer}: {forwarder.error}")
+
+    def _receive_raw(self, conn, file, size, file_name, digest, partial=None, offset=0, transfer=None):
+        """
+        Copia size bytes de la conexión al archivo. Este hilo solo lee de la red: la escritura,
+        el hash (digest) y los puntos de control los hacen los hilos de escritura (ver pipeline.py).
+
+        :param partial: PartialTransfer en el que ir guardando puntos de control (o None).
+        :param offset: Bytes que ya tenía el archivo antes de esta recepción.
+        :param transfer: Identificador de la recepción en EVENTS, para informar del avance.
+        """
+        writer = self._writer(file, digest, partial, offset, size)
+        remaining = size
+        try:
+            while remaining:
+                view = writer.next_buffer()
+                n = conn.recv_into(view, min(len(view), remaining))
+                if not n:
+                    raise ConnectionError(f"Conexión cerrada con {remaining} bytes pendientes de '{file_name}'.")
+                writer.write(view[:n])
+                remaining -= n
+                EVENTS.progress(transfer, n)
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            BYTES_RECEIVED.inc(size - remaining)
+
+    def _receive_compressed(self, conn, file, size, file_name, encoding, digest, partial=None, offset=0,
+                            transfer=None):
+        """
+        Lee el contenido comprimido en trozos, lo descomprime en flujo y lo entrega a la
+        tubería de escritura (ver _receive_raw).
+
+        :raises ProtocolError: Si el códec no está disponible o el tamaño descomprimido no coincide.
+        """
+        try:
+            decoder = StreamDecoder(encoding, self.buffer_size)
+        except ValueError as e:
+            raise ProtocolError(str(e))
+
+        def read_chunk():
+            (length,) = CHUNK_HEADER.unpack(recv_exact(conn, CHUNK_HEADER.size))
+            if length > MAX_CHUNK_SIZE:
+                raise ProtocolError(f"Trozo comprimido demasiado grande en '{file_name}': {length} bytes.")
+            BYTES_RECEIVED.inc(CHUNK_HEADER.size + length)
+            return recv_exact(conn, length) if length else b""
+
+        writer = self._writer(file, digest, partial, offset, size)
+        written = 0
+        try:
+            for data in decoder.decode(read_chunk):
+                written += len(data)
+                if written > size:
+                    # Se corta en cuanto sobra, sin escribir en disco más de lo anunciado
+                    raise ProtocolError(f"'{file_name}' descomprimido ocupa más de los {size} bytes anunciados.")
+                writer.write(data)
+                EVENTS.progress(transfer, len(data))
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+
+        if written != size:
+            raise ProtocolError(f"'{file_name}' descomprimido ocupa {written} bytes en lugar de {size}.")
+
+    def _handle_query(self, conn, meta):
+        """
+        Responde si ya se tiene el contenido anunciado por el emisor.
+
+        Si el archivo de destino ya tiene ese hash, no hace falta enviarlo. Si el mismo
+        contenido existe en otra ruta de la carpeta, se copia localmente en lugar de
+        recibirlo por la red.
+        """
+        digest = meta.get("sha256")
+        file_name = meta.get("path", "")
+        file_path = from_wire_path(self.sync_folder, file_name)
+        have = bool(digest) and self.manifest.has_content(file_path, digest)
+
+        if digest and not have:
+            for candidate in self.manifest.find_by_hash(digest):
+                source = self.manifest.local_path(candidate)
+                if source != file_path and self.manifest.has_content(source, digest):
+                    have = self._copy_local(source, file_path, digest)
+                    if have:
+                        FILES_RECEIVED.inc(result="local_copy")
+                        self.log_event(f"Archivo '{file_name}' copiado localmente desde '{candidate}'.")
+                    break
+
+        reply = {"ok": True, "have": have, "encodings": available_encodings(), "stripes": True}
+        size = int(meta.get("size", 0))
+        if digest and not have and size >= self.resume_min_size:
+            # Si una recepción anterior de este contenido se cortó, el emisor puede continuar
+            reply["offset"] = PartialTransfer(file_path, digest, size).resume_offset()
+        send_message(conn, MSG_ACK, reply)
+
+    def _send_signatures(self, conn, meta):
+        """Envía las firmas de bloques de la copia local para que el emisor calcule un delta."""
+        file_path = from_wire_path(self.sync_folder, meta.get("path", ""))
+        max_size = meta.get("max_size")
+        # Una copia base mayor que max_size tardaría demasiado en firmarse: el emisor la envía completa
+        if not os.path.isfile(file_path) or (max_size is not None and os.path.getsize(file_path) > int(max_size)):
+            send_message(conn, MSG_SIGNATURES, {"ok": True, "exists": False, "size": 0})
+            return
+
+        block_size = choose_block_size(os.path.getsize(file_path))
+        signatures = compute_signatures(file_path, block_size)
+        send_message(conn, MSG_SIGNATURES, {
+            "ok": True, "exists": True, "block_size": block_size, "size": len(signatures)
+        })
+        conn.sendall(signatures)
+
+    def _receive_delta(self, conn, meta):
+        """
+        Reconstruye un archivo a partir de la copia local y del delta recibido.
+        El resultado se escribe en un archivo temporal y solo sustituye al original
+        (de forma atómica) si su checksum coincide.
+        """
+        file_name = meta.get("path", "")
+        size = int(meta.get("size", 0))
+        start = time.perf_counter()
+        file_path = from_wire_path(self.sync_folder, file_name)
+        if not os.path.isfile(file_path):
+            self._drain(conn, size)
+            FILES_RECEIVED.inc(result="error")
+            self._send_ack(conn, False, "no existe la copia base para el delta")
+            return
+
+        temp_path = temp_path_for(file_path, ".delta")
+        try:
+            with open(file_path, "rb") as base, open(temp_path, "wb") as out:
+                try:
+                    digest = apply_delta(base, lambda n: recv_exact(conn, n), size, out, int(meta["block_size"]))
+                except ValueError as e:
+                    # El flujo ya no está alineado con las tramas: hay que cerrar la conexión
+                    raise ProtocolError(f"Delta inválido para '{file_name}': {e}")
+            BYTES_RECEIVED.inc(size)
+
+            if digest.hexdigest() != meta.get("sha256") or os.path.getsize(temp_path) != meta.get("file_size"):
+                FILES_RECEIVED.inc(result="error")
+                self.log_error(f"El checksum del delta de '{file_name}' no coincide; se descarta.")
+                self._send_ack(conn, False, "checksum no coincide")
+                return
+
+            self.durability.commit(temp_path, functools.partial(os.replace, temp_path, file_path))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.manifest.record(file_path, meta["sha256"])
+        FILES_RECEIVED.inc(result="delta")
+        RECEIVE_SECONDS.observe(time.perf_counter() - start)
+        self.log_event(f"Archivo '{file_name}' actualizado con un delta de {size} bytes.")
+        EVENTS.note(f"Delta de '{file_name}' recibido de {self._peer_name(conn)} ({size} bytes)")
+        self._send_ack(conn, True)
+
+    def _receive_pack(self, conn, meta):
+        """
+        Recibe un paquete de archivos pequeños y lo desempaqueta en la carpeta de sincronización.
+
+        El paquete se recibe entero en memoria y cada archivo se escribe en un temporal; solo
+        cuando todo el contenido llegó se renombran los temporales a su nombre definitivo.
+        Si la conexión se corta a mitad, no se instala ningún archivo del paquete. Los
+        archivos con checksum o ruta no válidos se rechazan uno a uno y se informan al emisor.
+        """
+        entries = meta.get("entries", [])
+        size = int(meta.get("size", 0))
+        if size > MAX_PACK_SIZE or sum(int(entry.get("size", 0)) for entry in entries) != size:
+            self._drain(conn, size)
+            FILES_RECEIVED.inc(len(entries), result="error")
+            self._send_ack(conn, False, f"paquete no válido ({len(entries)} archivos, {size} bytes)")
+            return
+
+        start = time.perf_counter()
+        payload = memoryview(recv_exact(conn, size))
+        BYTES_RECEIVED.inc(size)
+
+        failed, staged, skipped = {}, [], 0
+        offset = 0
+        try:
+            for entry in entries:
+                file_name = entry.get("path", "")
+                data = payload[offset:offset + int(entry["size"])]
+                offset += len(data)
+                try:
+                    file_path = from_wire_path(self.sync_folder, file_name)
+                except ProtocolError as e:
+                    failed[file_name] = str(e)
+                    continue
+                digest = entry.get("sha256")
+                if hashlib.sha256(data).hexdigest() != digest:
+                    failed[file_name] = "checksum no coincide"
+                    continue
+                if self.manifest.has_content(file_path, digest):
+                    skipped += 1  # Mismo contenido: no se reescribe
+                    continue
+                temp_path = temp_path_for(file_path)
+                try:
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    with open(temp_path, "wb") as f:
+                        f.write(data)
+                except OSError as e:
+                    failed[file_name] = str(e)
+                    continue
+                staged.append((temp_path, file_path, digest))
+
+            # Todos los archivos del paquete se vuelcan y publican juntos (un solo grupo)
+            errors = self.durability.commit_many(
+                [(temp_path, functools.partial(os.replace, temp_path, file_path)) for temp_path, file_path, _ in staged]
+            )
+            installed = []
+            for (temp_path, file_path, digest), error in zip(staged, errors):
+                if error is not None:
+                    failed[self.manifest.relative_path(file_path)] = str(error)
+                    continue
+                installed.append((self.manifest.relative_path(file_path), os.stat(file_path), digest))
+        finally:
+            for temp_path, _, _ in staged:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+        self.manifest.record_many(installed)
+        FILES_RECEIVED.inc(len(installed), result="ok")
+        if skipped:
+            FILES_RECEIVED.inc(skipped, result="skipped")
+        if failed:
+            FILES_RECEIVED.inc(len(failed), result="error")
+        RECEIVE_SECONDS.observe(time.perf_counter() - start)
+        self.log_event(
+            f"Paquete de {len(entries)} archivo(s) recibido: {len(installed)} guardado(s), "
+            f"{skipped} sin cambios, {len(failed)} rechazado(s)."
+        )
+        EVENTS.note(
+            f"Paquete de {len(entries)} archivo(s) recibido de {self._peer_name(conn)}: "
+            f"{len(installed)} guardado(s), {len(failed)} rechazado(s)", not failed
+        )
+        send_message(conn, MSG_ACK, {"ok": True, "failed": failed})
+
+    def _begin_stripes(self, conn, meta):
+        """Prepara una transferencia por franjas (ver striping.py) y responde con su identificador."""
+        file_name = meta.get("path", "")
+        expected = meta.get("sha256")
+        self._drop_stripes()
+        try:
+            file_path = from_wire_path(self.sync_folder, file_name)
+            range_size = int(meta.get("range_size", 0))
+            if not expected or range_size < MIN_STRIPE_RANGE_SIZE:
+                raise ProtocolError("transferencia por franjas sin hash o con rangos demasiado pequeños")
+            if self.manifest.has_content(file_path, expected):
+                FILES_RECEIVED.inc(result="skipped")
+                self.log_event(f"Archivo '{file_name}' ya estaba actualizado; no se reescribe.")
+                send_message(conn, MSG_ACK, {"ok": True, "have": True})
+                return
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            transfer = StripedFile(file_path, int(meta.get("size", 0)), expected, range_size)
+            transfer.open(self._preallocate)
+        except (ProtocolError, OSError, ValueError) as e:
+            FILES_RECEIVED.inc(result="error")
+            self.log_error(f"Archivo '{file_name}' rechazado: {e}")
+            self._send_ack(conn, False, str(e))
+            return
+
+        transfer.event = EVENTS.begin(RECEIVE, self._peer_name(conn), file_name, transfer.size)
+        with self._stripes_lock:
+            self._stripes[transfer.transfer_id] = transfer
+        self.log_event(f"Recibiendo archivo por franjas: {file_name} ({len(transfer.ranges)} rangos)")
+        send_message(conn, MSG_ACK, {"ok": True, "have": False, "transfer": transfer.transfer_id})
+
+    def _receive_range(self, conn, meta):
+        """Escribe un rango de una transferencia por franjas en su posición y responde con su hash."""
+        size = int(meta.get("size", 0))
+        index = int(meta.get("index", -1))
+        with self._stripes_lock:
+            transfer = self._stripes.get(meta.get("transfer"))
+        if transfer is None or not 0 <= index < len(transfer.ranges) \
+                or transfer.ranges[index] != (int(meta.get("offset", -1)), size):
+            self._drain(conn, size)
+            self._send_ack(conn, False, "rango desconocido")
+            return
+
+        offset = transfer.ranges[index][0]
+        digest = hashlib.sha256()
+        view = self._get_buffer()
+        remaining = size
+        try:
+            while remaining:
+                n = conn.recv_into(view, min(len(view), remaining))
+                if not n:
+                    raise ConnectionError(f"Conexión cerrada con {remaining} bytes pendientes del rango {index}.")
+                transfer.write(view[:n], offset + size - remaining)
+                digest.update(view[:n])
+                remaining -= n
+                EVENTS.progress(transfer.event, n)
+        finally:
+            BYTES_RECEIVED.inc(size - remaining)
+        transfer.range_done(index, digest.hexdigest())
+        send_message(conn, MSG_ACK, {"ok": True, "sha256": digest.hexdigest()})
+
+    def _end_stripes(self, conn, meta):
+        """
+        Termina una transferencia por franjas: si llegaron todos los rangos y sus hashes
+        coinciden con los del emisor, el temporal sustituye al archivo definitivo.
+        """
+        with self._stripes_lock:
+            transfer = self._stripes.pop(meta.get("transfer"), None)
+        if transfer is None:
+            self._send_ack(conn, False, "transferencia por franjas desconocida")
+            return
+        file_name = self.manifest.relative_path(transfer.file_path)
+        if meta.get("abort"):
+            transfer.discard()
+            EVENTS.end(transfer.event, False, "cancelado por el emisor")
+            self.log_event(f"El emisor canceló la transferencia por franjas de '{file_name}'.")
+            self._send_ack(conn, True)
+            return
+
+        problem = transfer.verify(meta.get("ranges") or [])
+        if problem is None:
+            try:
+                transfer.close()
+                self.durability.commit(transfer.temp_path, transfer.commit)
+            except OSError as e:
+                problem = str(e)
+        if problem is not None:
+            transfer.discard()
+            EVENTS.end(transfer.event, False, problem)
+            FILES_RECEIVED.inc(result="error")
+            self.log_error(f"Archivo '{file_name}' descartado: {problem}.")
+            self._send_ack(conn, False, problem)
+            return
+
+        self.manifest.record(transfer.file_path, transfer.sha256)
+        EVENTS.end(transfer.event, True)
+        FILES_RECEIVED.inc(result="ok")
+        RECEIVE_SECONDS.observe(time.monotonic() - transfer.started)
+        self.log_event(f"Archivo '{file_name}' recibido por franjas y guardado en {self.sync_folder}.")
+        self._send_ack(conn, True)
+
+    def _apply_metadata(self, conn, meta):
+        """
+        Aplica en orden un lote de operaciones de metadatos (ver metadata.py) y responde con
+        las que fallaron, para que el emisor envíe el contenido en su lugar.
+        """
+        ops = meta.get("ops", [])
+        failed = {}
+        for index, op in enumerate(ops):
+            kind = str(op.get("op")) if isinstance(op, dict) else "?"
+            try:
+                self.log_event(f"Operación de metadatos: {apply_operation(self.sync_folder, self.manifest, op)}.")
+                METADATA_OPS.inc(op=kind, result="ok")
+            except (ProtocolError, OSError) as e:
+                failed[str(index)] = str(e)
+                METADATA_OPS.inc(op=kind, result="error")
+                self.log_error(f"No se pudo aplicar la operación {op}: {e}")
+        EVENTS.note(
+            f"{len(ops)} operación(es) de metadatos de {self._peer_name(conn)} ({len(failed)} fallida(s))", not failed
+        )
+        send_message(conn, MSG_ACK, {"ok": True, "failed": failed})
+
+    def _describe_tree(self, conn, meta):
+        """Responde a una consulta del árbol de hashes con las carpetas pedidas (ver merkle.py)."""
+        dirs = meta.get("dirs", [])
+        if (not isinstance(dirs, list) or len(dirs) > DIRS_PER_MESSAGE
+                or not all(isinstance(item, list) and len(item) == 2 for item in dirs)):
+            raise ProtocolError("consulta del árbol de hashes no válida")
+        tree = self.merkle.describe([(str(directory), bucket) for directory, bucket in dirs], bool(meta.get("entries", True)))
+        send_message(conn, MSG_ACK, {"ok": True, "dirs": tree})
+
+    def _drop_stripes(self, everything=False):
+        """Abandona las transferencias por franjas inactivas (o todas, al detener el servidor)."""
+        now = time.monotonic()
+        with self._stripes_lock:
+            dropped = [transfer for transfer in self._stripes.values() if everything or transfer.expired(now)]
+            for transfer in dropped:
+                del self._stripes[transfer.transfer_id]
+        for transfer in dropped:
+            transfer.discard()
+            EVENTS.end(transfer.event, False, "abandonada")
+            self.log_event(f"Transferencia por franjas de '{transfer.file_path}' abandonada.")
+
+    def _copy_local(self, source, file_path, digest):
+        """Copia un archivo local con el contenido buscado y lo registra en el índice."""
+        temp_path = temp_path_for(file_path)
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            shutil.copyfile(source, temp_path)
+            self.durability.commit(temp_path, functools.partial(os.replace, temp_path, file_path))
+            self.manifest.record(file_path, digest)
+            return True
+        except OSError as e:
+            self.log_error(f"No se pudo copiar '{source}' a '{file_path}': {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+
+    def _writer(self, file, digest, partial=None, offset=0, size=None):
+        """
+        Devuelve la tubería de escritura de un archivo, o la escritura directa si no hay hilos
+        de escritura o el contenido cabe en un búfer (no hay nada que solapar con la red).
+        """
+        buffers = getattr(self._buffers, "ring", None)
+        if buffers is None:
+            count = self.pipeline_depth if self._writers else 1
+            buffers = self._buffers.ring = [memoryview(bytearray(self.buffer_size)) for _ in range(count)]
+        if self._writers is None or (size is not None and size <= self.buffer_size):
+            return InlineWriter(file, digest, buffers, partial, offset)
+        return self._writers.pipeline(file, digest, buffers, partial, offset)
+
+    def _get_buffer(self):
+        """Devuelve el búfer de recepción (memoryview) del hilo actual, creándolo la primera vez."""
+        view = getattr(self._buffers, "view", None)
+        if view is None:
+            view = self._buffers.view = memoryview(bytearray(self.buffer_size))
+        return view
+
+    def _preallocate(self, file, size):
+        """Reserva el espacio del archivo en disco para evitar fragmentación y fallos de espacio a mitad."""
+        if not (self.preallocate and size):
+            return
+        try:
+            os.posix_fallocate(file.fileno(), 0, size)
+        except OSError:
+            pass  # El sistema de archivos no lo soporta; se escribe de forma normal
+
+    def _skip_payload(self, conn, meta):
+        """Descarta el contenido de una trama MSG_FILE, tanto en crudo como comprimido."""
+        if meta.get("encoding", IDENTITY) == IDENTITY:
+            self._drain(conn, int(meta.get("size", 0)) - int(meta.get("offset", 0)))
+            return
+        while (length := CHUNK_HEADER.unpack(recv_exact(conn, CHUNK_HEADER.size))[0]):
+            if length > MAX_CHUNK_SIZE:
+                raise ProtocolError(f"Trozo comprimido demasiado grande: {length} bytes.")
+            self._drain(conn, length)
+
+    def _claim(self, file_path):
+        """Reserva una ruta para una recepción reanudable; False si ya hay otra en curso."""
+        with self._receiving_lock:
+            if file_path in self._receiving:
+                return False
+            self._receiving.add(file_path)
+            return True
+
+    def _release(self, file_path):
+        with self._receiving_lock:
+            self._receiving.discard(file_path)
+
+    def _discard_temp(self, partial, temp_path):
+        """Elimina el archivo temporal (o el parcial y su punto de control) de una recepción fallida."""
+        if partial:
+            partial.discard()
+        else:
+            self._remove_quietly(temp_path)
+
+    @staticmethod
+    def _peer_name(conn):
+        """Dirección IP del otro extremo de la conexión (para el panel de la GUI)."""
+        try:
+            return conn.getpeername()[0]
+        except OSError:
+            return "?"
+
+    @staticmethod
+    def _remove_quietly(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _drain(self, conn, size):
+        """Descarta size bytes de la conexión."""
+        while size:
+            size -= len(recv_exact(conn, min(size, 64 * 1024)))
@@ -0,0 +1,209 @@
+"""
+Replicación en cadena o en árbol: cada receptor reenvía el archivo a los siguientes.
+
+Con la replicación directa el emisor envía una copia completa a cada cliente, así que su
+enlace de subida transporta N copias de cada archivo. En modo relevo ("relay" en
+config.json) los clientes se ordenan en un árbol de grado relay_fanout (una cadena si el
+grado es 1) y el emisor solo envía a los primeros; la trama MSG_FILE lleva en
+meta["relay"] el subárbol que cada receptor debe alimentar:
+
+    {"path", "size", "sha256", "relay": [{"host", "port", "relay": [...]}, ...]} + contenido
+
+El receptor reenvía cada trozo en cuanto lo lee de la red, a la vez que lo escribe en
+disco (en tubería, sin esperar a tener el archivo completo), así que distribuir un
+archivo cuesta más o menos una transferencia más un pequeño retraso por salto. Su
+confirmación lleva en "relayed" el resultado de todo su subárbol ({"host:puerto": bool}),
+y el emisor reintenta directamente a los clientes que no lo recibieron.
+"""
+
+import queue
+import socket
+import threading
+from .protocol import MSG_FILE, MSG_ACK, send_message, recv_message
+
+DEFAULT_RELAY = "off"                 # "off", "chain" (cadena) o "tree" (árbol)
+DEFAULT_RELAY_FANOUT = 2              # Clientes a los que reenvía cada nodo del árbol
+DEFAULT_RELAY_MIN_SIZE = 1024 * 1024  # Los archivos menores se envían directamente a cada cliente
+RELAY_QUEUE_CHUNKS = 16               # Trozos en vuelo por cada reenvío antes de frenar la recepción
+RELAY_CONNECT_TIMEOUT = 5.0           # Segundos para conectar con el siguiente nodo
+
+
+def relay_fanout(mode, fanout):
+    """Grado del árbol para un modo de relevo (None si el relevo está desactivado)."""
+    if mode == "chain":
+        return 1
+    if mode == "tree":
+        return max(1, int(fanout))
+    return None
+
+
+def plan_relay(clients, fanout):
+    """
+    Ordena los clientes en un árbol de grado fanout, recorrido por niveles: el emisor
+    alimenta a los fanout primeros, el cliente i a los clientes fanout * (i + 1) a
+    fanout * (i + 2) - 1, y así sucesivamente.
+
+    :param clients: Lista de clientes ({"host", "port", ...}) en el orden de la configuración.
+    :param fanout: Hijos por nodo (1 para una cadena).
+    :return: Lista de nodos de primer nivel: {"host", "port", "relay": [nodos hijos]}.
+    """
+    nodes = [{"host": client["host"], "port": client["port"], "relay": []} for client in clients]
+    for index, node in enumerate(nodes[fanout:]):
+        nodes[index // fanout]["relay"].append(node)
+    return nodes[:fanout]
+
+
+def subtree_peers(node):
+    """Devuelve "host:puerto" de un nodo y de todos los que cuelgan de él."""
+    peers = [f"{node['host']}:{node['port']}"]
+    for child in node.get("relay", []):
+        peers.extend(subtree_peers(child))
+    return peers
+
+
+class RelayForwarder:
+    """
+    Reenvía un archivo a un nodo del árbol desde un hilo propio, a medida que llegan los
+    trozos. La cola acotada frena la recepción si el nodo siguiente va más lento (la
+    cadena avanza al ritmo del más lento); si el nodo falla, se deja de alimentar y
+    todo su subárbol se da por no recibido.
+    """
+
+    def __init__(self, node, meta, send_timeout):
+        """
+        :param node: Nodo del árbol ({"host", "port", "relay"}).
+        :param meta: Metadatos de la trama MSG_FILE recibida.
+        :param send_timeout: Segundos máximos de espera en cada operación con el nodo.
+        """
+        self.node = node
+        self.meta = dict(meta, relay=node.get("relay", []))
+        self.send_timeout = send_timeout
+        self.error = None
+        self._queue = queue.Queue(maxsize=RELAY_QUEUE_CHUNKS)
+        self._failed = threading.Event()
+        self._results = {}
+        self._thread = threading.Thread(target=self._run, name="relay-forward", daemon=True)
+
+    @property
+    def peer(self):
+        return f"{self.node['host']}:{self.node['port']}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def feed(self, data):
+        """Encola un trozo del contenido (se descarta si el nodo ya falló)."""
+        while not self._failed.is_set():
+            try:
+                self._queue.put(data, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def finish(self, complete=True):
+        """
+        Termina el reenvío y espera la confirmación del nodo.
+
+        :param complete: False si el contenido se cortó a medias (el nodo no debe guardarlo).
+        :return: Diccionario {"host:puerto": bool} del nodo y de su subárbol.
+        """
+        if not complete:
+            self._fail("la recepción se cortó")
+        self._close_queue()
+        self._thread.join()
+        return self._results
+
+    def _close_queue(self):
+        """
+        Encola la marca de fin (None). Si el nodo ya falló, la marca se entrega igualmente,
+        descartando trozos pendientes si la cola está llena: el hilo de envío puede estar
+        esperando en la cola y solo así se entera de que tiene que terminar.
+        """
+        self.feed(None)
+        if not self._failed.is_set():
+            return
+        while True:
+            try:
+                self._queue.put_nowait(None)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _fail(self, error):
+        if self.error is None:
+            self.error = error
+        self._failed.set()
+
+    def _run(self):
+        results = dict.fromkeys(subtree_peers(self.node), False)
+        try:
+            with socket.create_connection((self.node["host"], self.node["port"]), timeout=RELAY_CONNECT_TIMEOUT) as s:
+                s.settimeout(self.send_timeout)
+                send_message(s, MSG_FILE, self.meta)
+                while (data := self._queue.get()) is not None:
+                    if self._failed.is_set():
+                        return  # Al cerrar la conexión a medias, el nodo descarta el archivo
+                    s.sendall(data)
+                if self._failed.is_set():
+                    return
+                reply = recv_message(s)
+                if reply is None or reply[0] != MSG_ACK:
+                    raise ConnectionError("el nodo cerró la conexión sin confirmar")
+                results[self.peer] = bool(reply[1].get("ok"))
+                for peer, ok in reply[1].get("relayed", {}).items():
+                    if peer in results:
+                        results[peer] = bool(ok)
+        except Exception as e:
+            self._fail(str(e))
+        finally:
+            self._failed.set()
+            self._results = results
+            # Vaciar la cola para no bloquear a quien siga alimentando
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+
+class RelayStream:
+    """
+    Envoltorio de la conexión de entrada que copia a los RelayForwarder cada byte de
+    contenido que se lee, sin cambiar el código que recibe el archivo. Lo demás (enviar
+    la confirmación, la dirección del otro extremo...) pasa directamente a la conexión.
+    """
+
+    def __init__(self, conn, forwarders):
+        self.conn = conn
+        self.forwarders = forwarders
+        self._finished = None
+
+    def recv_into(self, buffer, nbytes=0):
+        n = self.conn.recv_into(buffer, nbytes)
+        if n:
+            data = bytes(memoryview(buffer)[:n])
+            for forwarder in self.forwarders:
+                forwarder.feed(data)
+        return n
+
+    def recv(self, size):
+        data = self.conn.recv(size)
+        if data:
+            for forwarder in self.forwarders:
+                forwarder.feed(data)
+        return data
+
+    def finish(self, complete=True):
+        """Termina todos los reenvíos (una sola vez) y devuelve los resultados de sus subárboles."""
+        if self._finished is None:
+            self._finished = {}
+            for forwarder in self.forwarders:
+                self._finished.update(forwarder.finish(complete))
+        return self._finished
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
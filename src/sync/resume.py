@@ -0,0 +1,141 @@
+"""
+Transferencias reanudables.
+
+El receptor escribe los archivos grandes en un archivo parcial oculto (.name.part) y,
+cada cierto número de bytes, lo vuelca a disco y guarda junto a él un punto de
+control (.name.ckpt, en JSON) con el desplazamiento ya escrito y el hash SHA-256 de
+ese prefijo. Si la conexión se corta, el emisor pregunta de nuevo (MSG_QUERY), recibe
+ese desplazamiento y envía solo lo que falta. El archivo parcial solo sustituye al
+definitivo cuando el hash completo coincide.
+
+El estado interno de hashlib no se puede guardar, así que al reanudar se vuelve a
+leer el prefijo desde el disco local: sirve a la vez para reconstruir el hash en curso
+y para comprobar que el archivo parcial no cambió.
+"""
+
+import hashlib
+import json
+import os
+from .protocol import HASH_CHUNK_SIZE, ProtocolError, temp_path_for
+
+DEFAULT_RESUME_MIN_SIZE = 16 * 1024 * 1024         # Por debajo de este tamaño no se guardan puntos de control
+DEFAULT_CHECKPOINT_INTERVAL = 64 * 1024 * 1024     # Bytes recibidos entre dos puntos de control
+
+
+class PartialTransfer:
+    """Archivo parcial (.part) de una recepción y su punto de control (.ckpt)."""
+
+    def __init__(self, file_path, sha256, size, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        :param file_path: Ruta definitiva del archivo.
+        :param sha256: Hash del contenido completo que se está recibiendo.
+        :param size: Tamaño del contenido completo.
+        :param interval: Bytes entre dos puntos de control.
+        """
+        directory, name = os.path.split(file_path)
+        self.file_path = file_path
+        self.part_path = os.path.join(directory, f".{name}.part")
+        self.checkpoint_path = os.path.join(directory, f".{name}.ckpt")
+        self.sha256 = sha256
+        self.size = size
+        self.interval = interval
+        self._saved_offset = 0
+
+    def resume_offset(self):
+        """
+        Devuelve el desplazamiento desde el que se puede reanudar la recepción de este
+        contenido (0 si no hay un punto de control válido para el mismo hash y tamaño).
+        """
+        checkpoint = self._load()
+        if not checkpoint:
+            return 0
+        try:
+            if os.path.getsize(self.part_path) < checkpoint["offset"]:
+                return 0
+        except OSError:
+            return 0
+        return checkpoint["offset"]
+
+    def open(self, offset=0):
+        """
+        Abre el archivo parcial para seguir escribiendo a partir de offset.
+
+        :return: Tupla (archivo abierto y posicionado, hash en curso del contenido ya escrito).
+        :raises ProtocolError: Si no hay un punto de control válido en offset o el prefijo cambió.
+        """
+        digest = hashlib.sha256()
+        if offset == 0:
+            self.discard()
+            self._saved_offset = 0
+            return open(self.part_path, "wb"), digest
+
+        checkpoint = self._load()
+        if not checkpoint or checkpoint["offset"] != offset:
+            raise ProtocolError(f"No hay un punto de control en el byte {offset}.")
+        f = open(self.part_path, "r+b")
+        try:
+            remaining = offset
+            while remaining:
+                chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+            if remaining or digest.hexdigest() != checkpoint["prefix_sha256"]:
+                raise ProtocolError("El archivo parcial no coincide con su punto de control.")
+            f.truncate(offset)  # Lo escrito después del último punto de control no está verificado
+            f.seek(offset)
+        except BaseException:
+            f.close()
+            self.discard()
+            raise
+        self._saved_offset = offset
+        return f, digest
+
+    def advance(self, f, digest, offset):
+        """
+        Guarda un punto de control si desde el último se recibieron al menos interval bytes.
+
+        :param f: Archivo parcial abierto.
+        :param digest: Hash en curso del contenido escrito hasta offset.
+        :param offset: Bytes escritos hasta ahora.
+        """
+        if offset - self._saved_offset < self.interval:
+            return
+        f.flush()
+        os.fsync(f.fileno())  # El punto de control solo puede apuntar a datos ya en disco
+        self._save(offset, digest.copy().hexdigest())
+        self._saved_offset = offset
+
+    def commit(self):
+        """Sustituye de forma atómica el archivo definitivo por el parcial completo."""
+        os.replace(self.part_path, self.file_path)
+        self._remove(self.checkpoint_path)
+
+    def discard(self):
+        """Elimina el archivo parcial y su punto de control."""
+        self._remove(self.part_path)
+        self._remove(self.checkpoint_path)
+
+    def _load(self):
+        try:
+            with open(self.checkpoint_path, "r") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get("sha256") != self.sha256 or checkpoint.get("size") != self.size:
+            return None  # Punto de control de otra versión del archivo
+        return checkpoint
+
+    def _save(self, offset, prefix_sha256):
+        temp_path = temp_path_for(self.checkpoint_path)
+        with open(temp_path, "w") as f:
+            json.dump({"sha256": self.sha256, "size": self.size, "offset": offset, "prefix_sha256": prefix_sha256}, f)
+        os.replace(temp_path, self.checkpoint_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,145 @@
+import os
+import time
+from .protocol import file_sha256, is_temp_file, to_wire_path
+
+
+def _hash_file(file_path):
+    """Calcula el hash de un archivo en un proceso del pool; devuelve None si ya no se puede leer."""
+    try:
+        return file_sha256(file_path)
+    except OSError:
+        return None
+
+
+class ScanResult:
+    """Resultado de una pasada de reconciliación."""
+
+    def __init__(self):
+        self.scanned = 0      # Archivos encontrados en disco
+        self.hashed = 0       # Archivos cuyo contenido hubo que volver a leer
+        self.changed = []     # Rutas locales nuevas o con contenido distinto al conocido
+        self.removed = []     # Rutas relativas que estaban en el índice y ya no existen
+        self.removed_hashes = {}  # Ruta relativa eliminada -> hash que tenía
+        self.renamed = []     # (ruta relativa anterior, ruta relativa nueva, hash) reconocidos por su inodo
+        self.known_paths = []  # Rutas relativas del índice antes de la pasada, ordenadas
+        self.elapsed = 0.0    # Duración de la pasada en segundos
+        self.workers = 1      # Procesos usados para calcular hashes
+
+
+class ReconciliationScanner:
+    """
+    Compara la carpeta de sincronización con el último estado conocido (el índice de
+    contenido) para detectar lo que cambió mientras el programa no estaba vigilando.
+
+    El recorrido usa os.scandir, que devuelve los datos de stat junto con cada entrada.
+    Solo se vuelve a leer el contenido de los archivos cuyo tamaño, fecha o inodo
+    cambiaron, y esos hashes se calculan en paralelo en un pool de procesos.
+
+    Un archivo nuevo con el mismo inodo, tamaño y fecha que uno que desapareció es el
+    mismo archivo renombrado o movido: se registra como renombrado, sin leerlo, para
+    replicarlo como operación de metadatos en lugar de reenviar su contenido.
+    """
+
+    def __init__(self, sync_folder, manifest, workers=None):
+        """
+        :param sync_folder: Carpeta de sincronización.
+        :param manifest: Índice de contenido (FileManifest) con el último estado conocido.
+        :param workers: Procesos para calcular hashes (por defecto, uno por núcleo).
+        """
+        self.sync_folder = sync_folder
+        self.manifest = manifest
+        self.workers = workers or os.cpu_count() or 1
+
+    def scan(self):
+        """
+        Recorre la carpeta, actualiza el índice y devuelve las diferencias encontradas.
+
+        :return: ScanResult con los archivos nuevos/modificados, los renombrados y los eliminados.
+        """
+        start = time.perf_counter()
+        result = ScanResult()
+        known = self.manifest.snapshot()
+        result.known_paths = sorted(known)
+        to_hash = []  # (ruta local, ruta relativa, stat, hash conocido o None)
+
+        for entry in self._walk(self.sync_folder):
+            # En Windows, DirEntry.stat() no rellena el inodo; ahí se usa os.stat
+            st = entry.stat() if os.name != "nt" else os.stat(entry.path)
+            result.scanned += 1
+            relative = to_wire_path(self.sync_folder, entry.path)
+            previous = known.pop(relative, None)
+            if previous and previous[:3] == (st.st_size, st.st_mtime_ns, st.st_ino):
+                continue
+            to_hash.append((entry.path, relative, st, previous[3] if previous else None))
+
+        to_hash, updates = self._match_renames(to_hash, known, result)
+        result.removed = list(known)
+        result.removed_hashes = {relative: entry[3] for relative, entry in known.items()}
+        result.hashed = len(to_hash)
+        hashes = self._hash_all([item[0] for item in to_hash], result)
+
+        for (path, relative, st, known_digest), digest in zip(to_hash, hashes):
+            if digest is None:
+                continue
+            updates.append((relative, st, digest))
+            # Si solo cambió la fecha (p. ej. un "touch"), el contenido no hay que replicarlo
+            if digest != known_digest:
+                result.changed.append(path)
+
+        if updates:
+            self.manifest.record_many(updates)
+        gone = result.removed + [old for old, _, _ in result.renamed]
+        if gone:
+            self.manifest.remove_many(gone)
+
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    def _match_renames(to_hash, known, result):
+        """
+        Reconoce como renombrados los archivos nuevos cuyo inodo, tamaño y fecha coinciden con
+        los de un archivo del índice que ya no existe. Los quita de known y de la lista por leer.
+
+        :return: Tupla (archivos que sigue habiendo que leer, entradas del índice de los renombrados).
+        """
+        if not known:
+            return to_hash, []
+        missing = {entry[:3]: relative for relative, entry in known.items()}
+        remaining, updates = [], []
+        for item in to_hash:
+            path, relative, st, known_digest = item
+            old = missing.pop((st.st_size, st.st_mtime_ns, st.st_ino), None) if known_digest is None else None
+            if old is None:
+                remaining.append(item)
+                continue
+            digest = known.pop(old)[3]
+            result.renamed.append((old, relative, digest))
+            updates.append((relative, st, digest))
+        return remaining, updates
+
+    def _hash_all(self, paths, result):
+        """Calcula los hashes de la lista de rutas, en paralelo si merece la pena."""
+        if len(paths) < 2 or self.workers < 2:
+            return [_hash_file(path) for path in paths]
+
+        from concurrent.futures import ProcessPoolExecutor  # Solo se carga si hay que reconciliar en paralelo
+        result.workers = min(self.workers, len(paths))
+        chunksize = max(1, len(paths) // (result.workers * 8))
+        with ProcessPoolExecutor(max_workers=result.workers) as pool:
+            return list(pool.map(_hash_file, paths, chunksize=chunksize))
+
+    @staticmethod
+    def _walk(folder):
+        """Recorre el árbol de forma iterativa y devuelve los archivos regulares (sin temporales)."""
+        stack = [folder]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and not is_temp_file(entry.path):
+                            yield entry
+            except OSError:
+                continue  # Carpeta eliminada o sin permisos durante el recorrido
@@ -0,0 +1,152 @@
+"""
+Transferencias en paralelo (por franjas) de archivos grandes.
+
+Con enlaces de mucha latencia una sola conexión TCP no llena el ancho de banda: la
+ventana de congestión limita los bytes en vuelo. Los archivos grandes se dividen en
+rangos de bytes que se envían a la vez por varias conexiones:
+
+    MSG_STRIPE_BEGIN  {"path", "size", "sha256", "range_size"} -> MSG_ACK {"ok", "have", "transfer"}
+    MSG_RANGE         {"transfer", "index", "offset", "size"} + contenido -> MSG_ACK {"ok", "sha256"}
+    MSG_STRIPE_END    {"transfer", "ranges": [sha256 de cada rango]} o {"transfer", "abort": true} -> MSG_ACK
+
+El receptor reserva el archivo completo en un temporal (.name.<transfer>.stripe) y
+escribe cada rango en su posición con os.pwrite (o con seek + write bajo un cerrojo
+donde no existe). Cada rango se verifica con su hash y el temporal solo sustituye al
+archivo definitivo cuando todos los rangos llegaron y coinciden con los del emisor.
+"""
+
+import os
+import threading
+import time
+
+DEFAULT_STRIPES = "auto"                         # Conexiones por archivo: un número o "auto"
+DEFAULT_STRIPE_MIN_SIZE = 64 * 1024 * 1024       # Archivos a partir de este tamaño se envían por franjas
+DEFAULT_STRIPE_RANGE_SIZE = 16 * 1024 * 1024     # Bytes de cada rango
+MIN_STRIPE_RANGE_SIZE = 64 * 1024                # Rango mínimo que se acepta (limita el número de rangos)
+MAX_AUTO_STRIPES = 8                             # Conexiones máximas en modo automático
+AUTO_MIN_RTT = 0.005                             # En modo automático, solo se usan franjas por encima de esta latencia
+STRIPE_IDLE_TIMEOUT = 600.0                      # Segundos sin rangos tras los que el receptor abandona una transferencia
+
+
+def plan_ranges(size, range_size):
+    """Divide size bytes en rangos consecutivos: lista de (desplazamiento, tamaño)."""
+    range_size = max(1, int(range_size))
+    return [(offset, min(range_size, size - offset)) for offset in range(0, size, range_size)]
+
+
+def choose_stripes(setting, range_count, rtt):
+    """
+    Decide cuántas conexiones usar para un archivo.
+
+    :param setting: Valor de "stripes" en la configuración: un número o "auto".
+    :param range_count: Número de rangos del archivo (nunca se usan más conexiones que rangos).
+    :param rtt: Tiempo de ida y vuelta medido con el cliente, en segundos (None si no se midió).
+    :return: Número de conexiones (1 significa enviar el archivo de la forma normal).
+    """
+    if setting == "auto":
+        # En la red local una conexión ya llena el enlace; las franjas solo añadirían coste
+        if rtt is None or rtt < AUTO_MIN_RTT:
+            return 1
+        stripes = MAX_AUTO_STRIPES
+    else:
+        stripes = max(1, int(setting))
+    return min(stripes, range_count)
+
+
+class StripedFile:
+    """Archivo temporal del receptor en el que se escriben los rangos de una transferencia por franjas."""
+
+    def __init__(self, file_path, size, sha256, range_size):
+        """
+        :param file_path: Ruta definitiva del archivo.
+        :param size: Tamaño del contenido completo.
+        :param sha256: Hash del contenido completo (para el índice).
+        :param range_size: Bytes de cada rango.
+        """
+        directory, name = os.path.split(file_path)
+        self.transfer_id = os.urandom(16).hex()
+        self.file_path = file_path
+        self.temp_path = os.path.join(directory, f".{name}.{self.transfer_id}.stripe")
+        self.size = size
+        self.sha256 = sha256
+        self.ranges = plan_ranges(size, range_size)
+        self.started = self.last_activity = time.monotonic()
+        self._received = {}  # índice -> sha256 del rango recibido
+        self._lock = threading.Lock()
+        self._file = None
+        self.event = None  # Identificador en metrics.EVENTS (panel de la GUI)
+
+    def open(self, preallocate=None):
+        """
+        Crea el temporal con el tamaño final.
+
+        :param preallocate: Función que reserva el espacio en disco del archivo abierto (opcional).
+        """
+        self._file = open(self.temp_path, "w+b")
+        try:
+            if preallocate:
+                preallocate(self._file, self.size)
+            self._file.truncate(self.size)
+        except BaseException:
+            self.discard()
+            raise
+
+    def write(self, data, position):
+        """Escribe data en la posición indicada; puede llamarse a la vez desde varios hilos."""
+        self.last_activity = time.monotonic()
+        if hasattr(os, "pwrite"):
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(self._file.fileno(), view, position)
+                view = view[written:]
+                position += written
+            return
+        with self._lock:
+            self._file.seek(position)
+            self._file.write(data)
+
+    def range_done(self, index, digest):
+        """Anota que el rango index llegó completo con el hash indicado."""
+        with self._lock:
+            self._received[index] = digest
+        self.last_activity = time.monotonic()
+
+    def verify(self, digests):
+        """
+        Comprueba que llegaron todos los rangos y que sus hashes son los del emisor.
+
+        :param digests: Lista con el hash de cada rango según el emisor.
+        :return: Descripción del problema, o None si todo coincide.
+        """
+        if len(digests) != len(self.ranges):
+            return f"se esperaban {len(self.ranges)} rangos y se anunciaron {len(digests)}"
+        with self._lock:
+            for index, digest in enumerate(digests):
+                received = self._received.get(index)
+                if received is None:
+                    return f"falta el rango {index}"
+                if received != digest:
+                    return f"el hash del rango {index} no coincide"
+        return None
+
+    def close(self):
+        """Cierra el temporal, ya completo (para poder volcarlo a disco antes de publicarlo)."""
+        self._file.close()
+
+    def commit(self):
+        """Cierra el temporal y sustituye de forma atómica el archivo definitivo."""
+        self._file.close()
+        os.replace(self.temp_path, self.file_path)
+
+    def discard(self):
+        """Cierra y elimina el temporal."""
+        if self._file:
+            self._file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+    def expired(self, now=None):
+        """Indica si la transferencia lleva más de STRIPE_IDLE_TIMEOUT segundos sin recibir nada."""
+        return (now or time.monotonic()) - self.last_activity > STRIPE_IDLE_TIMEOUT
@@ -1,36 +1,201 @@
-import socket
 import threading
 import os
+import time
+import tempfile
+import heapq
+import hashlib
+import itertools
+import json
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from config import ConfigurationManager
 from monitor import FolderMonitor
-import logging
-
-# Configuración del logger (bitácora de operaciones)
-LOG_FILE = "sync_log.txt"
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
+from monitor.coalescer import DEFAULT_QUIET_WINDOW, DEFAULT_BATCH_SIZE
+from log import Logger
+from metrics import REGISTRY, EVENTS
+from metrics.events import SEND
+from .connection_pool import ConnectionPool, DEFAULT_MAX_IDLE_PER_PEER, DEFAULT_IDLE_TIMEOUT
+from .compression import CHUNK_HEADER, IDENTITY, MAX_CHUNK_SIZE, DEFAULT_MIN_SIZE as DEFAULT_COMPRESSION_MIN_SIZE
+from .compression import choose_encoding, compressor, file_extension
+from .delta import compute_delta
+from .manifest import FileManifest
+from .merkle import MerkleTree, DEFAULT_ANTI_ENTROPY_INTERVAL, compare_trees
+from .metadata import OPS_PER_MESSAGE, RENAME, rename_op, delete_op, mkdir_op, collapse_renames, collapse_deletes
+from .outbound import OutboundQueue, OUTBOUND_FILE, DEFAULT_RETRY_BASE_DELAY, DEFAULT_RETRY_MAX_DELAY
+from .ratelimit import TokenBucket, LIMITED_CHUNK_SIZE
+from .packing import DEFAULT_PACK_MAX_FILE_SIZE, DEFAULT_PACK_MAX_FILES, DEFAULT_PACK_MAX_BYTES
+from .packing import plan_packs, load_pack
+from .relay import DEFAULT_RELAY, DEFAULT_RELAY_FANOUT, DEFAULT_RELAY_MIN_SIZE, relay_fanout, plan_relay, subtree_peers
+from .scanner import ReconciliationScanner
+from .striping import DEFAULT_STRIPES, DEFAULT_STRIPE_MIN_SIZE, DEFAULT_STRIPE_RANGE_SIZE, MIN_STRIPE_RANGE_SIZE
+from .striping import plan_ranges, choose_stripes
+from .protocol import (
+    MSG_FILE, MSG_ACK, MSG_QUERY, MSG_SIGNATURE_REQUEST, MSG_SIGNATURES, MSG_DELTA, MSG_PACK,
+    MSG_STRIPE_BEGIN, MSG_RANGE, MSG_STRIPE_END, MSG_METADATA, MSG_TREE, DEFAULT_BUFFER_SIZE, ProtocolError, send_message, recv_message, recv_exact, to_wire_path, is_temp_file
 )
 
+# Bitácora de operaciones (sync_log.txt), escrita en segundo plano por log.Logger
+logger = Logger.get_logger("sync")
+
+# Valores por defecto del motor de replicación (se pueden sobrescribir en config.json)
+DEFAULT_MAX_WORKERS = 32          # Envíos simultáneos en total, sumando todos los archivos
+DEFAULT_MAX_SENDS_PER_FILE = 20   # Envíos simultáneos de un mismo archivo
+DEFAULT_MAX_CONCURRENT_FILES = 4  # Archivos replicándose a la vez
+DEFAULT_CONNECT_TIMEOUT = 5.0     # Segundos para establecer la conexión con un cliente
+DEFAULT_SEND_TIMEOUT = 30.0       # Segundos máximos de espera en cada operación de envío
+DEFAULT_QUERY_MIN_SIZE = 0        # Tamaño a partir del cual se pregunta al cliente si ya tiene el archivo
+DEFAULT_DELTA_MIN_SIZE = 1024 * 1024  # Tamaño a partir del cual se intenta la transferencia diferencial
+DEFAULT_DELTA_MAX_RATIO = 0.5     # Si el delta supera esta fracción del archivo, se envía completo
+DEFAULT_DELTA_MAX_SIZE = 64 * 1024 * 1024  # Tamaño a partir del cual el archivo se envía siempre completo
+DEFAULT_DELTA_TIME_BUDGET = 10.0  # Segundos máximos para calcular un delta (por debajo del read_timeout del receptor)
+RETRY_POLL_INTERVAL = 1.0         # Cada cuánto se buscan en el diario envíos que toca reintentar
+
+# Prioridades de la cola de replicación (menor = antes)
+PRIORITY_SMALL = 0   # Archivos pequeños y paquetes recién modificados
+PRIORITY_RECENT = 1  # Archivos grandes recién modificados
+PRIORITY_BULK = 2    # Reconciliación y reintentos
+
+# Métricas de replicación (se publican con metrics.MetricsServer)
+BYTES_SENT = REGISTRY.counter("sync_bytes_sent_total", "Bytes enviados por la red a cada cliente.", ("peer",))
+FILES_SENT = REGISTRY.counter(
+    "sync_files_total", "Archivos procesados por cliente y resultado (ok, skipped, delta, striped, relay, error).",
+    ("peer", "result")
+)
+TRANSFER_SECONDS = REGISTRY.histogram(
+    "sync_transfer_seconds", "Duración de la replicación de un archivo a un cliente.", ("peer",)
+)
+PEER_THROUGHPUT = REGISTRY.gauge(
+    "sync_peer_throughput_bytes_per_second", "Velocidad de la última transferencia completa a cada cliente.", ("peer",)
+)
+EVENT_TO_REPLICATED = REGISTRY.histogram(
+    "sync_event_to_replicated_seconds", "Tiempo desde el primer evento de un archivo hasta que terminó su replicación."
+)
+PENDING_FILES = REGISTRY.gauge("sync_pending_files", "Archivos en cola o replicándose.")
+RETRIES = REGISTRY.counter("sync_retries_total", "Reintentos de envío a cada cliente.", ("peer",))
+OPERATIONS_SENT = REGISTRY.counter(
+    "sync_metadata_ops_total", "Operaciones de metadatos enviadas por cliente y resultado (ok, error).", ("peer", "result")
+)
+DIVERGENT_FILES = REGISTRY.gauge(
+    "sync_anti_entropy_divergent_files", "Archivos que faltaban o diferían en cada cliente en la última comparación.",
+    ("peer",)
+)
+OUTBOUND_PENDING = REGISTRY.gauge(
+    "sync_outbound_pending", "Envíos anotados en el diario a la espera de confirmación de cada cliente.", ("peer",)
+)
+
+
+class DeltaError(Exception):
+    """Falló el intercambio de firmas o el envío de un delta; la conexión ya no es utilizable."""
+
+
 class SyncManager:
-    def __init__(self, sync_folder):
+    def __init__(self, sync_folder, manifest=None, outbound=None):
+        """
+        :param sync_folder: Carpeta de sincronización local.
+        :param manifest: Índice de contenido (FileManifest) compartido; se crea uno si no se indica.
+        :param outbound: Diario de envíos pendientes (OutboundQueue); se crea uno si no se indica.
+        """
         self.sync_folder = sync_folder
+        self.manifest = manifest if manifest is not None else FileManifest(sync_folder)
         self.monitor = None
         self.monitor_thread = None
         self.is_monitoring = False
 
+        # Los tamaños de los pools se leen una sola vez; los tiempos de espera se recargan con update_config()
+        config = ConfigurationManager.load_config()
+        max_workers = int(config.get("max_workers", DEFAULT_MAX_WORKERS))
+        max_files = int(config.get("max_concurrent_files", DEFAULT_MAX_CONCURRENT_FILES))
+        self._send_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sync-send")
+        self._file_pool = ThreadPoolExecutor(max_workers=max_files, thread_name_prefix="sync-file")
+        self.connection_pool = ConnectionPool(
+            max_idle_per_peer=int(config.get("pool_max_idle_per_peer", DEFAULT_MAX_IDLE_PER_PEER)),
+            idle_timeout=float(config.get("pool_idle_timeout", DEFAULT_IDLE_TIMEOUT)),
+            socket_buffer_size=config.get("socket_buffer_size")
+        )
+        self.outbound = outbound if outbound is not None else OutboundQueue(config.get("outbound_queue_path", OUTBOUND_FILE))
+        self._limiters = {}  # "host:puerto" -> TokenBucket
+        self._limiters_lock = threading.Lock()
+        # Cola con prioridad delante del pool de archivos (ver _submit)
+        self._tasks = []
+        self._tasks_lock = threading.Lock()
+        self._task_order = itertools.count()
+        # Envío ordenado de las operaciones de metadatos: un cerrojo por cliente (ver _flush_operations)
+        self._operation_locks = {}
+        self._flush_scheduled = set()
+        self._operations_lock = threading.Lock()
+        self.merkle = MerkleTree(self.manifest)  # Árbol de hashes para la antientropía (ver merkle.py)
+        self._apply_config(config)
+        self._next_anti_entropy = time.monotonic() + self.anti_entropy_interval
+
+        # Hilo que reintenta los envíos fallidos (también los que quedaron pendientes al cerrar)
+        self._stop_event = threading.Event()
+        self._retry_thread = threading.Thread(target=self._retry_loop, name="sync-retry", daemon=True)
+        self._retry_thread.start()
+
+    def _apply_config(self, config):
+        """Aplica los parámetros de replicación que pueden cambiar en caliente."""
+        self.max_sends_per_file = max(1, int(config.get("max_sends_per_file", DEFAULT_MAX_SENDS_PER_FILE)))
+        self.connect_timeout = float(config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT))
+        self.send_timeout = float(config.get("send_timeout", DEFAULT_SEND_TIMEOUT))
+        self.buffer_size = int(config.get("buffer_size", DEFAULT_BUFFER_SIZE))
+        self.query_min_size = int(config.get("query_min_size", DEFAULT_QUERY_MIN_SIZE))
+        self.delta_enabled = bool(config.get("delta_enabled", True))
+        self.delta_min_size = int(config.get("delta_min_size", DEFAULT_DELTA_MIN_SIZE))
+        self.delta_max_ratio = float(config.get("delta_max_ratio", DEFAULT_DELTA_MAX_RATIO))
+        self.delta_max_size = int(config.get("delta_max_size", DEFAULT_DELTA_MAX_SIZE))
+        self.delta_time_budget = float(config.get("delta_time_budget", DEFAULT_DELTA_TIME_BUDGET))
+        self.compression = config.get("compression", "auto")  # "auto", "off" o un códec concreto
+        self.compression_level = config.get("compression_level")
+        self.compression_min_size = int(config.get("compression_min_size", DEFAULT_COMPRESSION_MIN_SIZE))
+        self.scan_workers = config.get("scan_workers")  # None: un proceso por núcleo
+        self.batch_size = int(config.get("event_batch_size", DEFAULT_BATCH_SIZE))
+        # Los archivos pequeños de un mismo lote viajan juntos en paquetes (ver packing.py)
+        self.pack_enabled = bool(config.get("pack_enabled", True))
+        self.pack_max_file_size = int(config.get("pack_max_file_size", DEFAULT_PACK_MAX_FILE_SIZE))
+        self.pack_max_files = max(1, int(config.get("pack_max_files", DEFAULT_PACK_MAX_FILES)))
+        self.pack_max_bytes = int(config.get("pack_max_bytes", DEFAULT_PACK_MAX_BYTES))
+        # sendfile delega la copia archivo -> socket al kernel, sin pasar por memoria de Python
+        self.use_sendfile = bool(config.get("use_sendfile", True)) and hasattr(os, "sendfile")
+        # Límite de velocidad por cliente en bytes/s (None: sin límite); cada cliente puede fijar el suyo
+        self.rate_limit = config.get("rate_limit")
+        self.outbound.base_delay = float(config.get("retry_base_delay", DEFAULT_RETRY_BASE_DELAY))
+        self.outbound.max_delay = float(config.get("retry_max_delay", DEFAULT_RETRY_MAX_DELAY))
+        # Archivos grandes por varias conexiones a la vez (ver striping.py); cada cliente puede fijar sus "stripes"
+        self.stripes = config.get("stripes", DEFAULT_STRIPES)
+        self.stripe_min_size = int(config.get("stripe_min_size", DEFAULT_STRIPE_MIN_SIZE))
+        self.stripe_range_size = max(
+            MIN_STRIPE_RANGE_SIZE, int(config.get("stripe_range_size", DEFAULT_STRIPE_RANGE_SIZE))
+        )
+        # Replicación en cadena o en árbol: los clientes se reenvían los archivos grandes (ver relay.py)
+        self.relay = config.get("relay", DEFAULT_RELAY)
+        self.relay_fanout = int(config.get("relay_fanout", DEFAULT_RELAY_FANOUT))
+        self.relay_min_size = int(config.get("relay_min_size", DEFAULT_RELAY_MIN_SIZE))
+        # Comparación periódica del árbol de hashes con cada cliente (0: desactivada)
+        self.anti_entropy_interval = float(config.get("anti_entropy_interval", DEFAULT_ANTI_ENTROPY_INTERVAL))
+
+    def update_config(self):
+        """Recarga desde config.json los parámetros de replicación (límites y tiempos de espera)."""
+        self._apply_config(ConfigurationManager.load_config())
+
+    def shutdown(self, wait=True):
+        """
+        Detiene los pools de replicación, esperando opcionalmente a los envíos en curso.
+        Lo que quede sin enviar sigue en el diario y se reintentará en el próximo arranque.
+        """
+        self._stop_event.set()
+        self._retry_thread.join(timeout=RETRY_POLL_INTERVAL * 2)
+        self._file_pool.shutdown(wait=wait)
+        self._send_pool.shutdown(wait=wait)
+        self.connection_pool.close_all()
+
     def log_event(self, message):
         """Registra eventos en la bitácora."""
-        logging.info(message)
+        logger.info(message)
 
     def log_error(self, error):
         """Registra errores en la bitácora."""
-        logging.error(f"Error: {error}")
+        logger.error(f"Error: {error}")
 
     def start_monitor(self):
         """Inicia el monitoreo de la carpeta de sincronización."""
@@ -39,9 +204,11 @@ class SyncManager:
             return
 
         try:
-            self.monitor = FolderMonitor(self.sync_folder, self.log_new_file)
+            self.monitor = self.create_monitor()
             self.monitor_thread = threading.Thread(target=self._start_monitor, daemon=True)
             self.monitor_thread.start()
+            # Replicar lo que cambió mientras no se estaba vigilando
+            threading.Thread(target=self.reconcile, daemon=True).start()
             self.is_monitoring = True
             self.log_event("Se ha iniciado la sincronización.")
             print("Sincronización iniciada.")
@@ -49,6 +216,24 @@ class SyncManager:
             self.log_error(f"Error al iniciar el monitoreo: {e}")
             print("Error al iniciar la sincronización.")
 
+    def create_monitor(self, config=None):
+        """
+        Crea (sin iniciarlo) el monitor de la carpeta de sincronización conectado a este emisor.
+
+        :param config: Configuración ya cargada (por defecto se lee config.json).
+        :return: FolderMonitor listo para start().
+        """
+        if config is None:
+            config = ConfigurationManager.load_config()
+        return FolderMonitor(
+            self.sync_folder, self.sync_files, self.delete_path,
+            quiet_window=float(config.get("quiet_window", DEFAULT_QUIET_WINDOW)),
+            batch_size=int(config.get("event_batch_size", DEFAULT_BATCH_SIZE)),
+            ignore=is_temp_file,
+            on_moved_callback=self.move_path,
+            on_dir_created_callback=self.create_directory
+        )
+
     def _start_monitor(self):
         """Ejecuta el monitor en un hilo separado."""
         try:
@@ -68,52 +253,1010 @@ class SyncManager:
         """Registra el evento de un nuevo archivo copiado."""
         file_name = os.path.basename(file_path)
         file_extension = os.path.splitext(file_name)[1]
-        user = os.getlogin()
+        user = Logger.get_user()
         self.log_event(f"Se ha agregado el nuevo archivo '{file_name}' por el usuario '{user}'. Extensión: '{file_extension}'.")
 
-    def replicate_file(self, file_path, host, port):
+    def replicate_file(self, file_path, host, port, connect_timeout=None, send_timeout=None, checksum=None,
+                       delta=True):
+        """
+        Envía un archivo a un cliente usando una conexión persistente del pool.
+
+        :param file_path: Ruta completa del archivo a enviar.
+        :param host: Dirección IP o nombre del host del cliente.
+        :param port: Puerto del cliente.
+        :param connect_timeout: Segundos para conectar (por defecto el de la configuración).
+        :param send_timeout: Segundos máximos por operación de envío (por defecto el de la configuración).
+        :param checksum: SHA-256 del archivo, si ya se calculó (se toma del índice si no se indica).
+        :param delta: Intentar la transferencia diferencial (False tras un delta fallido).
+        :return: True si el cliente confirmó el archivo (o ya lo tenía), False en caso contrario.
+        """
+        if connect_timeout is None:
+            connect_timeout = self.connect_timeout
+        if send_timeout is None:
+            send_timeout = self.send_timeout
+        file_name = to_wire_path(self.sync_folder, file_path)
+        peer = f"{host}:{port}"
+        limiter = self._limiter(host, port)
+        transfer = None  # Identificador en EVENTS (panel de la GUI)
+        start = time.perf_counter()
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((host, port))
-                file_name = os.path.basename(file_path)
-                s.sendall(file_name.encode())  # Enviar el nombre del archivo
+            size = os.path.getsize(file_path)
+            meta = {"path": file_name, "size": size, "sha256": checksum or self.manifest.get_hash(file_path)}
+            with self.connection_pool.connection(host, port, connect_timeout, send_timeout) as s:
+                # Preguntar antes si el cliente ya tiene ese contenido para no reenviarlo.
+                # La respuesta indica también qué códecs de compresión acepta.
+                peer_encodings = ["zlib"]
+                offset = 0
+                reply, rtt = {}, None
+                if size >= self.query_min_size:
+                    sent_at = time.perf_counter()
+                    send_message(s, MSG_QUERY, meta)
+                    reply = self._expect_ack(s)
+                    rtt = time.perf_counter() - sent_at
+                    if reply.get("have"):
+                        FILES_SENT.inc(peer=peer, result="skipped")
+                        self.log_event(f"El cliente {host}:{port} ya tiene '{file_name}'; no se reenvía.")
+                        return True
+                    peer_encodings = reply.get("encodings", peer_encodings)
+                    # Si una transferencia anterior se cortó, continuar desde donde se quedó
+                    offset = int(reply.get("offset", 0))
+                    if not 0 < offset < size:
+                        offset = 0
+                # Si el cliente tiene una versión anterior, enviar solo las diferencias
+                if not offset and delta and self.delta_enabled and self.delta_min_size <= size <= self.delta_max_size:
+                    try:
+                        sent = self._send_delta(s, file_path, meta, limiter)
+                    except (OSError, ProtocolError) as e:
+                        raise DeltaError(str(e)) from e
+                    if sent is not None:
+                        self._record_transfer(peer, "delta", sent, start)
+                        EVENTS.note(f"Delta de '{file_name}' enviado a {peer} ({sent} bytes)")
+                        return True
+
+                encoding = choose_encoding(file_path, size, peer_encodings, self.compression, self.compression_min_size)
+                # Los archivos grandes sin comprimir pueden ir por varias conexiones a la vez
+                if not offset and encoding == IDENTITY and reply.get("stripes") and size >= self.stripe_min_size:
+                    ranges = plan_ranges(size, self.stripe_range_size)
+                    stripes = choose_stripes(self._client_setting(host, port, "stripes", self.stripes), len(ranges), rtt)
+                    if stripes > 1:
+                        stripe_id = self._begin_striped(s, meta)
+                        if stripe_id is None:
+                            # Otro envío le hizo llegar el mismo contenido después de la consulta
+                            FILES_SENT.inc(peer=peer, result="skipped")
+                            self.log_event(f"El cliente {host}:{port} ya tiene '{file_name}'; no se reenvía.")
+                            return True
+                        transfer = EVENTS.begin(SEND, peer, file_name, size)
+                        sent = self._send_striped(
+                            s, stripe_id, file_path, meta, ranges, stripes, host, port, connect_timeout, send_timeout,
+                            limiter, transfer
+                        )
+                        self._record_transfer(peer, "striped", sent, start)
+                        EVENTS.end(transfer, True)
+                        self.log_event(f"Archivo '{file_name}' replicado a {host}:{port} por {stripes} conexiones.")
+                        return True
+                if encoding != IDENTITY:
+                    meta = dict(meta, encoding=encoding)
+                if offset:
+                    meta = dict(meta, offset=offset)
+                send_message(s, MSG_FILE, meta)
+                transfer = EVENTS.begin(SEND, peer, file_name, size, offset)
                 with open(file_path, "rb") as f:
-                    while (chunk := f.read(1024)):
-                        s.sendall(chunk)
-            self.log_event(f"Archivo '{file_name}' replicado a {host}:{port}.")
+                    f.seek(offset)
+                    if encoding == IDENTITY:
+                        sent = self._send_payload(s, f, size - offset, limiter, transfer=transfer)
+                    else:
+                        sent = self._send_compressed(s, f, size - offset, encoding, limiter, transfer)
+                self._expect_ack(s)
+            self._record_transfer(peer, "ok", sent, start)
+            EVENTS.end(transfer, True)
+            detail = f" (comprimido con {encoding})" if encoding != IDENTITY else ""
+            if offset:
+                detail += f" (reanudado desde el byte {offset})"
+            self.log_event(f"Archivo '{file_name}' replicado a {host}:{port}{detail}.")
+            return True
+        except DeltaError as e:
+            # La conexión quedó a medias del intercambio (y el pool la descartó): enviar el
+            # archivo completo por otra, en lugar de repetir el delta en cada reintento
+            self.log_error(f"El delta de '{file_name}' para {host}:{port} falló ({e}); se envía completo.")
+            return self.replicate_file(file_path, host, port, connect_timeout, send_timeout, checksum, delta=False)
         except Exception as e:
-            self.log_error(f"Error replicando archivo '{file_path}': {e}")
-            
+            FILES_SENT.inc(peer=peer, result="error")
+            EVENTS.end(transfer, False, str(e))
+            self.log_error(f"Error replicando archivo '{file_path}' a {host}:{port}: {e}")
+            return False
+
+    @staticmethod
+    def _record_transfer(peer, result, sent, start):
+        """Anota en las métricas una transferencia terminada a un cliente."""
+        elapsed = time.perf_counter() - start
+        FILES_SENT.inc(peer=peer, result=result)
+        BYTES_SENT.inc(sent, peer=peer)
+        TRANSFER_SECONDS.observe(elapsed, peer=peer)
+        if elapsed > 0:
+            PEER_THROUGHPUT.set(sent / elapsed, peer=peer)
+
+    def _send_delta(self, sock, file_path, meta, limiter=None):
+        """
+        Intenta replicar el archivo como delta sobre la copia que ya tiene el cliente.
+
+        :return: Bytes del delta enviado si el cliente lo aplicó; None si hay que enviar el
+                 archivo completo (el cliente no tiene copia, su copia supera delta_max_size, el
+                 cambio es demasiado grande o el delta no se calculó en delta_time_budget).
+        """
+        send_message(sock, MSG_SIGNATURE_REQUEST, {"path": meta["path"], "max_size": self.delta_max_size})
+        reply = recv_message(sock)
+        if reply is None or reply[0] != MSG_SIGNATURES:
+            raise ProtocolError("Respuesta inesperada a la petición de firmas.")
+        info = reply[1]
+        signatures = recv_exact(sock, info["size"]) if info.get("size") else b""
+        if not info.get("exists"):
+            return None
+
+        max_literal = int(meta["size"] * self.delta_max_ratio)
+        with tempfile.TemporaryFile() as delta:
+            deadline = time.monotonic() + self.delta_time_budget
+            if compute_delta(file_path, signatures, info["block_size"], delta, max_literal, deadline) is None:
+                return None
+            delta_size = delta.tell()
+            delta.seek(0)
+            send_message(sock, MSG_DELTA, {
+                "path": meta["path"], "size": delta_size, "file_size": meta["size"],
+                "sha256": meta["sha256"], "block_size": info["block_size"]
+            })
+            self._send_payload(sock, delta, delta_size, limiter)
+        self._expect_ack(sock)
+        self.log_event(f"Delta de '{meta['path']}' aplicado: {delta_size} bytes enviados en lugar de {meta['size']}.")
+        return delta_size
+
+    def _send_payload(self, sock, f, size, limiter=None, digest=None, transfer=None):
+        """
+        Envía exactamente size bytes del archivo abierto, a partir de su posición actual.
+        Usa sendfile cuando el sistema lo permite y, si no, lee en un búfer reutilizado.
+
+        :param limiter: TokenBucket del cliente, si tiene límite de velocidad.
+        :param digest: Hash que se actualiza con lo enviado (obliga a leer en el búfer, sin sendfile).
+        :param transfer: Identificador de la transferencia en EVENTS, para informar del avance.
+        :return: Bytes enviados.
+        :raises ProtocolError: Si el archivo se acorta durante el envío.
+        """
+        if self.use_sendfile and digest is None:
+            # Con límite de velocidad, el kernel envía el archivo en trozos pequeños; si hay que
+            # informar del avance, en trozos del tamaño del búfer
+            step = size
+            if limiter:
+                step = LIMITED_CHUNK_SIZE
+            elif transfer:
+                step = self.buffer_size
+            remaining = size
+            while remaining:
+                count = min(step, remaining)
+                if limiter:
+                    limiter.consume(count)
+                sent = sock.sendfile(f, f.tell(), count)
+                if sent != count:
+                    raise ProtocolError(
+                        f"El archivo cambió de tamaño durante el envío (faltan {remaining - sent} bytes)."
+                    )
+                remaining -= sent
+                EVENTS.progress(transfer, sent)
+            return size
+
+        step = min(LIMITED_CHUNK_SIZE if limiter else self.buffer_size, size) or 1
+        buffer = bytearray(step)
+        view = memoryview(buffer)
+        remaining = size
+        while remaining:
+            n = f.readinto(view[:min(len(buffer), remaining)])
+            if not n:
+                raise ProtocolError(f"El archivo cambió de tamaño durante el envío (faltan {remaining} bytes).")
+            if digest is not None:
+                digest.update(view[:n])
+            if limiter:
+                limiter.consume(n)
+            sock.sendall(view[:n])
+            remaining -= n
+            EVENTS.progress(transfer, n)
+        return size
+
+    def _begin_striped(self, sock, meta):
+        """
+        Abre una transferencia por franjas en el receptor.
+
+        :return: Identificador de la transferencia en el receptor, o None si ya tenía el contenido.
+        """
+        send_message(sock, MSG_STRIPE_BEGIN, dict(meta, range_size=self.stripe_range_size))
+        reply = self._expect_ack(sock)
+        if reply.get("have"):
+            return None
+        return reply["transfer"]
+
+    def _send_striped(self, sock, stripe_id, file_path, meta, ranges, stripes, host, port, connect_timeout,
+                      send_timeout, limiter=None, transfer=None):
+        """
+        Envía un archivo por rangos a través de varias conexiones a la vez (ver striping.py).
+        sock, la conexión de la consulta, es una de ellas; las demás se toman del pool.
+
+        Cada conexión toma el siguiente rango libre y envía sus rangos seguidos, sin esperar
+        una ida y vuelta por rango; las confirmaciones (con el hash que calculó el receptor)
+        se leen al final y se comparan con el hash calculado al leer el archivo.
+
+        :param stripe_id: Identificador de la transferencia en el receptor (ver _begin_striped).
+        :param transfer: Identificador de la transferencia en EVENTS, para informar del avance.
+        :return: Bytes enviados.
+        :raises ProtocolError: Si un rango no coincide o el archivo cambió durante el envío.
+        """
+        digests = [None] * len(ranges)
+        pending = iter(enumerate(ranges))
+        lock = threading.Lock()
+        failed = threading.Event()
+
+        def next_range():
+            with lock:
+                return None if failed.is_set() else next(pending, None)
+
+        def send_ranges(conn):
+            sent = []
+            try:
+                with open(file_path, "rb") as f:
+                    while (item := next_range()) is not None:
+                        index, (offset, size) = item
+                        send_message(conn, MSG_RANGE, {
+                            "transfer": stripe_id, "index": index, "offset": offset, "size": size
+                        })
+                        f.seek(offset)
+                        digest = hashlib.sha256()
+                        self._send_payload(conn, f, size, limiter, digest, transfer)
+                        digests[index] = digest.hexdigest()
+                        sent.append(index)
+                for index in sent:
+                    if self._expect_ack(conn).get("sha256") != digests[index]:
+                        raise ProtocolError(f"El hash del rango {index} no coincide.")
+            except BaseException:
+                failed.set()
+                raise
+
+        def send_ranges_pooled():
+            with self.connection_pool.connection(host, port, connect_timeout, send_timeout) as conn:
+                send_ranges(conn)
+
+        error = None
+        with ThreadPoolExecutor(max_workers=stripes - 1, thread_name_prefix="stripe") as pool:
+            futures = [pool.submit(send_ranges_pooled) for _ in range(stripes - 1)]
+            try:
+                send_ranges(sock)
+            except Exception as e:
+                error = e
+        for future in futures:
+            error = error or future.exception()
+        if error is None and self.manifest.get_hash(file_path) != meta["sha256"]:
+            error = ProtocolError("El archivo cambió durante el envío.")
+
+        # El cierre va por una conexión del pool: sock puede haber quedado inactiva mientras terminaban las demás
+        if error is not None:
+            try:
+                with self.connection_pool.connection(host, port, connect_timeout, send_timeout) as conn:
+                    send_message(conn, MSG_STRIPE_END, {"transfer": stripe_id, "abort": True})
+                    self._expect_ack(conn)
+            except (OSError, ProtocolError):
+                pass  # El receptor abandonará la transferencia por inactividad
+            raise error
+        with self.connection_pool.connection(host, port, connect_timeout, send_timeout) as conn:
+            send_message(conn, MSG_STRIPE_END, {"transfer": stripe_id, "ranges": digests})
+            self._expect_ack(conn)
+        return meta["size"]
+
+    def _send_compressed(self, sock, f, size, encoding, limiter=None, transfer=None):
+        """
+        Envía size bytes del archivo comprimidos en flujo, en trozos con prefijo de longitud
+        y terminados por un trozo vacío. El avance (transfer) se cuenta en bytes sin comprimir.
+
+        :return: Bytes enviados por la red (comprimidos y con las cabeceras de los trozos).
+        :raises ProtocolError: Si el archivo se acorta durante el envío.
+        """
+        encoder = compressor(encoding, self.compression_level)
+        remaining = size
+        sent = CHUNK_HEADER.size  # Trozo final vacío
+        while remaining:
+            chunk = f.read(min(self.buffer_size, remaining))
+            if not chunk:
+                raise ProtocolError(f"El archivo cambió de tamaño durante el envío (faltan {remaining} bytes).")
+            remaining -= len(chunk)
+            out = encoder.compress(chunk)
+            if out:
+                sent += self._send_chunk(sock, out, limiter)
+            EVENTS.progress(transfer, len(chunk))
+        out = encoder.flush()
+        if out:
+            sent += self._send_chunk(sock, out, limiter)
+        sock.sendall(CHUNK_HEADER.pack(0))
+        return sent
+
+    @staticmethod
+    def _send_chunk(sock, data, limiter=None):
+        """
+        Envía datos comprimidos en trozos de como mucho MAX_CHUNK_SIZE bytes, cada uno con su
+        prefijo de longitud, y devuelve los bytes enviados.
+        """
+        sent = 0
+        for start in range(0, len(data), MAX_CHUNK_SIZE):
+            piece = data[start:start + MAX_CHUNK_SIZE]
+            if limiter:
+                limiter.consume(CHUNK_HEADER.size + len(piece))
+            sock.sendall(CHUNK_HEADER.pack(len(piece)) + piece)
+            sent += CHUNK_HEADER.size + len(piece)
+        return sent
+
+    @staticmethod
+    def _client_setting(host, port, key, default):
+        """Devuelve un parámetro propio del cliente en config.json o, si no lo tiene, el general."""
+        for client in ConfigurationManager.get_clients():
+            if client.get("host") == host and client.get("port") == port:
+                return client.get(key, default)
+        return default
+
+    def _limiter(self, host, port):
+        """
+        Devuelve el TokenBucket del cliente, o None si no tiene límite de velocidad.
+        El límite es el "rate_limit" del cliente en config.json o, si no tiene, el general.
+        """
+        peer = f"{host}:{port}"
+        rate = self._client_setting(host, port, "rate_limit", self.rate_limit)
+        with self._limiters_lock:
+            if not rate:
+                self._limiters.pop(peer, None)
+                return None
+            limiter = self._limiters.get(peer)
+            if limiter is None:
+                limiter = self._limiters[peer] = TokenBucket(rate)
+            elif limiter.rate != rate:
+                limiter.set_rate(rate)
+            return limiter
+
+    def _expect_ack(self, sock):
+        """Espera la confirmación del receptor y lanza ProtocolError si informa de un fallo."""
+        reply = recv_message(sock)
+        if reply is None:
+            raise ConnectionError("El receptor cerró la conexión sin confirmar.")
+        msg_type, meta = reply
+        if msg_type != MSG_ACK:
+            raise ProtocolError(f"Respuesta inesperada del receptor (tipo {msg_type}).")
+        if not meta.get("ok"):
+            raise ProtocolError(meta.get("error", "El receptor rechazó el archivo."))
+        return meta
+
     def sync_new_file(self, file_path):
         """
         Método llamado cuando se detecta un nuevo archivo en la carpeta de sincronización.
-        Se encarga de replicar el archivo a otros equipos.
+        Se encarga de replicar el archivo a otros equipos en segundo plano, sin bloquear al monitor.
 
         :param file_path: Ruta completa del archivo nuevo detectado.
+        :return: Future cuyo resultado es un diccionario {"host:puerto": True/False}.
+        """
+        return self.sync_files([file_path], [time.monotonic()])[0]
+
+    def sync_files(self, file_paths, detected_at=None):
+        """
+        Método llamado por el monitor con un lote de archivos nuevos o modificados que ya
+        terminaron de escribirse. La configuración se carga una sola vez para todo el lote,
+        y los archivos pequeños se agrupan en paquetes que se envían en una sola trama.
+
+        Cada envío se anota antes en el diario (OutboundQueue), de modo que si un cliente
+        no responde, o el programa se cierra, se reintenta más tarde. Los archivos pequeños
+        y los recién modificados pasan por delante de la reconciliación y los reintentos.
+
+        :param file_paths: Lista de rutas completas.
+        :param detected_at: Lista paralela con el instante (time.monotonic) del primer evento
+                            de cada archivo, para medir el tiempo hasta su replicación.
+        :return: Lista de Futures, uno por archivo o por paquete, cuyo resultado es un
+                 diccionario {"host:puerto": True/False} (True si el cliente recibió todo).
+        """
+        clients = ConfigurationManager.get_clients()
+        detected_at = detected_at or [None] * len(file_paths)
+        self.log_event(f"Lote de {len(file_paths)} archivo(s) listo para replicar.")
+        peers = self._peers(clients)
+        self.outbound.enqueue_many((peer, path) for path in file_paths for peer in peers)
+        if self.pack_enabled and len(file_paths) > 1:
+            packs, singles = plan_packs(
+                file_paths, detected_at, self.pack_max_file_size, self.pack_max_files, self.pack_max_bytes
+            )
+        else:
+            packs, singles = [], list(zip(file_paths, detected_at))
+
+        futures = []
+        for items in packs:
+            if len(items) == 1:
+                singles.append(items[0])  # Un paquete de un solo archivo no ahorra nada
+                continue
+            recent = any(detected is not None for _, detected in items)
+            PENDING_FILES.inc(len(items))
+            future = self._submit(PRIORITY_SMALL if recent else PRIORITY_BULK, self._sync_pack, items, clients)
+            future.add_done_callback(lambda _, n=len(items): PENDING_FILES.dec(n))
+            futures.append(future)
+        for file_path, detected in singles:
+            PENDING_FILES.inc()
+            future = self._submit(self._priority(file_path, detected), self._sync_file, file_path, clients, detected)
+            future.add_done_callback(lambda _: PENDING_FILES.dec())
+            futures.append(future)
+        return futures
+
+    def _priority(self, file_path, detected_at):
+        """Prioridad de un archivo suelto: antes los pequeños y los recién modificados."""
+        if detected_at is None:
+            return PRIORITY_BULK
+        try:
+            small = os.path.getsize(file_path) <= self.pack_max_file_size
+        except OSError:
+            small = True  # Fallará enseguida; no hace falta que espere
+        return PRIORITY_SMALL if small else PRIORITY_RECENT
+
+    def _submit(self, priority, function, *args):
+        """
+        Encola una tarea en el pool de archivos según su prioridad. El pool recibe tareas
+        idénticas (_run_next) y cada una ejecuta la más prioritaria pendiente en ese
+        momento, no la más antigua.
+
+        :return: Future con el resultado de function(*args).
+        """
+        future = Future()
+        with self._tasks_lock:
+            heapq.heappush(self._tasks, (priority, next(self._task_order), future, function, args))
+        self._file_pool.submit(self._run_next)
+        return future
+
+    def _run_next(self):
+        with self._tasks_lock:
+            _, _, future, function, args = heapq.heappop(self._tasks)
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    @staticmethod
+    def _peers(clients):
+        """Devuelve "host:puerto" de cada cliente válido."""
+        return [f"{client.get('host')}:{client.get('port')}" for client in clients
+                if client.get("host") and client.get("port")]
+
+    def _settle(self, file_paths, clients, results):
+        """Actualiza el diario: borra los envíos confirmados y reprograma los fallidos."""
+        done, failed = [], []
+        for peer in self._peers(clients):
+            (done if results.get(peer) else failed).extend((peer, path) for path in file_paths)
+        try:
+            self.outbound.complete_many(done)
+            self.outbound.fail_many(failed, "envío fallido")
+        except Exception as e:
+            self.log_error(f"Error al actualizar el diario de envíos: {e}")
+
+    def _retry_loop(self):
+        """
+        Reprograma periódicamente los envíos del diario cuyo momento de reintento llegó y,
+        cada anti_entropy_interval segundos, la comparación con los clientes.
         """
+        while not self._stop_event.wait(RETRY_POLL_INTERVAL):
+            try:
+                self._schedule_retries()
+            except Exception as e:
+                self.log_error(f"Error al programar los reintentos: {e}")
+            if self.anti_entropy_interval > 0 and time.monotonic() >= self._next_anti_entropy:
+                self._next_anti_entropy = time.monotonic() + self.anti_entropy_interval
+                self._submit(PRIORITY_BULK, self.anti_entropy)
+
+    def _schedule_retries(self):
+        clients = {f"{client.get('host')}:{client.get('port')}": client
+                   for client in ConfigurationManager.get_clients() if client.get("host") and client.get("port")}
+        pending = self.outbound.pending_by_peer()
+        for peer in clients:
+            OUTBOUND_PENDING.set(pending.get(peer, 0), peer=peer)
+
+        for peer, file_path, _ in self.outbound.claim_due(clients, self.batch_size):
+            if not os.path.isfile(file_path):
+                self.outbound.complete_many([(peer, file_path)])  # Ya no existe: no hay nada que enviar
+                continue
+            RETRIES.inc(peer=peer)
+            PENDING_FILES.inc()
+            future = self._submit(PRIORITY_BULK, self._retry, file_path, clients[peer])
+            future.add_done_callback(lambda _: PENDING_FILES.dec())
+
+        for peer in self.outbound.peers_with_due_operations(clients):
+            self._schedule_flush(clients[peer])
+
+    def _retry(self, file_path, client):
+        """Reintenta el envío de un archivo a un cliente y anota el resultado en el diario."""
+        peer = f"{client['host']}:{client['port']}"
+        ok = self.replicate_file(
+            file_path, client["host"], client["port"], client.get("connect_timeout"), client.get("send_timeout")
+        )
+        self._settle([file_path], [client], {peer: ok})
+        return {peer: ok}
+
+    def _sync_file(self, file_path, clients=None, detected_at=None):
+        """Replica un archivo a todos los clientes configurados y devuelve el resultado por cliente."""
+        results = {}
         try:
             # Registrar en la bitácora
             self.log_new_file(file_path)
 
             # Cargar los clientes de la configuración
-            config = ConfigurationManager.load_config()
-            clients = config.get("clients", [])
+            if clients is None:
+                clients = ConfigurationManager.get_clients()
 
             # Verificar si hay clientes configurados
             if not clients:
                 self.log_event("No hay clientes configurados para replicar los archivos.")
-                return
+                return {}
 
-            # Replicar el archivo a cada cliente
-            for client in clients:
-                host = client.get("host")
-                port = client.get("port")
-                if host and port:
-                    self.replicate_file(file_path, host, port)
-                else:
-                    self.log_error(f"Cliente inválido en la configuración: {client}")
+            results = self.replicate_to_clients(file_path, clients)
+            if detected_at is not None:
+                EVENT_TO_REPLICATED.observe(time.monotonic() - detected_at)
+            return results
         except Exception as e:
             self.log_error(f"Error al sincronizar el archivo '{file_path}': {e}")
+            return {}
+        finally:
+            self._settle([file_path], clients or (), results)
+
+    def _sync_pack(self, items, clients):
+        """
+        Replica un paquete de archivos pequeños a todos los clientes configurados.
+
+        :param items: Lista de (ruta completa, instante del primer evento o None).
+        :return: Diccionario {"host:puerto": True/False} (True si el cliente recibió todos los archivos).
+        """
+        results = {}
+        try:
+            if not clients:
+                self.log_event("No hay clientes configurados para replicar los archivos.")
+                return {}
+
+            entries, payload, stats, errors = load_pack(
+                [path for path, _ in items], lambda path: to_wire_path(self.sync_folder, path)
+            )
+            for path, error in errors.items():
+                self.log_error(f"No se pudo leer '{path}' para el paquete: {error}")
+            if stats:
+                self.manifest.record_many(
+                    (self.manifest.relative_path(path), st, digest) for path, st, digest in stats
+                )
+            if not entries:
+                return {}
+            self.log_event(
+                f"Paquete de {len(entries)} archivo(s) ({len(payload)} bytes) listo para replicar, "
+                f"agregados por el usuario '{Logger.get_user()}'."
+            )
+
+            results = self._fan_out(clients, self.replicate_pack, entries, payload)
+            now = time.monotonic()
+            for _, detected in items:
+                if detected is not None:
+                    EVENT_TO_REPLICATED.observe(now - detected)
+            return results
+        except Exception as e:
+            self.log_error(f"Error al sincronizar un paquete de {len(items)} archivo(s): {e}")
+            return {}
+        finally:
+            # Si un cliente no recibió todo el paquete, sus archivos se reintentan de uno en uno
+            self._settle([path for path, _ in items], clients, results)
+
+    def replicate_pack(self, entries, payload, host, port, connect_timeout=None, send_timeout=None):
+        """
+        Envía un paquete de archivos pequeños a un cliente en una sola trama.
+
+        :param entries: Cabeceras de las entradas ({"path", "size", "sha256"}), en el orden del contenido.
+        :param payload: Contenido de todos los archivos, concatenado.
+        :return: True si el cliente guardó todos los archivos del paquete.
+        """
+        if connect_timeout is None:
+            connect_timeout = self.connect_timeout
+        if send_timeout is None:
+            send_timeout = self.send_timeout
+        peer = f"{host}:{port}"
+        limiter = self._limiter(host, port)
+        start = time.perf_counter()
+        try:
+            with self.connection_pool.connection(host, port, connect_timeout, send_timeout) as s:
+                send_message(s, MSG_PACK, {"entries": entries, "size": len(payload)})
+                if limiter:
+                    view = memoryview(payload)
+                    for offset in range(0, len(view), LIMITED_CHUNK_SIZE):
+                        chunk = view[offset:offset + LIMITED_CHUNK_SIZE]
+                        limiter.consume(len(chunk))
+                        s.sendall(chunk)
+                else:
+                    s.sendall(payload)
+                reply = self._expect_ack(s)
+        except Exception as e:
+            FILES_SENT.inc(len(entries), peer=peer, result="error")
+            EVENTS.note(f"Error enviando un paquete de {len(entries)} archivo(s) a {peer}: {e}", False)
+            self.log_error(f"Error replicando un paquete de {len(entries)} archivo(s) a {host}:{port}: {e}")
+            return False
+
+        failed = reply.get("failed", {})
+        for path, error in failed.items():
+            self.log_error(f"El cliente {host}:{port} rechazó '{path}' del paquete: {error}")
+        EVENTS.note(
+            f"Paquete de {len(entries)} archivo(s) enviado a {peer} ({len(failed)} rechazado(s))", not failed
+        )
+        elapsed = time.perf_counter() - start
+        FILES_SENT.inc(len(entries) - len(failed), peer=peer, result="ok")
+        if failed:
+            FILES_SENT.inc(len(failed), peer=peer, result="error")
+        BYTES_SENT.inc(len(payload), peer=peer)
+        if elapsed > 0:
+            PEER_THROUGHPUT.set(len(payload) / elapsed, peer=peer)
+        self.log_event(
+            f"Paquete de {len(entries)} archivo(s) replicado a {host}:{port} en {elapsed:.2f} s"
+            f" ({len(failed)} rechazado(s))."
+        )
+        return not failed
+
+    def reconcile(self):
+        """
+        Pasada de reconciliación: compara la carpeta con el último estado conocido y replica
+        solo lo que cambió mientras no se estaba vigilando (por ejemplo, con el programa cerrado).
+
+        :return: ScanResult con las diferencias encontradas, o None si la pasada falló.
+        """
+        if not self.sync_folder:
+            return None
+        try:
+            result = ReconciliationScanner(self.sync_folder, self.manifest, self.scan_workers).scan()
+        except Exception as e:
+            self.log_error(f"Error en la reconciliación de '{self.sync_folder}': {e}")
+            return None
+
+        self.log_event(
+            f"Reconciliación completada en {result.elapsed:.2f} s: {result.scanned} archivos revisados, "
+            f"{result.hashed} leídos con {result.workers} proceso(s), {len(result.changed)} por replicar, "
+            f"{len(result.renamed)} renombrados, {len(result.removed)} eliminados."
+        )
+        # Lo renombrado y lo eliminado se replica como operaciones de metadatos, sin contenido
+        exists = functools.lru_cache(maxsize=None)(lambda relative: os.path.lexists(self.manifest.local_path(relative)))
+        operations = collapse_renames(result.renamed, result.known_paths, exists)
+        operations += collapse_deletes(result.removed, result.removed_hashes, exists)
+        self.queue_operations(operations)
+        for start in range(0, len(result.changed), self.batch_size):
+            self.sync_files(result.changed[start:start + self.batch_size])
+        return result
+
+    def forget_file(self, file_path):
+        """
+        Quita del índice de contenido y del diario de envíos un archivo o carpeta eliminado.
+
+        :param file_path: Ruta completa del archivo o carpeta eliminado.
+        """
+        try:
+            self.manifest.remove(file_path)
+            self.outbound.remove_path(file_path)
+        except Exception as e:
+            self.log_error(f"Error al actualizar el índice para '{file_path}': {e}")
+
+    def delete_path(self, file_path):
+        """
+        Método llamado cuando se elimina un archivo o carpeta de la carpeta de sincronización.
+        Lo olvida localmente y pide a los clientes que también lo eliminen. El hash que se
+        conocía del archivo viaja con la operación, para que un cliente no elimine una copia
+        que cambió por su cuenta.
+
+        :param file_path: Ruta completa del archivo o carpeta eliminado.
+        """
+        relative = self.manifest.relative_path(file_path)
+        entry = self.manifest.lookup(relative)
+        self.forget_file(file_path)
+        self.log_event(f"Se ha eliminado '{relative}'.")
+        self.queue_operations([delete_op(relative, entry[3] if entry else None)])
+
+    def move_path(self, src_path, dest_path):
+        """
+        Método llamado cuando se renombra o mueve un archivo o carpeta dentro de la carpeta de
+        sincronización. Traslada sus entradas del índice y del diario, y los clientes reciben una
+        sola operación de renombrado en lugar del contenido (aunque sea una carpeta entera).
+
+        :param src_path: Ruta completa anterior.
+        :param dest_path: Ruta completa nueva.
+        """
+        src, dest = self.manifest.relative_path(src_path), self.manifest.relative_path(dest_path)
+        try:
+            entry = self.manifest.lookup(src)
+            self.manifest.rename(src_path, dest_path)
+            self.outbound.move_path(src_path, dest_path)
+        except Exception as e:
+            self.log_error(f"Error al actualizar el índice al renombrar '{src}' a '{dest}': {e}")
+            return
+        self.log_event(f"Se ha renombrado '{src}' a '{dest}'.")
+        self.queue_operations([rename_op(src, dest, entry[3] if entry else None)])
+
+    def create_directory(self, dir_path):
+        """Método llamado cuando se crea una carpeta: los clientes la crean también (aunque quede vacía)."""
+        self.queue_operations([mkdir_op(self.manifest.relative_path(dir_path))])
+
+    def queue_operations(self, operations):
+        """
+        Anota operaciones de metadatos para todos los clientes y programa su envío.
+        Quedan en el diario hasta que cada cliente las confirma, y se envían en orden.
+
+        :param operations: Lista de operaciones (ver metadata.py).
+        """
+        if not operations:
+            return
+        clients = [client for client in ConfigurationManager.get_clients() if client.get("host") and client.get("port")]
+        try:
+            self.outbound.enqueue_operations(
+                (peer, op) for peer in self._peers(clients) for op in operations
+            )
+        except Exception as e:
+            self.log_error(f"Error al anotar {len(operations)} operación(es) de metadatos: {e}")
+            return
+        for client in clients:
+            self._schedule_flush(client)
+
+    def _schedule_flush(self, client):
+        """Programa el envío de las operaciones pendientes de un cliente, si no hay ya uno programado."""
+        peer = f"{client['host']}:{client['port']}"
+        with self._operations_lock:
+            if peer in self._flush_scheduled:
+                return
+            self._flush_scheduled.add(peer)
+        self._submit(PRIORITY_SMALL, self._flush_operations, client)
+
+    def _flush_operations(self, client):
+        """
+        Envía a un cliente sus operaciones pendientes, en orden y en tramas de hasta
+        OPS_PER_MESSAGE operaciones. Un cerrojo por cliente evita que dos envíos se adelanten.
+
+        :return: True si el cliente recibió todas las operaciones pendientes.
+        """
+        peer = f"{client['host']}:{client['port']}"
+        with self._operations_lock:
+            self._flush_scheduled.discard(peer)
+            lock = self._operation_locks.setdefault(peer, threading.Lock())
+        with lock:
+            while True:
+                rows = self.outbound.pending_operations(peer, OPS_PER_MESSAGE)
+                if not rows:
+                    return True
+                failed = self.replicate_operations(
+                    [op for _, op in rows], client["host"], client["port"],
+                    client.get("connect_timeout"), client.get("send_timeout")
+                )
+                if failed is None:
+                    self.outbound.fail_operations(peer, "envío fallido")
+                    return False
+                self.outbound.complete_operations(seq for seq, _ in rows)
+                for index in failed:
+                    self._operation_failed(rows[int(index)][1], peer)
+
+    def _operation_failed(self, op, peer):
+        """
+        Si un cliente no pudo renombrar algo (no lo tenía o su copia es distinta), se le
+        envía el contenido del destino en su lugar, a través del diario de envíos.
+        """
+        if op.get("op") != RENAME:
+            return
+        try:
+            dest_path = self.manifest.local_path(op["dest"])
+        except (KeyError, ProtocolError):
+            return
+        if os.path.isdir(dest_path):
+            files = [os.path.join(directory, name) for directory, _, names in os.walk(dest_path)
+                     for name in names if not is_temp_file(name)]
+        else:
+            files = [dest_path] if os.path.isfile(dest_path) else []
+        self.outbound.schedule_many((peer, path) for path in files)
+        self.log_event(f"Se enviará a {peer} el contenido de '{op['dest']}' ({len(files)} archivo(s)).")
+
+    def replicate_operations(self, operations, host, port, connect_timeout=None, send_timeout=None):
+        """
+        Envía a un cliente un lote de operaciones de metadatos en una sola trama.
+
+        :param operations: Lista de operaciones (ver metadata.py), en el orden en que deben aplicarse.
+        :return: Diccionario {"índice": error} con las operaciones que el cliente no aplicó,
+                 o None si no se pudo enviar el lote.
+        """
+        if connect_timeout is None:
+            connect_timeout = self.connect_timeout
+        if send_timeout is None:
+            send_timeout = self.send_timeout
+        peer = f"{host}:{port}"
+        try:
+            with self.connection_pool.connection(host, port, connect_timeout, send_timeout) as s:
+                send_message(s, MSG_METADATA, {"ops": operations})
+                reply = self._expect_ack(s)
+        except Exception as e:
+            EVENTS.note(f"Error enviando {len(operations)} operación(es) de metadatos a {peer}: {e}", False)
+            self.log_error(f"Error enviando {len(operations)} operación(es) de metadatos a {host}:{port}: {e}")
+            return None
+
+        failed = reply.get("failed", {})
+        for index, error in failed.items():
+            self.log_error(f"El cliente {host}:{port} no aplicó {operations[int(index)]}: {error}")
+        OPERATIONS_SENT.inc(len(operations) - len(failed), peer=peer, result="ok")
+        if failed:
+            OPERATIONS_SENT.inc(len(failed), peer=peer, result="error")
+        EVENTS.note(
+            f"{len(operations)} operación(es) de metadatos enviada(s) a {peer} ({len(failed)} fallida(s))", not failed
+        )
+        self.log_event(
+            f"{len(operations)} operación(es) de metadatos replicada(s) a {host}:{port} ({len(failed)} fallida(s))."
+        )
+        return failed
+
+    def anti_entropy(self, clients=None):
+        """
+        Compara el contenido local con el de cada cliente mediante los árboles de hashes y
+        anota en el diario de envíos los archivos que les faltan o que tienen distintos; el
+        hilo de reintentos se encarga de enviarlos. Lo que solo tiene el cliente no se toca.
+
+        :param clients: Lista de clientes (por defecto, los de la configuración).
+        :return: Diccionario {"host:puerto": archivos a reenviar, o None si no se pudo comparar}.
+        """
+        if clients is None:
+            clients = ConfigurationManager.get_clients()
+        return self._fan_out(clients, self.compare_with_peer)
+
+    def compare_with_peer(self, host, port, connect_timeout=None, send_timeout=None):
+        """
+        Compara el árbol de hashes local con el de un cliente (ver merkle.py) y programa el
+        reenvío de los archivos que difieren.
+
+        :return: Número de archivos que había que reenviar, o None si no se pudo comparar.
+        """
+        if connect_timeout is None:
+            connect_timeout = self.connect_timeout
+        if send_timeout is None:
+            send_timeout = self.send_timeout
+        peer = f"{host}:{port}"
+        start = time.perf_counter()
+        exchanged = 0  # Bytes de metadatos recibidos, para la bitácora
+
+        try:
+            with self.connection_pool.connection(host, port, connect_timeout, send_timeout) as s:
+                def query(dirs, entries):
+                    nonlocal exchanged
+                    send_message(s, MSG_TREE, {"dirs": dirs, "entries": entries})
+                    reply = self._expect_ack(s)
+                    exchanged += len(json.dumps(reply, separators=(",", ":")))
+                    return reply.get("dirs", [])
+
+                missing, extra, queries = compare_trees(self.merkle, query)
+        except Exception as e:
+            self.log_error(f"Error comparando el contenido con {host}:{port}: {e}")
+            return None
+
+        DIVERGENT_FILES.set(len(missing), peer=peer)
+        elapsed = time.perf_counter() - start
+        if not missing and not extra:
+            self.log_event(f"El cliente {host}:{port} está al día ({queries} consulta(s), {elapsed:.2f} s).")
+            return 0
+        self.outbound.schedule_many((peer, self.manifest.local_path(path)) for path in missing)
+        EVENTS.note(f"Antientropía con {peer}: {len(missing)} archivo(s) por reenviar", not missing)
+        self.log_event(
+            f"El cliente {host}:{port} difiere en {len(missing)} archivo(s) que se reenviarán"
+            f" ({extra} entrada(s) solo en el cliente; {queries} consulta(s), {exchanged} bytes, {elapsed:.2f} s)."
+        )
+        return len(missing)
+
+    def replicate_to_clients(self, file_path, clients):
+        """
+        Replica un archivo a varios clientes en paralelo.
+
+        Como máximo se hacen max_sends_per_file envíos simultáneos de este archivo, y el pool
+        compartido limita los envíos simultáneos de todos los archivos. Un cliente caído
+        cuesta como mucho un tiempo de espera de conexión y no retrasa al resto.
+
+        Con el relevo activado ("relay": "chain" o "tree") y archivos de al menos
+        relay_min_size bytes, solo se envía a los primeros nodos del árbol y cada cliente
+        lo reenvía a los siguientes mientras lo recibe (ver relay.py).
+
+        :param file_path: Ruta completa del archivo a replicar.
+        :param clients: Lista de clientes ({"host": ..., "port": ...}).
+        :return: Diccionario {"host:puerto": True/False} con el resultado de cada cliente.
+        """
+        start = time.perf_counter()
+        checksum = self.manifest.get_hash(file_path)  # Una sola vez para todos los clientes, y solo si cambió
+        fanout = relay_fanout(self.relay, self.relay_fanout)
+        valid = [client for client in clients if client.get("host") and client.get("port")]
+        if fanout and len(valid) > 1 and os.path.getsize(file_path) >= self.relay_min_size:
+            results = {}
+            nodes = plan_relay(valid, fanout)
+            futures = [self._send_pool.submit(self.replicate_relayed, file_path, node, checksum) for node in nodes]
+            for future in wait(futures).done:
+                results.update(future.result())
+        else:
+            results = self._fan_out(clients, self.replicate_file, file_path, checksum=checksum)
+
+        ok = sum(1 for success in results.values() if success)
+        elapsed = time.perf_counter() - start
+        self.log_event(f"Archivo '{os.path.basename(file_path)}' replicado a {ok}/{len(results)} clientes en {elapsed:.2f} s.")
+        return results
+
+    def replicate_relayed(self, file_path, node, checksum=None):
+        """
+        Envía un archivo al primer nodo de una rama del árbol de relevo, que lo reenvía
+        a su subárbol mientras lo recibe. No se usan consulta previa, delta ni varias
+        conexiones: cada receptor reenvía tal cual lo que le llega.
+
+        :param file_path: Ruta completa del archivo a enviar.
+        :param node: Nodo del árbol ({"host", "port", "relay"}) calculado con plan_relay.
+        :param checksum: SHA-256 del archivo, si ya se calculó.
+        :return: Diccionario {"host:puerto": True/False} del nodo y de todo su subárbol.
+        """
+        host, port = node["host"], node["port"]
+        peer = f"{host}:{port}"
+        results = dict.fromkeys(subtree_peers(node), False)
+        connect_timeout = self._client_setting(host, port, "connect_timeout", None) or self.connect_timeout
+        send_timeout = self._client_setting(host, port, "send_timeout", None) or self.send_timeout
+        file_name = to_wire_path(self.sync_folder, file_path)
+        limiter = self._limiter(host, port)
+        transfer = None
+        start = time.perf_counter()
+        try:
+            size = os.path.getsize(file_path)
+            meta = {"path": file_name, "size": size, "sha256": checksum or self.manifest.get_hash(file_path),
+                    "relay": node["relay"]}
+            # zlib está en todos los clientes, así que vale para todo el árbol sin preguntar
+            encoding = choose_encoding(file_path, size, ["zlib"], self.compression, self.compression_min_size)
+            if encoding != IDENTITY:
+                meta["encoding"] = encoding
+            with self.connection_pool.connection(host, port, connect_timeout, send_timeout) as s:
+                send_message(s, MSG_FILE, meta)
+                transfer = EVENTS.begin(SEND, peer, file_name, size)
+                with open(file_path, "rb") as f:
+                    if encoding == IDENTITY:
+                        sent = self._send_payload(s, f, size, limiter, transfer=transfer)
+                    else:
+                        sent = self._send_compressed(s, f, size, encoding, limiter, transfer)
+                # El nodo confirma cuando ha guardado el archivo y su subárbol ha respondido
+                reply = self._expect_ack(s)
+            results[peer] = True
+            for relayed, ok in reply.get("relayed", {}).items():
+                if relayed in results:
+                    results[relayed] = bool(ok)
+        except Exception as e:
+            FILES_SENT.inc(peer=peer, result="error")
+            EVENTS.end(transfer, False, str(e))
+            self.log_error(f"Error replicando archivo '{file_path}' en relevo a {host}:{port}: {e}")
+            return results
+        self._record_transfer(peer, "relay", sent, start)
+        EVENTS.end(transfer, True)
+        ok = sum(1 for success in results.values() if success)
+        self.log_event(
+            f"Archivo '{file_name}' replicado en relevo a través de {host}:{port} ({ok}/{len(results)} clientes)."
+        )
+        return results
+
+    def _fan_out(self, clients, send, *args, **kwargs):
+        """
+        Ejecuta send(*args, host, port, connect_timeout, send_timeout, **kwargs) para cada cliente
+        en el pool de envíos, con como mucho max_sends_per_file envíos a la vez.
+
+        :return: Diccionario {"host:puerto": resultado de send}.
+        """
+        results = {}
+        futures = {}
+        for client in clients:
+            host = client.get("host")
+            port = client.get("port")
+            if not (host and port):
+                self.log_error(f"Cliente inválido en la configuración: {client}")
+                continue
+
+            # Esperar a que termine algún envío si ya se alcanzó el límite por archivo
+            if len(futures) >= self.max_sends_per_file:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures.pop(future)] = future.result()
+
+            future = self._send_pool.submit(
+                send, *args, host, port, client.get("connect_timeout"), client.get("send_timeout"), **kwargs
+            )
+            futures[future] = f"{host}:{port}"
+
+        for future in wait(futures).done:
+            results[futures[future]] = future.result()
+        return results
 
     def log_new_file(self, file_path):
         """
@@ -122,9 +1265,8 @@ class SyncManager:
         :param file_path: Ruta completa del archivo nuevo detectado.
         """
         file_name = os.path.basename(file_path)
-        file_extension = os.path.splitext(file_name)[1]
-        user = os.getlogin()
-        self.log_event(f"Se ha agregado el nuevo archivo '{file_name}' por el usuario '{user}'. Extensión: '{file_extension}'.")
+        user = Logger.get_user()
+        self.log_event(f"Se ha agregado el nuevo archivo '{file_name}' por el usuario '{user}'. Extensión: '{file_extension(file_name)}'.")
 
 
 
@@ -157,6 +1299,7 @@ def start_sync_server():
         except KeyboardInterrupt:
             print("Deteniendo el servidor...")
             sync_manager.stop_monitor()
+            sync_manager.shutdown()
             break
 
 
@@ -0,0 +1,20 @@
+"""
+Preparación común de las pruebas: hace importables los paquetes de src/ y evita que las
+bitácoras (que se abren al importar log, en la carpeta actual) se escriban en el repositorio.
+"""
+
+import os
+import sys
+import tempfile
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+LOG_DIR = tempfile.TemporaryDirectory()
+_cwd = os.getcwd()
+os.chdir(LOG_DIR.name)
+try:
+    import log  # noqa: E402,F401
+finally:
+    os.chdir(_cwd)
@@ -0,0 +1,99 @@
+"""
+Pruebas de la recepción comprimida: salida acotada del descompresor en flujo y rechazo de
+trozos demasiado grandes o de contenido que descomprime más de lo anunciado.
+"""
+
+import hashlib
+import io
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+import support  # noqa: F401  (rutas de src/ y bitácoras fuera del repositorio)
+from sync import FileReceiver
+from sync.compression import CHUNK_HEADER, MAX_CHUNK_SIZE, StreamDecoder, available_encodings, compressor
+from sync.manifest import FileManifest
+from sync.protocol import ProtocolError
+
+MAX_OUTPUT = 64 * 1024
+
+
+def compressed_chunks(encoding, data, piece=256 * 1024):
+    """Comprime data como el emisor: un trozo por cada salida del compresor."""
+    encoder = compressor(encoding)
+    chunks = [encoder.compress(data[i:i + piece]) for i in range(0, len(data), piece)]
+    chunks.append(encoder.flush())
+    return [chunk for chunk in chunks if chunk]
+
+
+def frame(chunks):
+    return b"".join(CHUNK_HEADER.pack(len(chunk)) + chunk for chunk in chunks) + CHUNK_HEADER.pack(0)
+
+
+class StreamDecoderTest(unittest.TestCase):
+    def test_round_trip_with_bounded_output(self):
+        data = b"\0" * (16 * 1024 * 1024) + os.urandom(100000)
+        for encoding in available_encodings():
+            with self.subTest(encoding=encoding):
+                chunks = iter(compressed_chunks(encoding, data))
+                pieces = list(StreamDecoder(encoding, MAX_OUTPUT).decode(lambda: next(chunks, b"")))
+                self.assertEqual(b"".join(pieces), data)
+                self.assertLessEqual(max(len(piece) for piece in pieces), MAX_OUTPUT)
+
+    def test_stops_reading_at_final_chunk(self):
+        for encoding in available_encodings():
+            with self.subTest(encoding=encoding):
+                chunks = iter(compressed_chunks(encoding, b"hola" * 1000) + [b"", b"siguiente trama"])
+                out = b"".join(StreamDecoder(encoding, MAX_OUTPUT).decode(lambda: next(chunks)))
+                self.assertEqual(out, b"hola" * 1000)
+                self.assertEqual(next(chunks), b"siguiente trama")
+
+
+class ReceiveCompressedTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        manifest = FileManifest(tmp.name, os.path.join(tmp.name, "manifest.db"))
+        self.addCleanup(manifest.close)
+        self.receiver = FileReceiver(tmp.name, manifest=manifest, disk_writers=0)
+
+    def receive(self, payload, size):
+        """Pasa payload por una conexión local a _receive_compressed y devuelve lo escrito."""
+        sender, conn = socket.socketpair()
+        self.addCleanup(sender.close)
+        self.addCleanup(conn.close)
+        threading.Thread(target=self._send, args=(sender, payload), daemon=True).start()
+        out = io.BytesIO()
+        try:
+            self.receiver._receive_compressed(conn, out, size, "f.bin", "zlib", hashlib.sha256())
+        finally:
+            self.written = out.getvalue()
+
+    @staticmethod
+    def _send(sock, payload):
+        try:
+            sock.sendall(payload)
+        except OSError:
+            pass
+
+    def test_round_trip(self):
+        data = os.urandom(50000) * 4
+        self.receive(frame(compressed_chunks("zlib", data)), len(data))
+        self.assertEqual(self.written, data)
+
+    def test_rejects_oversized_chunk_header(self):
+        with self.assertRaises(ProtocolError):
+            self.receive(CHUNK_HEADER.pack(MAX_CHUNK_SIZE + 1), 10)
+        self.assertEqual(self.written, b"")
+
+    def test_aborts_as_soon_as_output_exceeds_size(self):
+        data = b"\0" * (8 * 1024 * 1024)
+        with self.assertRaises(ProtocolError):
+            self.receive(frame(compressed_chunks("zlib", data)), 1000)
+        self.assertLessEqual(len(self.written), 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Pruebas de la transferencia diferencial (delta.py): compute_delta seguido de apply_delta
+debe reconstruir exactamente la versión nueva, y los límites deben abandonar el delta.
+"""
+
+import hashlib
+import io
+import os
+import random
+import tempfile
+import time
+import unittest
+
+import support  # noqa: F401  (rutas de src/ y bitácoras fuera del repositorio)
+from sync.delta import COPY_OP, DATA_OP, OP_COPY, OP_DATA, apply_delta, compute_delta, compute_signatures
+
+BLOCK = 4096
+
+
+class DeltaTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.random = random.Random(1234)
+
+    def data(self, size):
+        return self.random.randbytes(size)
+
+    def write(self, name, content):
+        path = os.path.join(self._tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def delta(self, old, new, **kwargs):
+        """Devuelve (bytes literales, delta) de new sobre old."""
+        signatures = compute_signatures(self.write("old", old), BLOCK)
+        out = io.BytesIO()
+        literal = compute_delta(self.write("new", new), signatures, BLOCK, out, **kwargs)
+        return literal, out.getvalue()
+
+    def apply(self, old, delta):
+        stream = io.BytesIO(delta)
+        out = io.BytesIO()
+        with open(self.write("base", old), "rb") as base:
+            digest = apply_delta(base, stream.read, len(delta), out, BLOCK)
+        self.assertEqual(digest.hexdigest(), hashlib.sha256(out.getvalue()).hexdigest())
+        return out.getvalue()
+
+    def round_trip(self, old, new):
+        literal, delta = self.delta(old, new)
+        self.assertIsNotNone(literal)
+        self.assertEqual(self.apply(old, delta), new)
+        return literal, delta
+
+
+class RoundTripTest(DeltaTestCase):
+    def test_identical_files(self):
+        old = self.data(BLOCK * 20)
+        literal, delta = self.round_trip(old, old)
+        self.assertEqual(literal, 0)
+        self.assertEqual(delta, OP_COPY + COPY_OP.pack(0, 20))  # Una sola racha de copias
+
+    def test_prefix_insertion_shifts_blocks(self):
+        old = self.data(BLOCK * 20)
+        literal, _ = self.round_trip(old, b"insertado" + old)
+        self.assertEqual(literal, len(b"insertado"))
+
+    def test_change_in_the_middle(self):
+        old = self.data(BLOCK * 20)
+        new = old[:BLOCK * 7 + 10] + b"X" + old[BLOCK * 7 + 11:]
+        literal, _ = self.round_trip(old, new)
+        self.assertLessEqual(literal, BLOCK)
+
+    def test_partial_tail_block(self):
+        old = self.data(BLOCK * 10 + 123)
+        literal, _ = self.round_trip(old, old + b"cola")
+        self.assertEqual(literal, 123 + len(b"cola"))  # El bloque final incompleto no tiene firma
+
+    def test_empty_old_file(self):
+        new = self.data(BLOCK * 3 + 5)
+        literal, _ = self.round_trip(b"", new)
+        self.assertEqual(literal, len(new))
+
+    def test_empty_new_file(self):
+        literal, delta = self.round_trip(self.data(BLOCK * 3), b"")
+        self.assertEqual((literal, delta), (0, b""))
+
+    def test_new_file_shorter_than_a_block(self):
+        self.round_trip(self.data(BLOCK * 3), b"corto")
+
+    def test_long_literals_are_split(self):
+        old = self.data(BLOCK * 4)
+        self.round_trip(old, old + self.data(3 * 1024 * 1024))
+
+
+class BailoutTest(DeltaTestCase):
+    def test_max_literal(self):
+        old = self.data(BLOCK * 20)
+        new = old[:BLOCK * 5] + self.data(BLOCK * 10) + old[BLOCK * 15:]
+        self.assertIsNone(self.delta(old, new, max_literal=BLOCK * 5)[0])
+        self.assertIsNotNone(self.delta(old, new, max_literal=BLOCK * 11)[0])
+
+    def test_max_literal_without_signatures(self):
+        self.assertIsNone(self.delta(b"", self.data(BLOCK * 3), max_literal=BLOCK)[0])
+
+    def test_deadline(self):
+        old = self.data(BLOCK * 64)
+        new = self.data(BLOCK * 64)  # Nada coincide: recorrido byte a byte
+        self.assertIsNone(self.delta(old, new, deadline=time.monotonic() - 1)[0])
+        self.assertIsNotNone(self.delta(old, new, deadline=time.monotonic() + 60)[0])
+
+
+class ApplyDeltaErrorsTest(DeltaTestCase):
+    def test_unknown_op(self):
+        with self.assertRaisesRegex(ValueError, "desconocida"):
+            self.apply(self.data(BLOCK), b"Z" + DATA_OP.pack(0))
+
+    def test_block_out_of_range(self):
+        with self.assertRaisesRegex(ValueError, "inexistente"):
+            self.apply(self.data(BLOCK * 2), OP_COPY + COPY_OP.pack(1, 2))
+
+    def test_delta_longer_than_announced(self):
+        delta = OP_DATA + DATA_OP.pack(10) + b"0123456789"
+        stream = io.BytesIO(delta)
+        with open(self.write("base", b""), "rb") as base:
+            with self.assertRaisesRegex(ValueError, "más largo"):
+                apply_delta(base, stream.read, len(delta) - 4, io.BytesIO(), BLOCK)
+
+
+if __name__ == "__main__":
+    unittest.main()
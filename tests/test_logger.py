@@ -0,0 +1,40 @@
+"""Pruebas de la cola de la bitácora: los registros descartados se cuentan sin perder ninguno."""
+
+import logging
+import queue
+import unittest
+
+import support  # noqa: F401  (rutas de src/ y bitácoras fuera del repositorio)
+from log.logger import _DroppingQueueHandler
+
+
+def record(message):
+    return logging.makeLogRecord({"msg": message})
+
+
+class DroppingQueueHandlerTest(unittest.TestCase):
+    def test_drops_are_counted_while_queue_stays_full(self):
+        handler = _DroppingQueueHandler(queue.Queue(maxsize=1))
+        handler.enqueue(record("primero"))
+        for i in range(3):
+            handler.enqueue(record(f"descartado {i}"))
+        # El aviso no cabe mientras la cola siga llena: el contador no debe perder nada
+        self.assertEqual(handler.dropped, 3)
+
+    def test_warning_reports_all_drops_when_room_returns(self):
+        handler = _DroppingQueueHandler(queue.Queue(maxsize=2))
+        handler.enqueue(record("primero"))
+        handler.enqueue(record("segundo"))
+        handler.enqueue(record("descartado"))
+        handler.enqueue(record("descartado"))
+        handler.queue.get_nowait()
+        handler.queue.get_nowait()
+        handler.enqueue(record("tercero"))
+        warning, third = handler.queue.get_nowait(), handler.queue.get_nowait()
+        self.assertIn("Se descartaron 2 mensajes", warning.getMessage())
+        self.assertEqual(third.getMessage(), "tercero")
+        self.assertEqual(handler.dropped, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
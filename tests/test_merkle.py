@@ -0,0 +1,123 @@
+"""
+Pruebas de la antientropía (merkle.py): compare_trees entre dos índices y el recálculo
+incremental del árbol cuando cambia el índice.
+"""
+
+import hashlib
+import os
+import tempfile
+import types
+import unittest
+
+import support  # noqa: F401  (rutas de src/ y bitácoras fuera del repositorio)
+from sync.manifest import FileManifest
+from sync.merkle import MAX_ENTRIES, MerkleTree, compare_trees
+
+STAT = types.SimpleNamespace(st_size=1, st_mtime_ns=0, st_ino=0)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class MerkleTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+    def manifest(self, name, files):
+        """Crea un índice con {ruta relativa: contenido} sin archivos reales."""
+        folder = os.path.join(self._tmp.name, name)
+        os.makedirs(folder, exist_ok=True)
+        manifest = FileManifest(folder, os.path.join(self._tmp.name, f"{name}.db"))
+        self.addCleanup(manifest.close)
+        manifest.record_many((path, STAT, content_hash(text)) for path, text in files.items())
+        return manifest
+
+    @staticmethod
+    def query(remote):
+        return lambda dirs, entries: remote.describe([tuple(d) for d in dirs], entries)
+
+
+class CompareTreesTest(MerkleTestCase):
+    FILES = {"a.txt": "a", "docs/b.txt": "b", "docs/deep/c.txt": "c", "z/d.txt": "d"}
+
+    def compare(self, local_files, remote_files):
+        local = MerkleTree(self.manifest("local", local_files))
+        remote = MerkleTree(self.manifest("remote", remote_files))
+        return compare_trees(local, self.query(remote))
+
+    def test_identical_trees(self):
+        self.assertEqual(self.compare(self.FILES, self.FILES), ([], 0, 1))
+
+    def test_one_changed_file(self):
+        remote = dict(self.FILES, **{"docs/deep/c.txt": "otro"})
+        missing, extra, _ = self.compare(self.FILES, remote)
+        self.assertEqual(missing, ["docs/deep/c.txt"])
+        self.assertEqual(extra, 0)
+
+    def test_missing_subtree(self):
+        remote = {path: text for path, text in self.FILES.items() if not path.startswith("docs/")}
+        missing, extra, _ = self.compare(self.FILES, remote)
+        self.assertEqual(sorted(missing), ["docs/b.txt", "docs/deep/c.txt"])
+        self.assertEqual(extra, 0)
+
+    def test_extra_remote_entries_are_counted(self):
+        missing, extra, _ = self.compare(self.FILES, dict(self.FILES, **{"solo_remoto.txt": "x"}))
+        self.assertEqual((missing, extra), ([], 1))
+
+    def test_bucketed_directory(self):
+        files = {f"big/{i:05d}.bin": str(i) for i in range(MAX_ENTRIES * 8)}
+        remote = dict(files, **{"big/00123.bin": "cambiado"})
+        missing, extra, queries = self.compare(files, remote)
+        self.assertEqual((missing, extra), (["big/00123.bin"], 0))
+        # Raíz, carpeta por cubetas y la cubeta que difiere; nunca las demás entradas
+        self.assertEqual(queries, 4)
+
+
+class IncrementalTreeTest(MerkleTestCase):
+    def assertMatchesRebuild(self, tree):
+        fresh = MerkleTree(tree.manifest)
+        self.assertEqual(tree._current()[0], fresh._current()[0])
+        self.assertEqual(tree._current()[1], fresh._current()[1])
+
+    def setUp(self):
+        super().setUp()
+        self.manifest_ = self.manifest("local", {"a.txt": "a", "x/b.txt": "b", "x/y/c.txt": "c", "x.txt": "d"})
+        self.tree = MerkleTree(self.manifest_)
+        self.tree.root()
+
+    def local(self, relative):
+        return os.path.join(self.manifest_.sync_folder, *relative.split("/"))
+
+    def test_record_updates_ancestors_only(self):
+        before = self.tree.root()
+        self.manifest_.record_many([("x/y/c.txt", STAT, content_hash("nuevo")), ("n/m/e.txt", STAT, content_hash("e"))])
+        self.assertNotEqual(self.tree.root(), before)
+        self.assertMatchesRebuild(self.tree)
+
+    def test_remove_file_and_empty_directory(self):
+        self.manifest_.remove_many(["x/y/c.txt"])
+        self.assertNotIn("x/y", self.tree._current()[0])
+        self.assertMatchesRebuild(self.tree)
+        self.manifest_.remove(self.local("x"))
+        self.assertNotIn("x", self.tree._current()[0])
+        self.assertMatchesRebuild(self.tree)
+
+    def test_rename_directory(self):
+        self.manifest_.rename(self.local("x"), self.local("w/x2"))
+        self.assertEqual(self.tree.entries("w/x2/y"), {"c.txt": content_hash("c")[:16]})
+        self.assertMatchesRebuild(self.tree)
+
+    def test_no_full_rebuild_after_change(self):
+        builds = []
+        original = self.tree._build
+        self.tree._build = lambda top="": builds.append(top) or original(top)
+        self.manifest_.record_many([("x/b.txt", STAT, content_hash("b2"))])
+        self.tree.root()
+        self.assertEqual(builds, [])
+        self.assertMatchesRebuild(self.tree)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Pruebas de las operaciones de metadatos (metadata.py): agrupación de renombrados y
+borrados en operaciones de carpeta, y aplicación idempotente en el receptor.
+"""
+
+import hashlib
+import os
+import tempfile
+import unittest
+
+import support  # noqa: F401  (rutas de src/ y bitácoras fuera del repositorio)
+from sync.manifest import FileManifest
+from sync.metadata import (
+    apply_operation, collapse_deletes, collapse_renames, delete_op, mkdir_op, rename_op,
+)
+from sync.protocol import ProtocolError
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class CollapseTest(unittest.TestCase):
+    def test_folder_rename_becomes_one_operation(self):
+        renames = [("docs/a.txt", "papers/a.txt", "h1"), ("docs/sub/b.txt", "papers/sub/b.txt", "h2")]
+        known = sorted(["docs/a.txt", "docs/sub/b.txt", "otro.txt"])
+        ops = collapse_renames(renames, known, lambda path: path == "papers")
+        self.assertEqual(ops, [rename_op("docs", "papers")])
+
+    def test_partial_folder_move_keeps_file_renames(self):
+        # docs/c.txt no se movió: la carpeta no puede renombrarse entera
+        renames = [("docs/a.txt", "papers/a.txt", "h1")]
+        known = sorted(["docs/a.txt", "docs/c.txt"])
+        ops = collapse_renames(renames, known, lambda path: path in ("docs", "papers"))
+        self.assertEqual(ops, [rename_op("docs/a.txt", "papers/a.txt", "h1")])
+
+    def test_file_rename_in_same_folder(self):
+        ops = collapse_renames([("docs/a.txt", "docs/b.txt", "h1")], ["docs/a.txt"], lambda path: True)
+        self.assertEqual(ops, [rename_op("docs/a.txt", "docs/b.txt", "h1")])
+
+    def test_deleted_folder_becomes_one_operation(self):
+        removed = ["docs/a.txt", "docs/sub/b.txt", "keep/c.txt"]
+        hashes = {"docs/a.txt": "h1", "docs/sub/b.txt": "h2", "keep/c.txt": "h3"}
+        ops = collapse_deletes(removed, hashes, lambda path: path == "keep")
+        self.assertEqual(ops, [delete_op("docs"), delete_op("keep/c.txt", "h3")])
+
+
+class ApplyOperationTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.folder = os.path.join(tmp.name, "sync")
+        os.makedirs(self.folder)
+        self.manifest = FileManifest(self.folder, os.path.join(tmp.name, "manifest.db"))
+        self.addCleanup(self.manifest.close)
+
+    def path(self, relative):
+        return os.path.join(self.folder, *relative.split("/"))
+
+    def write(self, relative, data, index=True):
+        path = self.path(relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        if index:
+            self.manifest.record(path, content_hash(data))
+        return content_hash(data)
+
+    def apply(self, op):
+        return apply_operation(self.folder, self.manifest, op)
+
+    def test_mkdir_is_idempotent(self):
+        self.apply(mkdir_op("a/b"))
+        self.apply(mkdir_op("a/b"))
+        self.assertTrue(os.path.isdir(self.path("a/b")))
+
+    def test_rename_file_updates_manifest(self):
+        digest = self.write("a.txt", b"contenido")
+        self.apply(rename_op("a.txt", "sub/b.txt", digest))
+        self.assertFalse(os.path.exists(self.path("a.txt")))
+        self.assertIsNone(self.manifest.lookup("a.txt"))
+        self.assertEqual(self.manifest.lookup("sub/b.txt")[3], digest)
+        # Repetirla (eco del monitor del receptor) no es un error
+        self.assertIn("ya estaba", self.apply(rename_op("a.txt", "sub/b.txt", digest)))
+
+    def test_rename_folder_moves_its_entries(self):
+        self.write("docs/a.txt", b"a")
+        self.write("docs/sub/b.txt", b"b")
+        self.apply(rename_op("docs", "papers"))
+        self.assertEqual(sorted(self.manifest.paths_under("papers")), ["papers/a.txt", "papers/sub/b.txt"])
+        self.assertEqual(self.manifest.paths_under("docs"), [])
+        self.assertTrue(os.path.isfile(self.path("papers/sub/b.txt")))
+
+    def test_rename_refuses_changed_content(self):
+        digest = self.write("a.txt", b"original")
+        self.write("a.txt", b"cambiado por el receptor")
+        with self.assertRaises(ProtocolError):
+            self.apply(rename_op("a.txt", "b.txt", digest))
+        self.assertTrue(os.path.exists(self.path("a.txt")))
+
+    def test_rename_missing_source(self):
+        with self.assertRaises(ProtocolError):
+            self.apply(rename_op("no.txt", "b.txt"))
+
+    def test_delete_file_requires_matching_digest(self):
+        digest = self.write("a.txt", b"contenido")
+        with self.assertRaises(ProtocolError):
+            self.apply(delete_op("a.txt"))
+        with self.assertRaises(ProtocolError):
+            self.apply(delete_op("a.txt", content_hash(b"otro")))
+        self.apply(delete_op("a.txt", digest))
+        self.assertFalse(os.path.exists(self.path("a.txt")))
+        self.assertIsNone(self.manifest.lookup("a.txt"))
+        self.assertIn("ya no existía", self.apply(delete_op("a.txt", digest)))
+
+    def test_delete_folder_keeps_unknown_and_changed_files(self):
+        self.write("docs/a.txt", b"a")
+        self.write("docs/sub/b.txt", b"b")
+        self.write("docs/sub/nuevo.txt", b"desconocido", index=False)
+        self.write("docs/c.txt", b"c")
+        with open(self.path("docs/c.txt"), "ab") as f:
+            f.write(b" cambiado")
+
+        self.apply(delete_op("docs"))
+        remaining = sorted(
+            os.path.relpath(os.path.join(directory, name), self.folder).replace(os.sep, "/")
+            for directory, _, files in os.walk(self.folder) for name in files
+        )
+        self.assertEqual(remaining, ["docs/c.txt", "docs/sub/nuevo.txt"])
+        self.assertIsNone(self.manifest.lookup("docs/a.txt"))
+
+    def test_delete_whole_folder(self):
+        self.write("docs/a.txt", b"a")
+        self.write("docs/sub/b.txt", b"b")
+        self.apply(delete_op("docs"))
+        self.assertFalse(os.path.exists(self.path("docs")))
+        self.assertEqual(len(self.manifest), 0)
+
+    def test_invalid_operations(self):
+        for op in ({"op": "chmod", "path": "a.txt"}, ["mkdir", "a"], mkdir_op("../fuera")):
+            with self.subTest(op=op), self.assertRaises(ProtocolError):
+                self.apply(op)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Pruebas del diario de envíos pendientes (outbound.py): lo que no se confirmó sobrevive a
+un reinicio y se reintenta con espera exponencial.
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+import support  # noqa: F401  (rutas de src/ y bitácoras fuera del repositorio)
+from sync.outbound import OutboundQueue
+
+PEER = "10.0.0.2:5000"
+OTHER = "10.0.0.3:5000"
+
+
+class OutboundQueueTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = os.path.join(tmp.name, "outbound.db")
+        self.folder = os.path.join(tmp.name, "sync")
+        self.queue = self.open()
+
+    def open(self, **kwargs):
+        journal = OutboundQueue(self.db_path, **kwargs)
+        self.addCleanup(journal.close)
+        return journal
+
+    def path(self, *parts):
+        return os.path.join(self.folder, *parts)
+
+    def test_leased_entries_are_replayed_after_restart(self):
+        self.queue.enqueue_many([(PEER, self.path("a.txt")), (OTHER, self.path("a.txt"))])
+        self.queue.complete_many([(OTHER, self.path("a.txt"))])
+        # En curso: no se vuelve a entregar mientras siga reservado
+        self.assertEqual(self.queue.claim_due([PEER, OTHER], 10), [])
+        self.queue.close()
+
+        reopened = self.open()
+        self.assertEqual(len(reopened), 1)
+        self.assertEqual(reopened.claim_due([PEER, OTHER], 10), [(PEER, self.path("a.txt"), 0)])
+        self.assertEqual(reopened.claim_due([PEER, OTHER], 10), [])
+
+    def test_failure_backs_off_exponentially(self):
+        journal = self.open(base_delay=100, max_delay=250)
+        entry = (PEER, self.path("a.txt"))
+        journal.enqueue_many([entry])
+        delays = []
+        for _ in range(3):
+            before = time.time()
+            journal.fail_many([entry], "sin conexión")
+            next_attempt = journal._db.execute("SELECT next_attempt FROM pending").fetchone()[0]
+            delays.append(next_attempt - before)
+        self.assertTrue(75 <= delays[0] <= 101, delays)
+        self.assertTrue(150 <= delays[1] <= 201, delays)
+        self.assertTrue(187 <= delays[2] <= 251, delays)  # Limitado por max_delay
+        self.assertEqual(journal.claim_due([PEER], 10), [])  # Todavía no toca
+
+    def test_due_entries_only_for_configured_peers(self):
+        self.queue.schedule_many([(PEER, self.path("a.txt")), (OTHER, self.path("b.txt"))])
+        self.assertEqual(self.queue.claim_due([PEER], 10), [(PEER, self.path("a.txt"), 0)])
+        self.assertEqual(self.queue.pending_by_peer(), {PEER: 1, OTHER: 1})
+
+    def test_enqueue_resets_failed_entry(self):
+        entry = (PEER, self.path("a.txt"))
+        self.queue.enqueue_many([entry])
+        self.queue.fail_many([entry])
+        self.queue.enqueue_many([entry])
+        self.queue.fail_many([entry])
+        self.assertEqual(self.queue._db.execute("SELECT attempts FROM pending").fetchone()[0], 1)
+
+    def test_remove_and_move_folders(self):
+        self.queue.schedule_many([
+            (PEER, self.path("docs", "a.txt")), (PEER, self.path("docs", "sub", "b.txt")),
+            (PEER, self.path("docs2", "c.txt")), (PEER, self.path("otro.txt")),
+        ])
+        self.queue.move_path(self.path("docs"), self.path("nuevo"))
+        self.queue.remove_path(self.path("docs2"))
+        paths = sorted(path for _, path, _ in self.queue.claim_due([PEER], 10))
+        self.assertEqual(paths, sorted([
+            self.path("nuevo", "a.txt"), self.path("nuevo", "sub", "b.txt"), self.path("otro.txt"),
+        ]))
+
+    def test_operations_keep_their_order_per_peer(self):
+        ops = [{"op": "mkdir", "path": f"d{i}"} for i in range(5)]
+        self.queue.enqueue_operations([(PEER, op) for op in ops] + [(OTHER, {"op": "mkdir", "path": "x"})])
+        self.queue.close()
+
+        reopened = self.open()
+        pending = reopened.pending_operations(PEER, 3)
+        self.assertEqual([op for _, op in pending], ops[:3])
+        reopened.complete_operations([seq for seq, _ in pending[:2]])
+        self.assertEqual([op for _, op in reopened.pending_operations(PEER, 10)], ops[2:])
+
+        reopened.fail_operations(PEER, "sin conexión")
+        self.assertEqual(reopened.peers_with_due_operations([PEER, OTHER]), [OTHER])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Pruebas del protocolo (protocol.py): tramas válidas e inválidas, saneamiento de las rutas
+recibidas y nombres de los archivos temporales del receptor.
+"""
+
+import json
+import os
+import socket
+import unittest
+
+import support  # noqa: F401  (rutas de src/ y bitácoras fuera del repositorio)
+from sync.protocol import (
+    HEADER, MAGIC, MAX_META_SIZE, MSG_ACK, MSG_FILE, VERSION, ProtocolError, from_wire_path, is_temp_file,
+    recv_message, send_message, temp_path_for, to_wire_path,
+)
+
+
+class FramingTest(unittest.TestCase):
+    def setUp(self):
+        self.sender, self.receiver = socket.socketpair()
+        self.receiver.settimeout(5)
+        self.addCleanup(self.sender.close)
+        self.addCleanup(self.receiver.close)
+
+    def send_raw(self, magic=MAGIC, version=VERSION, msg_type=MSG_ACK, body=b"{}", meta_size=None):
+        size = len(body) if meta_size is None else meta_size
+        self.sender.sendall(HEADER.pack(magic, version, msg_type, size) + body)
+
+    def test_round_trip(self):
+        meta = {"path": "carpeta/año.txt", "size": 3, "sha256": "0" * 64}
+        send_message(self.sender, MSG_FILE, meta)
+        send_message(self.sender, MSG_ACK, {})
+        self.assertEqual(recv_message(self.receiver), (MSG_FILE, meta))
+        self.assertEqual(recv_message(self.receiver), (MSG_ACK, {}))
+
+    def test_clean_close_between_frames(self):
+        self.sender.close()
+        self.assertIsNone(recv_message(self.receiver))
+
+    def test_bad_magic(self):
+        self.send_raw(magic=b"HTTP")
+        with self.assertRaisesRegex(ProtocolError, "identificador"):
+            recv_message(self.receiver)
+
+    def test_wrong_version(self):
+        self.send_raw(version=VERSION + 1)
+        with self.assertRaisesRegex(ProtocolError, "Versión"):
+            recv_message(self.receiver)
+
+    def test_oversized_meta(self):
+        self.send_raw(body=b"", meta_size=MAX_META_SIZE + 1)
+        with self.assertRaisesRegex(ProtocolError, "demasiado grandes"):
+            recv_message(self.receiver)
+
+    def test_invalid_json(self):
+        self.send_raw(body=b"{no es json")
+        with self.assertRaisesRegex(ProtocolError, "JSON"):
+            recv_message(self.receiver)
+
+    def test_truncated_header(self):
+        self.sender.sendall(HEADER.pack(MAGIC, VERSION, MSG_ACK, 2)[:5])
+        self.sender.close()
+        with self.assertRaises(ConnectionError):
+            recv_message(self.receiver)
+
+    def test_truncated_meta(self):
+        body = json.dumps({"path": "a"}).encode("utf-8")
+        self.send_raw(body=body[:-2], meta_size=len(body))
+        self.sender.close()
+        with self.assertRaises(ConnectionError):
+            recv_message(self.receiver)
+
+
+class WirePathTest(unittest.TestCase):
+    FOLDER = os.path.abspath(os.path.join(os.sep, "sync"))
+
+    def test_round_trip(self):
+        local = from_wire_path(self.FOLDER, "docs/informe.txt")
+        self.assertEqual(local, os.path.join(self.FOLDER, "docs", "informe.txt"))
+        self.assertEqual(to_wire_path(self.FOLDER, local), "docs/informe.txt")
+
+    def test_redundant_separators_are_ignored(self):
+        self.assertEqual(from_wire_path(self.FOLDER, "docs//./a.txt/"), os.path.join(self.FOLDER, "docs", "a.txt"))
+
+    def test_rejects_paths_outside_the_folder(self):
+        for wire_path in ("../secreto", "docs/../../secreto", "..", "", ".", "a\\..\\b", "C:/Windows", "c:x", None):
+            with self.subTest(wire_path=wire_path):
+                with self.assertRaises(ProtocolError):
+                    from_wire_path(self.FOLDER, wire_path)
+
+    def test_rejects_absolute_paths(self):
+        for wire_path in ("/etc/passwd", "/", "//servidor/recurso"):
+            with self.subTest(wire_path=wire_path):
+                with self.assertRaises(ProtocolError):
+                    from_wire_path(self.FOLDER, wire_path)
+
+
+class TempFileTest(unittest.TestCase):
+    def test_receiver_temp_names(self):
+        self.assertTrue(is_temp_file(temp_path_for("/s/a.txt")))
+        self.assertTrue(is_temp_file(temp_path_for("/s/a.txt", ".delta")))
+        self.assertTrue(is_temp_file("/s/.a.txt.part"))
+        self.assertTrue(is_temp_file("/s/.a.txt.ckpt"))
+        self.assertTrue(is_temp_file(temp_path_for("/s/.a.txt.ckpt")))
+        self.assertTrue(is_temp_file(f"/s/.a.txt.{'0f' * 16}.stripe"))
+
+    def test_user_files_are_not_temp(self):
+        for name in (".notas.tmp", ".cache.delta", "a.tmp", "a.part", ".tmp", f".a.{'zz' * 16}.stripe"):
+            with self.subTest(name=name):
+                self.assertFalse(is_temp_file(os.path.join("/s", name)))
+
+
+if __name__ == "__main__":
+    unittest.main()
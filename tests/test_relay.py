@@ -0,0 +1,83 @@
+"""
+Pruebas del reenvío en cadena (relay.py): un corte de la conexión de entrada a mitad
+de un archivo no debe dejar colgado al receptor que lo estaba reenviando.
+
+Uso (desde la raíz del repositorio):
+
+    python -m unittest discover tests
+"""
+
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+import support  # noqa: F401  (rutas de src/ y bitácoras fuera del repositorio)
+from sync import FileReceiver
+from sync.manifest import FileManifest
+
+
+class RelayCutTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self._tmp.name, "sync")
+        os.makedirs(self.folder)
+
+        # Nodo siguiente de la cadena: acepta la conexión y lee todo lo que le llegue
+        self.downstream = socket.create_server(("127.0.0.1", 0))
+        self.received = threading.Event()
+        threading.Thread(target=self._drain_downstream, daemon=True).start()
+
+    def tearDown(self):
+        self.downstream.close()
+        self._tmp.cleanup()
+
+    def _drain_downstream(self):
+        try:
+            conn, _ = self.downstream.accept()
+        except OSError:
+            return
+        with conn:
+            while conn.recv(65536):
+                self.received.set()
+
+    def test_upstream_cut_mid_file_returns(self):
+        manifest = FileManifest(self.folder, os.path.join(self._tmp.name, "manifest.db"))
+        receiver = FileReceiver(self.folder, host="127.0.0.1", port=0, read_timeout=5, manifest=manifest,
+                                disk_writers=0)
+        size = 4 * 1024 * 1024
+        meta = {
+            "path": "grande.bin", "size": size, "sha256": "0" * 64,
+            "relay": [{"host": "127.0.0.1", "port": self.downstream.getsockname()[1], "relay": []}],
+        }
+        # Conexión de entrada por TCP, como la del emisor
+        with socket.create_server(("127.0.0.1", 0)) as listener:
+            upstream = socket.create_connection(listener.getsockname())
+            conn, _ = listener.accept()
+        conn.settimeout(5)
+        errors = []
+
+        def receive():
+            try:
+                receiver._receive_and_forward(conn, meta)
+            except Exception as e:
+                errors.append(e)  # La conexión cortada se propaga a quien atiende la conexión
+
+        worker = threading.Thread(target=receive, daemon=True)
+        worker.start()
+
+        # Enviar una parte del contenido y cortar la conexión a mitad del archivo
+        upstream.sendall(os.urandom(256 * 1024))
+        self.assertTrue(self.received.wait(5), "el contenido no llegó al nodo siguiente")
+        upstream.close()
+
+        worker.join(10)
+        conn.close()
+        self.assertFalse(worker.is_alive(), "_receive_and_forward no terminó tras el corte")
+        self.assertEqual([type(e) for e in errors], [ConnectionError])
+        self.assertFalse(os.path.exists(os.path.join(self.folder, "grande.bin")))
+
+
+if __name__ == "__main__":
+    unittest.main()
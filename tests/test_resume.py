@@ -0,0 +1,104 @@
+"""
+Pruebas de las transferencias reanudables (resume.py): puntos de control, reanudación
+desde el último y descarte de los que no corresponden al contenido que se recibe.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+
+import support  # noqa: F401  (rutas de src/ y bitácoras fuera del repositorio)
+from sync.protocol import ProtocolError
+from sync.resume import PartialTransfer
+
+INTERVAL = 1000
+
+
+class PartialTransferTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "grande.bin")
+        self.content = os.urandom(INTERVAL * 5 + 300)
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+
+    def transfer(self, sha256=None, size=None):
+        return PartialTransfer(self.path, sha256 or self.sha256, size or len(self.content), INTERVAL)
+
+    def receive(self, transfer, start, end, chunk=300):
+        """Escribe content[start:end] como lo hace el receptor, guardando puntos de control."""
+        f, digest = transfer.open(start)
+        with f:
+            for position in range(start, end, chunk):
+                data = self.content[position:min(end, position + chunk)]
+                f.write(data)
+                digest.update(data)
+                transfer.advance(f, digest, position + len(data))
+        return digest
+
+    def test_checkpoint_round_trip(self):
+        self.receive(self.transfer(), 0, 3300)
+        offset = self.transfer().resume_offset()
+        self.assertEqual(offset, 2400)  # Puntos de control en 1200 y 2400; de 2400 a 3300 no llega al intervalo
+        with open(self.transfer().checkpoint_path) as f:
+            checkpoint = json.load(f)
+        self.assertEqual(checkpoint["prefix_sha256"], hashlib.sha256(self.content[:offset]).hexdigest())
+
+        resumed = self.transfer()
+        digest = self.receive(resumed, offset, len(self.content))
+        self.assertEqual(digest.hexdigest(), self.sha256)
+        resumed.commit()
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.path.exists(resumed.checkpoint_path))
+        self.assertFalse(os.path.exists(resumed.part_path))
+
+    def test_bytes_after_last_checkpoint_are_dropped(self):
+        self.receive(self.transfer(), 0, 2500)
+        transfer = self.transfer()
+        offset = transfer.resume_offset()
+        f, _ = transfer.open(offset)
+        f.close()
+        self.assertEqual(os.path.getsize(transfer.part_path), offset)
+
+    def test_no_checkpoint(self):
+        self.assertEqual(self.transfer().resume_offset(), 0)
+        with self.assertRaises(ProtocolError):
+            self.transfer().open(INTERVAL)
+
+    def test_checkpoint_of_other_content_is_ignored(self):
+        self.receive(self.transfer(), 0, 3500)
+        self.assertEqual(self.transfer(sha256="0" * 64).resume_offset(), 0)
+        self.assertEqual(self.transfer(size=len(self.content) + 1).resume_offset(), 0)
+
+    def test_truncated_part_file(self):
+        self.receive(self.transfer(), 0, 3500)
+        transfer = self.transfer()
+        with open(transfer.part_path, "r+b") as f:
+            f.truncate(100)
+        self.assertEqual(transfer.resume_offset(), 0)
+
+    def test_modified_prefix_is_rejected_and_discarded(self):
+        self.receive(self.transfer(), 0, 3500)
+        transfer = self.transfer()
+        offset = transfer.resume_offset()
+        with open(transfer.part_path, "r+b") as f:
+            f.write(b"X")
+        with self.assertRaises(ProtocolError):
+            transfer.open(offset)
+        self.assertFalse(os.path.exists(transfer.part_path))
+        self.assertFalse(os.path.exists(transfer.checkpoint_path))
+
+    def test_open_from_zero_discards_previous_state(self):
+        self.receive(self.transfer(), 0, 3500)
+        transfer = self.transfer()
+        f, _ = transfer.open(0)
+        f.close()
+        self.assertEqual(os.path.getsize(transfer.part_path), 0)
+        self.assertEqual(transfer.resume_offset(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
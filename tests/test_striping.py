@@ -0,0 +1,104 @@
+"""
+Pruebas de las transferencias por franjas (striping.py): reparto en rangos, número de
+conexiones y verificación del temporal antes de publicarlo.
+"""
+
+import hashlib
+import os
+import random
+import tempfile
+import threading
+import unittest
+
+import support  # noqa: F401  (rutas de src/ y bitácoras fuera del repositorio)
+from sync.striping import MAX_AUTO_STRIPES, STRIPE_IDLE_TIMEOUT, StripedFile, choose_stripes, plan_ranges
+
+RANGE = 1000
+
+
+class PlanTest(unittest.TestCase):
+    def test_ranges_cover_the_file_with_a_short_tail(self):
+        self.assertEqual(plan_ranges(2500, RANGE), [(0, 1000), (1000, 1000), (2000, 500)])
+        self.assertEqual(plan_ranges(2000, RANGE), [(0, 1000), (1000, 1000)])
+        self.assertEqual(plan_ranges(999, RANGE), [(0, 999)])
+        self.assertEqual(plan_ranges(0, RANGE), [])
+
+    def test_ranges_are_contiguous(self):
+        for size in (1, 4095, 4096, 4097, 123457):
+            ranges = plan_ranges(size, 4096)
+            self.assertEqual(sum(length for _, length in ranges), size)
+            self.assertEqual([offset for offset, _ in ranges], list(range(0, size, 4096)))
+
+    def test_choose_stripes(self):
+        self.assertEqual(choose_stripes("auto", 100, None), 1)
+        self.assertEqual(choose_stripes("auto", 100, 0.001), 1)
+        self.assertEqual(choose_stripes("auto", 100, 0.05), MAX_AUTO_STRIPES)
+        self.assertEqual(choose_stripes("auto", 3, 0.05), 3)
+        self.assertEqual(choose_stripes(4, 100, None), 4)
+        self.assertEqual(choose_stripes("2", 1, 0.05), 1)
+        self.assertEqual(choose_stripes(0, 10, None), 1)
+
+
+class StripedFileTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        self.path = os.path.join(tmp.name, "grande.bin")
+        self.content = os.urandom(RANGE * 4 + 321)
+        self.stripe = StripedFile(self.path, len(self.content), hashlib.sha256(self.content).hexdigest(), RANGE)
+        self.addCleanup(self.stripe.discard)
+        self.stripe.open()
+
+    def send(self, indexes):
+        """Escribe los rangos indicados (cada uno desde su propio hilo) y devuelve el hash de todos."""
+        def send_range(index):
+            offset, length = self.stripe.ranges[index]
+            data = self.content[offset:offset + length]
+            self.stripe.write(data, offset)
+            self.stripe.range_done(index, hashlib.sha256(data).hexdigest())
+
+        threads = [threading.Thread(target=send_range, args=(index,)) for index in indexes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [hashlib.sha256(self.content[offset:offset + length]).hexdigest()
+                for offset, length in self.stripe.ranges]
+
+    def test_out_of_order_ranges_commit_the_whole_file(self):
+        indexes = list(range(len(self.stripe.ranges)))
+        random.shuffle(indexes)
+        digests = self.send(indexes)
+        self.assertTrue(os.path.basename(self.stripe.temp_path).startswith(".grande.bin."))
+        self.assertIsNone(self.stripe.verify(digests))
+        self.stripe.commit()
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.path.exists(self.stripe.temp_path))
+
+    def test_missing_range(self):
+        digests = self.send([0, 1, 3, 4])
+        self.assertEqual(self.stripe.verify(digests), "falta el rango 2")
+
+    def test_mismatched_range(self):
+        digests = self.send(range(len(self.stripe.ranges)))
+        digests[3] = "0" * 64
+        self.assertEqual(self.stripe.verify(digests), "el hash del rango 3 no coincide")
+
+    def test_wrong_range_count(self):
+        digests = self.send(range(len(self.stripe.ranges)))
+        self.assertEqual(self.stripe.verify(digests[:-1]), "se esperaban 5 rangos y se anunciaron 4")
+
+    def test_discard_removes_the_temporary_file(self):
+        self.send([0])
+        self.stripe.discard()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_expired_after_idle_timeout(self):
+        self.assertFalse(self.stripe.expired())
+        self.assertTrue(self.stripe.expired(self.stripe.last_activity + STRIPE_IDLE_TIMEOUT + 1))
+
+
+if __name__ == "__main__":
+    unittest.main()